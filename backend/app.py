@@ -7,7 +7,10 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 from pathlib import Path
 import time
+import threading
 import logging
+import shutil
+import urllib.parse
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -23,6 +26,14 @@ from conversation_history import ConversationHistoryManager
 # 导入模板管理器
 from template_manager import TemplateManager
 
+# 导入异步导入任务管理器和支持的上传格式
+from import_jobs import import_job_manager, ImportJob, ImportQueueFull
+from chunked_upload import upload_session_manager, UploadSessionError
+from file_preview import preview_cache
+from query_cache import query_result_cache
+from data_importer import SUPPORTED_FORMATS, IMPORT_MODES, get_file_format
+from dataset_cache import DatasetCache, copy_with_fingerprint
+
 # 导入配置和Prompt
 from config import Config
 from prompts import Prompts
@@ -44,6 +55,7 @@ app.config['MAX_CONTENT_LENGTH'] = Config.MAX_CONTENT_LENGTH  # 100MB最大文
 user_analyzers = {}
 user_history_managers = {}
 user_template_managers = {}
+user_dataset_caches = {}
 
 def extract_query_from_data(data):
     """安全地从请求数据中提取查询字符串"""
@@ -134,6 +146,19 @@ def get_user_history_manager(user_data):
         
     return user_history_managers[user_id]
 
+def get_user_dataset_cache(user_data):
+    """获取或创建用户专属的数据集缓存实例（未启用上传去重时返回 None）"""
+    if not Config.UPLOAD_DEDUP_ENABLED:
+        return None
+    
+    user_id = user_data['user_id']
+    
+    if user_id not in user_dataset_caches:
+        user_paths = user_manager.get_user_paths(user_id)
+        user_dataset_caches[user_id] = DatasetCache(user_paths['dataset_cache_path'])
+    
+    return user_dataset_caches[user_id]
+
 def get_user_template_manager(user_data, api_key):
     """获取或创建用户专属的模板管理器实例"""
     user_id = user_data['user_id']
@@ -204,10 +229,176 @@ def get_status(user_data):
             "user_info": user_data
         }), 500
 
+def is_truthy(value):
+    """解析表单/查询参数中的布尔开关"""
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def get_upload_source():
+    """
+    获取上传文件名和数据流
+    
+    支持两种上传方式：
+    - multipart/form-data：file 字段（兼容现有前端）
+    - 原始请求体：Content-Type 为 text/csv 或 application/octet-stream，
+      文件名通过 X-Filename 请求头（URL编码）或 filename 查询参数传递；
+      请求体边接收边解析入库，解析与网络传输重叠
+    
+    Returns:
+        (filename, stream, error_message)
+    """
+    if request.mimetype == 'multipart/form-data':
+        if 'file' not in request.files:
+            return None, None, "未找到文件"
+        file = request.files['file']
+        return file.filename, file.stream, None
+    
+    filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+    filename = urllib.parse.unquote(filename)
+    return filename, request.stream, None
+
+def get_import_options(values, analyzer, filename, user_id=None):
+    """
+    解析导入参数（表单、查询参数或JSON请求体）
+    
+    Returns:
+        (options, error_message) - options 包含 table_name / mode / key_columns / chunk_size /
+        dictionary_encode / date_parts / excel_dates / csv_format
+    """
+    # 导入模式：replace 新建表；append / upsert 写入 table_name 指定的已有表（upsert 需提供 key_columns）
+    mode = str(values.get('mode') or 'replace').strip().lower()
+    if mode not in IMPORT_MODES:
+        return None, f"不支持的导入模式: {mode}（可选: {', '.join(IMPORT_MODES)}）"
+    
+    key_columns = [col.strip() for col in str(values.get('key_columns') or '').split(',') if col.strip()]
+    if mode == 'replace':
+        # 生成动态表名（基于文件名）
+        table_name = analyzer._generate_table_name(filename)
+    else:
+        table_name = str(values.get('table_name') or '').strip()
+        if not table_name:
+            return None, f"{mode} 模式需要通过 table_name 指定目标表"
+        if mode == 'upsert' and not key_columns:
+            return None, "upsert 模式需要通过 key_columns 指定键列（逗号分隔）"
+    
+    try:
+        chunk_size = int(values.get('chunk_size'))
+    except (TypeError, ValueError):
+        chunk_size = None  # 未提供或无法解析时使用默认块大小
+    
+    return {
+        "table_name": table_name,
+        "mode": mode,
+        "key_columns": key_columns,
+        "chunk_size": chunk_size,
+        # 可选：低基数文本列字典编码（以同名视图提供，数据库更小）
+        "dictionary_encode": is_truthy(values.get('dictionary_encode', '')),
+        # 可选：为日期列生成 _year / _month / _day 派生列
+        "date_parts": is_truthy(values.get('date_parts', '')),
+        # 可选：把列名以 date / dt / 日期 结尾、取值为 Excel 日期序列号的整数列转换为日期（会覆盖原数值）
+        "excel_dates": is_truthy(values.get('excel_dates', '')),
+        # 可选：复用 /api/preview-file 识别的编码、分隔符和列类型（过期或不属于当前用户时导入时重新识别）
+        "csv_format": preview_cache.get_format(values.get('preview_id'), user_id)
+    }, None
+
+def submit_import_job(user_data, analyzer, stream, raw_filename, filename, table_name,
+                      user_db_path, user_uploads_dir, chunk_size, persist_raw, dataset_cache=None,
+                      mode="replace", key_columns=None, dictionary_encode=False, date_parts=False,
+                      excel_dates=False, sample_first=False, csv_format=None):
+    """
+    将上传内容落盘后提交后台导入任务，返回 202 和任务信息（命中数据集缓存时直接返回导入结果）
+    
+    sample_first 时先对落盘的文件抽样，样本表以目标表名立即可查询，后台全量导入完成后原子替换
+    """
+    if not os.path.exists(user_uploads_dir):
+        os.makedirs(user_uploads_dir)
+    
+    # 请求结束后上传流即被关闭，后台任务需要从文件读取；落盘的同时计算内容指纹
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_path = str(user_uploads_dir / f"{timestamp}_{filename}")
+    fingerprint, file_size = copy_with_fingerprint(stream, file_path)
+    
+    def cleanup():
+        if not persist_raw and os.path.exists(file_path):
+            os.remove(file_path)
+    
+    if dataset_cache is not None:
+        result = analyzer.import_cached_dataset(dataset_cache, fingerprint, raw_filename, user_db_path)
+        if result is not None:
+            cleanup()
+            return upload_success_response(result, user_data, user_db_path, table_name)
+    
+    sample = None
+    if sample_first:
+        sample = analyzer.import_sample_table(file_path, raw_filename, table_name, user_db_path,
+                                              date_parts=date_parts, excel_dates=excel_dates)
+        if not sample["success"]:
+            cleanup()
+            return jsonify(sample), 400
+    
+    job = ImportJob(user_data['user_id'], raw_filename, table_name, total_bytes=file_size)
+    
+    def work(job):
+        with open(file_path, 'rb') as f:
+            if sample_first:
+                return analyzer.load_full_after_sample(f, raw_filename, table_name, user_db_path,
+                                                       chunk_size=chunk_size, progress_callback=job.update_progress,
+                                                       date_parts=date_parts, excel_dates=excel_dates,
+                                                       csv_format=csv_format)
+            return analyzer.import_file_stream(f, raw_filename, table_name, user_db_path,
+                                               chunk_size=chunk_size, progress_callback=job.update_progress,
+                                               dataset_cache=dataset_cache, fingerprint=fingerprint,
+                                               source_bytes=file_size, mode=mode, key_columns=key_columns,
+                                               dictionary_encode=dictionary_encode, date_parts=date_parts,
+                                               excel_dates=excel_dates, csv_format=csv_format)
+    
+    try:
+        import_job_manager.submit(job, work, cleanup)
+    except ImportQueueFull as e:
+        cleanup()
+        if sample is not None:
+            analyzer.delete_table(table_name)
+        return jsonify({"success": False, "message": str(e)}), 429
+    
+    return jsonify({
+        "success": True,
+        "message": sample["message"] if sample else "导入任务已提交",
+        "data": {
+            "job_id": job.job_id,
+            "table_name": table_name,
+            "sample": sample,
+            "status_url": f"/api/upload/jobs/{job.job_id}",
+            "events_url": f"/api/upload/jobs/{job.job_id}/events",
+            "job": job.to_dict(),
+            "user_info": user_data
+        }
+    }), 202
+
+def upload_success_response(result, user_data, user_db_path, table_name):
+    """构造上传成功的响应"""
+    return jsonify({
+        "success": True,
+        "message": result["message"],
+        "data": {
+            "rows_imported": result.get("rows_imported", 0),
+            "columns": result.get("columns", []),
+            "table_name": result.get("table_name", table_name),
+            "tables": result.get("tables", []),
+            "mode": result.get("mode", "replace"),
+            "db_path": user_db_path,
+            "file_format": result.get("file_format"),
+            "encoding": result.get("encoding"),
+            "import_stats": result.get("import_stats", {}),
+            "raw_file_path": result.get("raw_file_path"),
+            "cache_hit": result.get("cache_hit", False),
+            "cache": result.get("cache"),
+            "user_info": user_data
+        }
+    })
+
 @app.route('/api/upload', methods=['POST'])
 @allow_default_user
 def upload_csv(user_data):
-    """上传CSV文件并导入到用户专属数据库"""
+    """上传数据文件（CSV 及其压缩包 / Excel / Parquet / Arrow IPC）并以流式方式直接导入到用户专属数据库"""
     try:
         api_key = user_data.get('api_key')
         if not api_key:
@@ -216,19 +407,19 @@ def upload_csv(user_data):
         analyzer = get_user_analyzer(user_data, api_key)
         
         # 检查文件
-        if 'file' not in request.files:
-            return jsonify({"success": False, "message": "未找到文件"}), 400
+        raw_filename, stream, error_message = get_upload_source()
+        if error_message:
+            return jsonify({"success": False, "message": error_message}), 400
         
-        file = request.files['file']
-        if file.filename == '':
+        if not raw_filename:
             return jsonify({"success": False, "message": "未选择文件"}), 400
         
-        # 检查文件格式 - 只支持CSV
-        file_ext = os.path.splitext(file.filename.lower())[1]
-        if file_ext != '.csv':
+        # 检查文件格式
+        file_ext = os.path.splitext(raw_filename.lower())[1]
+        if get_file_format(raw_filename) is None:
             return jsonify({
                 "success": False, 
-                "message": f"只支持CSV文件格式，当前文件格式: {file_ext}"
+                "message": f"只支持 {', '.join(SUPPORTED_FORMATS)} 文件格式，当前文件格式: {file_ext}"
             }), 400
         
         # 获取用户路径
@@ -236,54 +427,459 @@ def upload_csv(user_data):
         user_db_path = str(user_paths['db_path'])
         user_uploads_dir = user_paths['uploads_dir']
         
-        # 确保上传目录存在
-        if not os.path.exists(user_uploads_dir):
-            os.makedirs(user_uploads_dir)
+        filename = secure_filename(raw_filename)
+        
+        # 仅在用户明确要求时保留原始文件
+        persist_raw = is_truthy(request.values.get('persist_raw', ''))
+        raw_copy_path = None
+        if persist_raw:
+            if not os.path.exists(user_uploads_dir):
+                os.makedirs(user_uploads_dir)
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            raw_copy_path = str(user_uploads_dir / f"{timestamp}_{filename}")
+        
+        options, error_message = get_import_options(request.values, analyzer, filename, user_data['user_id'])
+        if error_message:
+            return jsonify({"success": False, "message": error_message}), 400
+        table_name = options["table_name"]
+        mode = options["mode"]
+        key_columns = options["key_columns"]
+        chunk_size = options["chunk_size"]
+        dictionary_encode = options["dictionary_encode"]
+        date_parts = options["date_parts"]
+        excel_dates = options["excel_dates"]
+        csv_format = options["csv_format"]
+        
+        # 可选：样本优先导入（先生成可立即查询的样本表，全量数据在后台导入后替换样本）
+        sample_first = is_truthy(request.values.get('sample_first', ''))
+        if sample_first and (mode != 'replace' or dictionary_encode):
+            return jsonify({"success": False, "message": "样本优先导入只支持 replace 模式，且不能与字典编码同时使用"}), 400
+        
+        # 按内容指纹去重（可通过 dedupe=false 强制重新导入；追加类导入、字典编码、派生日期列和转换 Excel 日期的导入不去重，
+        # 缓存中保存的是按默认方式导入的表）
+        dataset_cache = None
+        if (mode == 'replace' and not dictionary_encode and not date_parts and not excel_dates and not sample_first
+                and is_truthy(request.values.get('dedupe', 'true'))):
+            dataset_cache = get_user_dataset_cache(user_data)
+        
+        # 异步模式：先落盘后立即返回任务ID，导入在后台任务池中执行
+        # 样本优先导入需要先落盘抽样，总是走异步模式
+        if sample_first or is_truthy(request.values.get('async', '')):
+            return submit_import_job(user_data, analyzer, stream, raw_filename, filename, table_name,
+                                     user_db_path, user_uploads_dir, chunk_size, persist_raw, dataset_cache,
+                                     mode=mode, key_columns=key_columns, dictionary_encode=dictionary_encode,
+                                     date_parts=date_parts, excel_dates=excel_dates, sample_first=sample_first,
+                                     csv_format=csv_format)
+        
+        # 客户端提供了内容指纹时先查缓存，命中则无需读取和解析上传内容
+        result = None
+        fingerprint = request.values.get('fingerprint', '').strip().lower()
+        if dataset_cache is not None and fingerprint:
+            result = analyzer.import_cached_dataset(dataset_cache, fingerprint, raw_filename, user_db_path)
+            if result is not None and raw_copy_path:
+                with open(raw_copy_path, 'wb') as f:
+                    shutil.copyfileobj(stream, f, Config.UPLOAD_COPY_BUFFER_SIZE)
+                result["raw_file_path"] = raw_copy_path
+        
+        if result is None:
+            # 边读取上传流边导入数据库（可通过 chunk_size 参数调整分块行数），
+            # 启用去重时在同一遍读取中计算内容指纹并写入数据集缓存
+            result = analyzer.import_file_stream(stream, raw_filename, table_name, user_db_path,
+                                                 chunk_size=chunk_size, raw_copy_path=raw_copy_path,
+                                                 dataset_cache=dataset_cache, mode=mode, key_columns=key_columns,
+                                                 dictionary_encode=dictionary_encode, date_parts=date_parts,
+                                                 excel_dates=excel_dates, csv_format=csv_format)
         
-        # 保存文件到用户专属目录
-        filename = secure_filename(file.filename)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        safe_filename = f"{timestamp}_{filename}"
-        file_path = user_uploads_dir / safe_filename
+        if result["success"]:
+            return upload_success_response(result, user_data, user_db_path, table_name)
+        else:
+            return jsonify(result), 400
+            
+    except Exception as e:
+        print(f"❌ 上传失败: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": f"上传失败: {str(e)}",
+            "user_info": user_data
+        }), 500
+
+@app.route('/api/preview-file', methods=['POST'])
+@allow_default_user
+def preview_file(user_data):
+    """
+    上传预览：只解析CSV开头的有限字节，返回识别的编码/分隔符、列类型、样本行和数据质量提示（不导入数据库）
+    
+    返回的 preview_id 可在随后的 /api/upload 或分片上传会话中传入，导入时直接复用识别结果
+    """
+    try:
+        api_key = user_data.get('api_key')
+        if not api_key:
+            return jsonify({"success": False, "message": "未提供API密钥"}), 400
         
-        file.save(str(file_path))
+        analyzer = get_user_analyzer(user_data, api_key)
         
-        # 生成动态表名（基于文件名）
-        table_name = analyzer._generate_table_name(filename)
+        raw_filename, stream, error_message = get_upload_source()
+        if error_message:
+            return jsonify({"success": False, "message": error_message}), 400
+        if not raw_filename:
+            return jsonify({"success": False, "message": "未选择文件"}), 400
+        
+        # 可寻址的上传文件直接取大小，原始请求体按 Content-Length（用于估算总行数）
+        try:
+            position = stream.tell()
+            file_size = stream.seek(0, os.SEEK_END)
+            stream.seek(position)
+        except Exception:
+            file_size = request.content_length
+        
+        result = analyzer.preview_file_stream(stream, raw_filename, file_size=file_size)
+        if not result["success"]:
+            return jsonify(result), 400
+        
+        preview_id = preview_cache.put(user_data['user_id'], raw_filename, result.pop("csv_format"))
+        message = result.pop("message")
+        result.pop("success")
+        result["preview_id"] = preview_id
+        return jsonify({"success": True, "message": message, "data": result})
+    
+    except Exception as e:
+        print(f"❌ 文件预览失败: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": f"文件预览失败: {str(e)}",
+            "user_info": user_data
+        }), 500
+
+@app.route('/api/upload/batch', methods=['POST'])
+@allow_default_user
+def upload_csv_batch(user_data):
+    """批量上传多个CSV文件，多进程并行解析后一次性合并到用户数据库"""
+    batch_dir = None
+    try:
+        api_key = user_data.get('api_key')
+        if not api_key:
+            return jsonify({"success": False, "message": "未提供API密钥"}), 400
         
-        # 导入数据库
-        result = analyzer.import_csv_to_sqlite(str(file_path), table_name, user_db_path)
+        analyzer = get_user_analyzer(user_data, api_key)
         
-        if result["success"]:
-            # 清理临时文件
-            try:
-                os.remove(str(file_path))
-            except:
-                pass
+        files = [f for f in request.files.getlist('files') if f and f.filename]
+        if not files:
+            return jsonify({"success": False, "message": "未找到文件（请使用 files 字段上传）"}), 400
+        
+        if len(files) > Config.BATCH_MAX_FILES:
+            return jsonify({
+                "success": False,
+                "message": f"单次最多上传 {Config.BATCH_MAX_FILES} 个文件，当前 {len(files)} 个"
+            }), 400
+        
+        invalid = [f.filename for f in files if os.path.splitext(f.filename.lower())[1] != '.csv']
+        if invalid:
+            return jsonify({
+                "success": False,
+                "message": f"只支持CSV文件格式，以下文件不符合: {', '.join(invalid)}"
+            }), 400
+        
+        # 获取用户路径
+        user_paths = user_manager.get_user_paths(user_data['user_id'])
+        user_db_path = str(user_paths['db_path'])
+        
+        # 工作进程需要从磁盘读取文件
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        batch_dir = user_paths['uploads_dir'] / f"batch_{timestamp}_{os.getpid()}"
+        batch_dir.mkdir(parents=True, exist_ok=True)
+        
+        batch_files = []
+        used_table_names = set()
+        for index, file in enumerate(files):
+            filename = secure_filename(file.filename)
+            file_path = batch_dir / f"{index:03d}_{filename}"
+            file.save(str(file_path))
+            
+            # 同一秒内生成的表名可能重复，追加序号保证唯一
+            table_name = analyzer._generate_table_name(filename)
+            if table_name in used_table_names:
+                table_name = f"{table_name}_{index + 1}"
+            used_table_names.add(table_name)
             
+            batch_files.append({"path": str(file_path), "filename": file.filename, "table_name": table_name})
+        
+        chunk_size = request.values.get('chunk_size', type=int)
+        result = analyzer.import_csv_batch(batch_files, user_db_path, chunk_size=chunk_size, staging_root=str(batch_dir))
+        
+        if result["success"]:
             return jsonify({
                 "success": True,
                 "message": result["message"],
                 "data": {
-                    "rows_imported": result.get("rows_imported", 0),
-                    "columns": result.get("columns", []),
-                    "table_name": table_name,
+                    "tables": result["tables"],
+                    "rows_imported": result["rows_imported"],
+                    "total_tables": result["total_tables"],
+                    "batch_stats": result["batch_stats"],
                     "db_path": user_db_path,
-                    "file_format": result.get("file_format", ".csv"),
                     "user_info": user_data
                 }
             })
         else:
             return jsonify(result), 400
-            
+    
     except Exception as e:
-        print(f"❌ 上传失败: {str(e)}")
+        print(f"❌ 批量上传失败: {str(e)}")
         return jsonify({
             "success": False,
-            "message": f"上传失败: {str(e)}",
+            "message": f"批量上传失败: {str(e)}",
+            "user_info": user_data
+        }), 500
+    finally:
+        if batch_dir is not None:
+            shutil.rmtree(str(batch_dir), ignore_errors=True)
+
+def get_user_import_job(user_data, job_id):
+    """获取属于当前用户的导入任务，不存在或无权限时返回 None"""
+    job = import_job_manager.get_job(job_id)
+    if not job or job.user_id != user_data['user_id']:
+        return None
+    return job
+
+@app.route('/api/upload/jobs/<job_id>', methods=['GET'])
+@allow_default_user
+def get_import_job(user_data, job_id):
+    """轮询导入任务进度"""
+    job = get_user_import_job(user_data, job_id)
+    if not job:
+        return jsonify({"success": False, "message": "导入任务不存在"}), 404
+    
+    return jsonify({"success": True, "data": job.to_dict()})
+
+@app.route('/api/upload/jobs/<job_id>/events', methods=['GET'])
+@allow_default_user
+def stream_import_job_events(user_data, job_id):
+    """以SSE方式推送导入任务进度（已处理行数、已读字节、预计剩余时间），任务结束后关闭"""
+    job = get_user_import_job(user_data, job_id)
+    if not job:
+        return jsonify({"success": False, "message": "导入任务不存在"}), 404
+    
+    def generate_events():
+        version = -1
+        while True:
+            new_version = job.wait_for_change(version, timeout=Config.IMPORT_EVENT_HEARTBEAT)
+            if new_version == version:
+                # 无进度变化时发送心跳，保持连接
+                yield ": heartbeat\n\n"
+                continue
+            version = new_version
+            yield f"data: {json.dumps({'type': 'progress', 'job': job.to_dict()}, ensure_ascii=False)}\n\n"
+            if job.is_finished:
+                break
+    
+    return Response(
+        stream_with_context(generate_events()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive',
+            'X-Accel-Buffering': 'no',
+            'Access-Control-Allow-Origin': '*'
+        }
+    )
+
+@app.route('/api/upload/jobs/<job_id>/cancel', methods=['POST'])
+@allow_default_user
+def cancel_import_job(user_data, job_id):
+    """取消导入任务（已写入的数据随事务回滚）"""
+    job = get_user_import_job(user_data, job_id)
+    if not job:
+        return jsonify({"success": False, "message": "导入任务不存在"}), 404
+    
+    if not import_job_manager.cancel(job_id):
+        return jsonify({"success": False, "message": f"任务已结束，无法取消（状态: {job.status}）"}), 400
+    
+    return jsonify({"success": True, "message": "已请求取消导入任务", "data": job.to_dict()})
+
+def get_user_upload_session(user_data, session_id):
+    """获取属于当前用户的分片上传会话，不存在或无权限时返回 None"""
+    session = upload_session_manager.get(session_id)
+    if not session or session.user_id != user_data['user_id']:
+        return None
+    return session
+
+def upload_session_response(session):
+    """分片上传会话信息及后续请求的地址"""
+    data = session.to_dict()
+    data.update({
+        "part_url": f"/api/upload/sessions/{session.session_id}/parts/{{part_number}}",
+        "complete_url": f"/api/upload/sessions/{session.session_id}/complete",
+        "status_url": f"/api/upload/jobs/{session.job.job_id}" if session.job else None,
+        "events_url": f"/api/upload/jobs/{session.job.job_id}/events" if session.job else None
+    })
+    return data
+
+@app.route('/api/upload/sessions', methods=['POST'])
+@allow_default_user
+def create_upload_session(user_data):
+    """
+    创建分片上传会话（大文件断点续传）
+    
+    客户端按 part_size 切分文件，逐个 PUT 到 part_url（请求头 X-Part-Checksum 为分片的 SHA-256），
+    断线后通过 GET 会话得到 missing_parts 补传，全部上传后调用 complete_url。
+    上传期间不占用导入线程和数据库写事务，complete 校验通过后才提交导入任务；
+    MAX_CONTENT_LENGTH 限制的是文件总大小，而不是单个请求
+    """
+    try:
+        api_key = user_data.get('api_key')
+        if not api_key:
+            return jsonify({"success": False, "message": "未提供API密钥"}), 400
+        
+        analyzer = get_user_analyzer(user_data, api_key)
+        values = request.get_json(silent=True) or request.values
+        
+        raw_filename = str(values.get('filename') or '').strip()
+        if not raw_filename:
+            return jsonify({"success": False, "message": "未提供文件名"}), 400
+        if get_file_format(raw_filename) is None:
+            return jsonify({
+                "success": False,
+                "message": f"只支持 {', '.join(SUPPORTED_FORMATS)} 文件格式，当前文件格式: {os.path.splitext(raw_filename.lower())[1]}"
+            }), 400
+        
+        try:
+            total_size = int(values.get('total_size'))
+            part_size = int(values['part_size']) if values.get('part_size') else None
+        except (TypeError, ValueError):
+            return jsonify({"success": False, "message": "total_size / part_size 必须是整数（字节）"}), 400
+        
+        filename = secure_filename(raw_filename)
+        options, error_message = get_import_options(values, analyzer, filename, user_data['user_id'])
+        if error_message:
+            return jsonify({"success": False, "message": error_message}), 400
+        
+        user_paths = user_manager.get_user_paths(user_data['user_id'])
+        
+        # 导入参数随会话保存，complete() 之后才提交导入任务
+        options["persist_raw"] = is_truthy(values.get('persist_raw', ''))
+        session = upload_session_manager.create(user_data['user_id'], raw_filename, total_size,
+                                                str(user_paths['uploads_dir'] / "sessions"), part_size=part_size,
+                                                options=options)
+        
+        return jsonify({
+            "success": True,
+            "message": "上传会话已创建",
+            "data": upload_session_response(session)
+        }), 201
+    
+    except UploadSessionError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    except Exception as e:
+        print(f"❌ 创建上传会话失败: {str(e)}")
+        return jsonify({
+            "success": False,
+            "message": f"创建上传会话失败: {str(e)}",
             "user_info": user_data
         }), 500
 
+@app.route('/api/upload/sessions/<session_id>', methods=['GET'])
+@allow_default_user
+def get_upload_session(user_data, session_id):
+    """查询上传会话：已收到的分片及其校验和、缺失的分片（断线后据此续传）和导入进度"""
+    session = get_user_upload_session(user_data, session_id)
+    if not session:
+        return jsonify({"success": False, "message": "上传会话不存在或已过期"}), 404
+    
+    return jsonify({"success": True, "data": upload_session_response(session)})
+
+@app.route('/api/upload/sessions/<session_id>/parts/<int:part_number>', methods=['PUT'])
+@allow_default_user
+def upload_session_part(user_data, session_id, part_number):
+    """上传一个分片（请求体为分片原始字节，X-Part-Checksum 为其 SHA-256），重复上传同一分片是安全的"""
+    session = get_user_upload_session(user_data, session_id)
+    if not session:
+        return jsonify({"success": False, "message": "上传会话不存在或已过期"}), 404
+    
+    checksum = request.headers.get('X-Part-Checksum') or request.args.get('checksum', '')
+    try:
+        part = session.write_part(part_number, request.stream, checksum)
+    except UploadSessionError as e:
+        return jsonify({"success": False, "message": str(e)}), 400
+    
+    missing_parts = session.missing_parts()
+    return jsonify({
+        "success": True,
+        "message": f"分片 {part_number} 已接收",
+        "data": dict(part, missing_parts=len(missing_parts), next_part=missing_parts[0] if missing_parts else None)
+    })
+
+def submit_session_import(user_data, session):
+    """为已完成上传的会话提交后台导入任务，队列已满时抛出 ImportQueueFull"""
+    analyzer = get_user_analyzer(user_data, user_data.get('api_key'))
+    user_paths = user_manager.get_user_paths(user_data['user_id'])
+    user_db_path = str(user_paths['db_path'])
+    user_uploads_dir = user_paths['uploads_dir']
+    options = session.options
+    job = ImportJob(user_data['user_id'], session.filename, options["table_name"], total_bytes=session.total_size)
+    
+    def work(job):
+        with open(session.file_path, 'rb') as f:
+            result = analyzer.import_file_stream(f, session.filename, options["table_name"], user_db_path,
+                                                 chunk_size=options["chunk_size"],
+                                                 progress_callback=job.update_progress,
+                                                 mode=options["mode"], key_columns=options["key_columns"],
+                                                 dictionary_encode=options["dictionary_encode"],
+                                                 date_parts=options["date_parts"],
+                                                 excel_dates=options["excel_dates"],
+                                                 csv_format=options["csv_format"])
+        if result.get("success") and options["persist_raw"]:
+            # 组装好的文件即原始文件，直接移动到上传目录保留
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            raw_copy_path = str(user_uploads_dir / f"{timestamp}_{secure_filename(session.filename)}")
+            os.replace(session.file_path, raw_copy_path)
+            result["raw_file_path"] = raw_copy_path
+        return result
+    
+    def cleanup():
+        if os.path.exists(session.file_path):
+            os.remove(session.file_path)
+    
+    import_job_manager.submit(job, work, cleanup)
+    session.job = job
+    return job
+
+@app.route('/api/upload/sessions/<session_id>/complete', methods=['POST'])
+@allow_default_user
+def complete_upload_session(user_data, session_id):
+    """确认全部分片已上传（可选提供整个文件的 SHA-256 校验），校验通过后提交导入任务"""
+    session = get_user_upload_session(user_data, session_id)
+    if not session:
+        return jsonify({"success": False, "message": "上传会话不存在或已过期"}), 404
+    
+    data = request.get_json(silent=True) or request.values
+    try:
+        session.complete(data.get('checksum'))
+    except UploadSessionError as e:
+        return jsonify({"success": False, "message": str(e), "data": upload_session_response(session)}), 400
+    
+    try:
+        submit_session_import(user_data, session)
+    except ImportQueueFull as e:
+        # 文件已完整保留，恢复会话状态后客户端可稍后重试 complete
+        session.reopen()
+        return jsonify({"success": False, "message": str(e), "data": upload_session_response(session)}), 429
+    
+    return jsonify({
+        "success": True,
+        "message": "上传已完成，正在导入",
+        "data": upload_session_response(session)
+    }), 202
+
+@app.route('/api/upload/sessions/<session_id>', methods=['DELETE'])
+@allow_default_user
+def abort_upload_session(user_data, session_id):
+    """中止上传会话，进行中的导入随之取消（已写入的数据随事务回滚）"""
+    session = get_user_upload_session(user_data, session_id)
+    if not session:
+        return jsonify({"success": False, "message": "上传会话不存在或已过期"}), 404
+    
+    session.abort("用户中止了上传")
+    return jsonify({"success": True, "message": "上传会话已中止", "data": upload_session_response(session)})
+
 @app.route('/api/tables-info', methods=['GET'])
 @allow_default_user
 def get_tables_info(user_data):
@@ -383,6 +979,12 @@ def delete_table(user_data):
             "user_info": user_data
         }), 500
 
+@app.route('/api/query-cache/stats', methods=['GET'])
+@allow_default_user
+def get_query_cache_stats(user_data):
+    """查询结果缓存统计：条目数、内存占用、命中率和命中节省的查询时间"""
+    return jsonify({"success": True, "data": query_result_cache.stats()})
+
 @app.route('/api/analyze-stream', methods=['POST'])
 @allow_default_user
 def analyze_data_stream(user_data):
@@ -405,6 +1007,9 @@ def analyze_data_stream(user_data):
         if not analyzer.current_db_path:
             return jsonify({"success": False, "message": "请先上传数据文件"}), 400
             
+        # 分析流结束或客户端断开时置位，中断仍在执行的查询
+        cancel_event = threading.Event()
+        
         def generate_stream():
             try:
                 # 检查是否有当前对话，如果没有则返回错误
@@ -457,7 +1062,7 @@ def analyze_data_stream(user_data):
                         system_prompt = custom_system_prompt.format(**format_args)
                     except Exception as e:
                         # 如果格式化失败，追加上下文信息
-                        system_prompt = custom_system_prompt + f"\n\n当前数据库表信息：\n{tables_summary}\n\n可用工具：\n- get_table_info: 获取当前对话中所有表的结构信息\n- query_database: 执行SQL查询获取数据，支持多表查询"
+                        system_prompt = custom_system_prompt + f"\n\n当前数据库表信息：\n{tables_summary}\n\n可用工具：\n- get_table_info: 获取当前对话中所有表的结构信息（含每列统计：空值数、不同值个数、最小/最大值、均值、高频值、直方图）\n- query_database: 执行SQL查询获取数据，支持多表查询"
                 else:
                     system_prompt = Prompts.ANALYSIS_SYSTEM_PROMPT.format(**format_args)
                 
@@ -514,8 +1119,13 @@ def analyze_data_stream(user_data):
                     system_prompt=current_system_prompt,
                     history_manager=history_manager,
                     current_conversation=current_conversation,
-                    max_iterations=Config.MAX_ITERATIONS
+                    max_iterations=Config.MAX_ITERATIONS,
+                    cancel_event=cancel_event
                 ):
+                    if event["type"] == "heartbeat":
+                        # 工具执行期间保持连接，客户端断开时写入失败，生成器随之关闭
+                        yield ": heartbeat\n\n"
+                        continue
                     yield f"data: {json.dumps(event)}\n\n"
                     
             except Exception as e:
@@ -525,6 +1135,8 @@ def analyze_data_stream(user_data):
                 # 记录错误状态
                 if history_manager.current_conversation_id:
                     history_manager.complete_conversation(history_manager.current_conversation_id, 'error', error_msg, 0)
+            finally:
+                cancel_event.set()
                     
         return Response(
             stream_with_context(generate_stream()),
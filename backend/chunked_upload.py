@@ -0,0 +1,254 @@
+# chunked_upload.py - 可断点续传的分片上传会话
+import hashlib
+import os
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+
+from config import Config
+
+
+class UploadSessionError(Exception):
+    """分片上传请求不合法（分片编号越界、大小不符、校验和不匹配等）"""
+
+
+class UploadSession:
+    """
+    单个分片上传会话
+
+    分片按编号写入组装文件的对应偏移处，可以乱序、重复上传（同一分片重传时覆盖），
+    断线后通过 missing_parts() 得知需要补传的分片。上传期间不占用导入线程和数据库写事务，
+    complete() 确认文件完整后才提交导入任务
+    """
+
+    def __init__(self, user_id: str, filename: str, total_size: int, part_size: int,
+                 sessions_dir: str, options: Optional[Dict[str, Any]] = None):
+        self.session_id = f"upload_{uuid.uuid4().hex[:16]}"
+        self.user_id = user_id
+        self.filename = filename
+        self.total_size = total_size
+        self.part_size = part_size
+        self.total_parts = max((total_size + part_size - 1) // part_size, 1)
+        self.file_path = os.path.join(sessions_dir, f"{self.session_id}.upload")
+        self.options = options or {}
+        self.status = 'uploading'
+        self.error = None
+        self.job = None
+        self.created_at = datetime.now().isoformat()
+        self.updated_at = self.created_at
+
+        self._checksums: Dict[int, str] = {}
+        self._last_activity = time.monotonic()
+        self._lock = threading.Lock()
+
+        # 预先创建与总大小一致的（稀疏）文件，分片直接写到各自的偏移处
+        with open(self.file_path, 'wb') as f:
+            f.truncate(total_size)
+
+    def part_length(self, part_number: int) -> int:
+        """分片的期望字节数（最后一个分片可能不足 part_size）"""
+        if part_number == self.total_parts - 1:
+            return self.total_size - part_number * self.part_size
+        return self.part_size
+
+    def write_part(self, part_number: int, stream, checksum: str) -> Dict[str, Any]:
+        """
+        写入一个分片，边读取请求体边计算 SHA-256，与客户端提供的校验和不一致时拒绝
+
+        Args:
+            part_number: 分片编号（从0开始）
+            stream: 分片内容的二进制流
+            checksum: 客户端计算的分片 SHA-256（十六进制）
+
+        Raises:
+            UploadSessionError: 会话已结束、分片编号越界、大小或校验和不符
+        """
+        if self.status != 'uploading':
+            raise UploadSessionError(f"上传会话已结束（状态: {self.status}）")
+        if not 0 <= part_number < self.total_parts:
+            raise UploadSessionError(f"分片编号超出范围: {part_number}（共 {self.total_parts} 个分片）")
+        checksum = (checksum or '').strip().lower()
+        if not checksum:
+            raise UploadSessionError("缺少分片校验和（X-Part-Checksum，SHA-256）")
+
+        expected = self.part_length(part_number)
+        offset = part_number * self.part_size
+        digest = hashlib.sha256()
+        received = 0
+        # 先写入独立的临时文件，校验通过后再写入组装文件，校验失败的分片不会覆盖已到达的内容
+        part_path = f"{self.file_path}.{part_number}.part"
+        try:
+            with open(part_path, 'wb') as part_file:
+                while True:
+                    data = stream.read(Config.UPLOAD_COPY_BUFFER_SIZE)
+                    if not data:
+                        break
+                    received += len(data)
+                    if received > expected:
+                        raise UploadSessionError(f"分片 {part_number} 超过期望大小 {expected} 字节")
+                    digest.update(data)
+                    part_file.write(data)
+            if received != expected:
+                raise UploadSessionError(f"分片 {part_number} 大小不符：期望 {expected} 字节，实际 {received} 字节")
+            if digest.hexdigest() != checksum:
+                raise UploadSessionError(f"分片 {part_number} 校验和不匹配，请重新上传该分片")
+
+            with self._lock:
+                if self.status != 'uploading':
+                    raise UploadSessionError(f"上传会话已结束（状态: {self.status}）")
+                with open(part_path, 'rb') as part_file, open(self.file_path, 'r+b') as f:
+                    f.seek(offset)
+                    shutil.copyfileobj(part_file, f, Config.UPLOAD_COPY_BUFFER_SIZE)
+                self._checksums[part_number] = checksum
+                self._touch()
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        return {"part_number": part_number, "size": received, "checksum": checksum}
+
+    def _touch(self):
+        """记录最近一次活动时间（调用方需持有 _lock）"""
+        self._last_activity = time.monotonic()
+        self.updated_at = datetime.now().isoformat()
+
+    def missing_parts(self) -> List[int]:
+        with self._lock:
+            return [n for n in range(self.total_parts) if n not in self._checksums]
+
+    def complete(self, checksum: Optional[str] = None):
+        """
+        确认所有分片已上传；提供整个文件的 SHA-256 时先校验组装结果，
+        校验通过后会话进入 completed 状态，调用方随后提交导入任务
+
+        Raises:
+            UploadSessionError: 仍有分片缺失或整体校验和不匹配
+        """
+        missing = self.missing_parts()
+        if missing:
+            shown = ', '.join(str(n) for n in missing[:20])
+            raise UploadSessionError(f"仍有 {len(missing)} 个分片未上传: {shown}")
+
+        if checksum:
+            digest = hashlib.sha256()
+            with open(self.file_path, 'rb') as f:
+                for data in iter(lambda: f.read(Config.UPLOAD_COPY_BUFFER_SIZE), b''):
+                    digest.update(data)
+            if digest.hexdigest() != checksum.strip().lower():
+                self.abort("文件整体校验和不匹配")
+                raise UploadSessionError("文件整体校验和不匹配，上传会话已中止")
+
+        with self._lock:
+            if self.status != 'uploading':
+                raise UploadSessionError(f"上传会话已结束（状态: {self.status}）")
+            self.status = 'completed'
+            self._touch()
+
+    def reopen(self):
+        """导入任务未能提交（如队列已满）时恢复为上传中，客户端稍后可再次调用 complete()"""
+        with self._lock:
+            if self.status == 'completed' and self.job is None:
+                self.status = 'uploading'
+                self._touch()
+
+    def abort(self, reason: str = "上传会话已中止"):
+        """中止会话：已提交的导入任务随之取消，写入的数据随事务回滚"""
+        with self._lock:
+            if self.status == 'aborted':
+                return
+            self.status = 'aborted'
+            self.error = reason
+            self._touch()
+        if self.job is not None and not self.job.is_finished:
+            self.job.cancel_event.set()
+
+    def idle_seconds(self) -> float:
+        with self._lock:
+            return time.monotonic() - self._last_activity
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            received = sorted(self._checksums)
+            return {
+                "session_id": self.session_id,
+                "filename": self.filename,
+                "status": self.status,
+                "total_size": self.total_size,
+                "part_size": self.part_size,
+                "total_parts": self.total_parts,
+                "received_parts": received,
+                "missing_parts": [n for n in range(self.total_parts) if n not in self._checksums],
+                "checksums": {str(n): self._checksums[n] for n in received},
+                "received_bytes": sum(self.part_length(n) for n in received),
+                "created_at": self.created_at,
+                "updated_at": self.updated_at,
+                "error": self.error,
+                "job": self.job.to_dict() if self.job is not None else None
+            }
+
+
+class UploadSessionManager:
+    """分片上传会话管理器 - 按用户隔离会话，清理长时间无活动的会话"""
+
+    def __init__(self):
+        self._sessions: Dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+
+    def _prune_sessions(self):
+        """中止并移除过期的会话（调用方需持有 _lock）"""
+        for session_id, session in list(self._sessions.items()):
+            idle = session.idle_seconds()
+            if session.status == 'uploading' and idle > Config.UPLOAD_SESSION_TTL:
+                session.abort("上传会话已过期")
+            if session.status != 'uploading' and idle > Config.UPLOAD_SESSION_TTL \
+                    and (session.job is None or session.job.is_finished):
+                del self._sessions[session_id]
+                if os.path.exists(session.file_path):
+                    os.remove(session.file_path)
+
+    def create(self, user_id: str, filename: str, total_size: int, sessions_dir: str,
+               part_size: Optional[int] = None, options: Optional[Dict[str, Any]] = None) -> UploadSession:
+        """
+        创建上传会话（总大小受 MAX_CONTENT_LENGTH 限制，单个分片受 UPLOAD_PART_MAX_SIZE 限制）
+
+        Raises:
+            UploadSessionError: 文件或分片大小不合法、会话数已达上限
+        """
+        if total_size <= 0:
+            raise UploadSessionError("文件大小必须大于0")
+        if total_size > Config.MAX_CONTENT_LENGTH:
+            raise UploadSessionError(f"文件大小超过上限 {Config.MAX_CONTENT_LENGTH // 1024 // 1024} MB")
+        part_size = part_size or Config.UPLOAD_PART_SIZE
+        if not 0 < part_size <= Config.UPLOAD_PART_MAX_SIZE:
+            raise UploadSessionError(f"分片大小需在 1 ~ {Config.UPLOAD_PART_MAX_SIZE} 字节之间")
+
+        with self._lock:
+            self._prune_sessions()
+            active = sum(1 for s in self._sessions.values() if s.user_id == user_id and s.status == 'uploading')
+            if active >= Config.UPLOAD_MAX_SESSIONS:
+                raise UploadSessionError(f"进行中的上传会话已达上限（{active} 个），请先完成或中止已有会话")
+            os.makedirs(sessions_dir, exist_ok=True)
+            session = UploadSession(user_id, filename, total_size, part_size, sessions_dir, options)
+            self._sessions[session.session_id] = session
+        print(f"📦 已创建分片上传会话: {session.session_id} ({filename}, {total_size} 字节, "
+              f"{session.total_parts} 个分片)")
+        return session
+
+    def get(self, session_id: str) -> Optional[UploadSession]:
+        with self._lock:
+            self._prune_sessions()
+            return self._sessions.get(session_id)
+
+    def remove(self, session_id: str):
+        """移除会话并删除组装文件（导入任务结束后调用）"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None and os.path.exists(session.file_path):
+            os.remove(session.file_path)
+
+
+# 全局分片上传会话管理器实例
+upload_session_manager = UploadSessionManager()
@@ -0,0 +1,306 @@
+# column_stats.py - 导入时流式计算的列统计目录（_column_stats）
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+# 列统计目录表名（下划线开头，不会出现在用户表列表中）
+COLUMN_STATS_TABLE = "_column_stats"
+
+_NUMERIC_TYPES = ("INTEGER", "REAL")
+
+# 64位哈希空间大小，用于由第k小哈希值估算不同值个数
+_HASH_SPACE = float(2 ** 64)
+
+
+class _ColumnState:
+    """单列的累积状态"""
+
+    def __init__(self, column_type: str):
+        self.column_type = column_type
+        self.rows = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+        self.numeric_count = 0
+        self.numeric_sum = 0.0
+        self.hashes = np.empty(0, dtype=np.uint64)  # 已见到的最小的k个不同哈希值（升序）
+        self.counts = pd.Series(dtype='float64')  # 高频值候选及其出现次数
+        self.sample_keys = np.empty(0, dtype=np.float64)
+        self.sample_values = np.empty(0, dtype=np.float64)
+
+
+class ColumnStatsCollector:
+    """
+    列统计收集器 - 导入时逐块调用 update()，全部写入后调用 finish() 得到每列统计
+
+    每块数据按列做一次向量化处理，内存占用与总行数无关：
+    - 最小/最大值、均值、空值数：逐块累加
+    - 不同值个数：KMV（k个最小哈希值）近似计数，不同值少于k个时为精确值
+    - 高频值：每块 value_counts 后合并，只保留有限个候选（大基数列上为近似值）
+    - 直方图：数值列维护固定大小的均匀蓄水池样本，结束时按全量最小/最大值分桶
+    """
+
+    def __init__(self, column_types: Dict[str, str], top_k: int = Config.COLUMN_STATS_TOP_K,
+                 histogram_bins: int = Config.COLUMN_STATS_HISTOGRAM_BINS,
+                 sketch_size: int = Config.COLUMN_STATS_SKETCH_SIZE,
+                 sample_size: int = Config.COLUMN_STATS_SAMPLE_SIZE,
+                 tracked_values: int = Config.COLUMN_STATS_TRACKED_VALUES):
+        self.top_k = top_k
+        self.histogram_bins = histogram_bins
+        self.sketch_size = sketch_size
+        self.sample_size = sample_size
+        self.tracked_values = tracked_values
+        self._random = np.random.RandomState(0)
+        self._states = {col: _ColumnState((col_type or "TEXT").upper()) for col, col_type in column_types.items()}
+
+    def update(self, chunk: pd.DataFrame):
+        """累积一个数据块（列名需与构造时给定的一致）"""
+        for col, state in self._states.items():
+            self._update_column(state, chunk[col])
+
+    def _update_column(self, state: _ColumnState, series: pd.Series):
+        non_null = series.dropna()
+        state.rows += len(series)
+        state.nulls += len(series) - len(non_null)
+        if not len(non_null):
+            return
+
+        if state.column_type in _NUMERIC_TYPES:
+            numeric = pd.to_numeric(non_null, errors='coerce')
+            values = numeric.dropna().astype('float64')
+            if len(values):
+                state.numeric_count += len(values)
+                state.numeric_sum += float(values.sum())
+                self._sample(state, values.to_numpy())
+            # 无法转为数字的值（保留原文存储的）按文本参与计数
+            keys = values if len(values) == len(non_null) else numeric.astype(object).where(numeric.notna(), non_null.astype(str))
+        else:
+            keys = non_null.astype(str)
+
+        counts = keys.value_counts()
+        self._update_range(state, counts.index)
+        self._update_sketch(state, counts.index)
+
+        # value_counts 已按次数降序，只合并靠前的候选
+        counts = counts.iloc[:self.tracked_values]
+        merged = state.counts.add(counts, fill_value=0) if len(state.counts) else counts.astype('float64')
+        if len(merged) > self.tracked_values:
+            merged = merged.nlargest(self.tracked_values)
+        state.counts = merged
+
+    @staticmethod
+    def _update_range(state: _ColumnState, values: pd.Index):
+        try:
+            low, high = values.min(), values.max()
+        except TypeError:
+            # 数值与文本混杂时按文本比较
+            text = values.astype(str)
+            low, high = text.min(), text.max()
+        if state.min is None or _less(low, state.min):
+            state.min = low
+        if state.max is None or _less(state.max, high):
+            state.max = high
+
+    def _update_sketch(self, state: _ColumnState, values: pd.Index):
+        hashes = pd.util.hash_pandas_object(pd.Series(values), index=False).to_numpy()
+        if len(state.hashes) >= self.sketch_size:
+            # 只有比当前第k小哈希更小的值才可能进入草图
+            hashes = hashes[hashes < state.hashes[-1]]
+            if not len(hashes):
+                return
+        state.hashes = np.union1d(state.hashes, hashes)[:self.sketch_size]
+
+    def _sample(self, state: _ColumnState, values: np.ndarray):
+        """蓄水池抽样：给每个值一个随机键，保留键最小的 sample_size 个值"""
+        keys = self._random.random_sample(len(values))
+        if len(state.sample_keys) >= self.sample_size:
+            keep = keys < state.sample_keys.max()
+            keys, values = keys[keep], values[keep]
+            if not len(keys):
+                return
+        keys = np.concatenate([state.sample_keys, keys])
+        values = np.concatenate([state.sample_values, values])
+        if len(keys) > self.sample_size:
+            selected = np.argpartition(keys, self.sample_size - 1)[:self.sample_size]
+            keys, values = keys[selected], values[selected]
+        state.sample_keys, state.sample_values = keys, values
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """
+        Returns:
+            每列的统计（按列顺序）：column、type、row_count、null_count、distinct_count、distinct_exact、
+            min、max、mean（数值列）、top_values、histogram（数值列）
+        """
+        results = []
+        for col, state in self._states.items():
+            exact = len(state.hashes) < self.sketch_size
+            if exact:
+                distinct = len(state.hashes)
+            else:
+                # 估算值可能超过实际非空行数，按非空行数封顶
+                distinct = min(int(round((self.sketch_size - 1) * _HASH_SPACE / float(state.hashes[-1]))),
+                               state.rows - state.nulls)
+
+            top_values = [
+                {"value": self._plain(state, value), "count": int(count)}
+                for value, count in state.counts.nlargest(self.top_k).items() if count > 1
+            ] if len(state.counts) else []
+
+            results.append({
+                "column": col,
+                "type": state.column_type,
+                "row_count": state.rows,
+                "null_count": state.nulls,
+                "distinct_count": distinct,
+                "distinct_exact": exact,
+                "min": self._plain(state, state.min),
+                "max": self._plain(state, state.max),
+                "mean": round(state.numeric_sum / state.numeric_count, 6) if state.numeric_count else None,
+                "top_values": top_values,
+                "histogram": self._histogram(state)
+            })
+        return results
+
+    def _histogram(self, state: _ColumnState) -> Optional[Dict[str, List]]:
+        """按全量最小/最大值等宽分桶，桶内计数由样本按比例放大到全部数值行"""
+        if not len(state.sample_values):
+            return None
+        low, high = float(state.sample_values.min()), float(state.sample_values.max())
+        if isinstance(state.min, (int, float, np.number)) and isinstance(state.max, (int, float, np.number)):
+            low, high = float(state.min), float(state.max)
+        bins = self.histogram_bins if high > low else 1
+        counts, edges = np.histogram(state.sample_values, bins=bins, range=(low, high))
+        scale = state.numeric_count / len(state.sample_values)
+        return {
+            "edges": [round(float(edge), 6) for edge in edges],
+            "counts": [int(round(count * scale)) for count in counts]
+        }
+
+    @staticmethod
+    def _plain(state: _ColumnState, value):
+        """转换为可JSON序列化的Python值，整数列的浮点值还原为整数"""
+        if value is None:
+            return None
+        if isinstance(value, np.generic):
+            value = value.item()
+        if state.column_type == "INTEGER" and isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+
+def _less(a, b) -> bool:
+    try:
+        return a < b
+    except TypeError:
+        return str(a) < str(b)
+
+
+def collect_table_stats(conn: sqlite3.Connection, table_name: str,
+                        chunk_size: int = Config.IMPORT_CHUNK_SIZE) -> List[Dict[str, Any]]:
+    """对已有表分块读取并计算列统计（追加/更新导入后，统计需覆盖整表而非只是新数据）"""
+    column_types = {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info(`{table_name}`)").fetchall()}
+    collector = ColumnStatsCollector(column_types)
+    for chunk in pd.read_sql_query(f"SELECT * FROM `{table_name}`", conn, chunksize=chunk_size):
+        collector.update(chunk)
+    return collector.finish()
+
+
+def _ensure_stats_table(cursor: sqlite3.Cursor, schema: str = "main"):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.{COLUMN_STATS_TABLE} (
+            table_name TEXT NOT NULL,
+            column_name TEXT NOT NULL,
+            position INTEGER,
+            column_type TEXT,
+            row_count INTEGER,
+            null_count INTEGER,
+            distinct_count INTEGER,
+            distinct_exact INTEGER,
+            min_value,
+            max_value,
+            mean REAL,
+            top_values TEXT,
+            histogram TEXT,
+            computed_at TEXT,
+            PRIMARY KEY (table_name, column_name)
+        )
+    """)
+
+
+def _stats_table_exists(cursor: sqlite3.Cursor, schema: str = "main") -> bool:
+    return cursor.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type='table' AND name=?",
+                          (COLUMN_STATS_TABLE,)).fetchone() is not None
+
+
+def save_column_stats(cursor: sqlite3.Cursor, table_name: str, stats: List[Dict[str, Any]]):
+    """写入（替换）表的列统计，应与数据写入处于同一事务中"""
+    _ensure_stats_table(cursor)
+    cursor.execute(f"DELETE FROM {COLUMN_STATS_TABLE} WHERE table_name = ?", (table_name,))
+    now = datetime.now().isoformat()
+    cursor.executemany(f"""
+        INSERT INTO {COLUMN_STATS_TABLE} (table_name, column_name, position, column_type, row_count, null_count,
+                                          distinct_count, distinct_exact, min_value, max_value, mean,
+                                          top_values, histogram, computed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (table_name, stat["column"], position, stat["type"], stat["row_count"], stat["null_count"],
+         stat["distinct_count"], int(stat["distinct_exact"]), stat["min"], stat["max"], stat["mean"],
+         json.dumps(stat["top_values"], ensure_ascii=False),
+         json.dumps(stat["histogram"]) if stat["histogram"] is not None else None, now)
+        for position, stat in enumerate(stats)
+    ])
+
+
+def load_column_stats(cursor: sqlite3.Cursor, table_name: str) -> Dict[str, Dict[str, Any]]:
+    """读取表的列统计：列名 -> 统计；没有统计时返回空字典"""
+    if not _stats_table_exists(cursor):
+        return {}
+    stats = {}
+    for row in cursor.execute(f"""
+        SELECT column_name, row_count, null_count, distinct_count, distinct_exact, min_value, max_value,
+               mean, top_values, histogram, computed_at
+        FROM {COLUMN_STATS_TABLE} WHERE table_name = ? ORDER BY position
+    """, (table_name,)).fetchall():
+        stats[row[0]] = {
+            "row_count": row[1],
+            "null_count": row[2],
+            "distinct_count": row[3],
+            "distinct_exact": bool(row[4]),
+            "min": row[5],
+            "max": row[6],
+            "mean": row[7],
+            "top_values": json.loads(row[8]) if row[8] else [],
+            "histogram": json.loads(row[9]) if row[9] else None,
+            "computed_at": row[10]
+        }
+    return stats
+
+
+def delete_column_stats(cursor: sqlite3.Cursor, table_name: Optional[str] = None, schema: str = "main"):
+    """删除表的列统计（table_name 为 None 时清空整个目录）"""
+    if not _stats_table_exists(cursor, schema):
+        return
+    if table_name is None:
+        cursor.execute(f"DELETE FROM {schema}.{COLUMN_STATS_TABLE}")
+    else:
+        cursor.execute(f"DELETE FROM {schema}.{COLUMN_STATS_TABLE} WHERE table_name = ?", (table_name,))
+
+
+def copy_column_stats(cursor: sqlite3.Cursor, src_schema: str, src_table: str, dst_schema: str, dst_table: str):
+    """表在库之间复制时一并复制其列统计（源库没有统计时只清除目标表的旧统计）"""
+    delete_column_stats(cursor, dst_table, dst_schema)
+    if not _stats_table_exists(cursor, src_schema):
+        return
+    _ensure_stats_table(cursor, dst_schema)
+    cursor.execute(f"""
+        INSERT INTO {dst_schema}.{COLUMN_STATS_TABLE}
+        SELECT ?, column_name, position, column_type, row_count, null_count, distinct_count, distinct_exact,
+               min_value, max_value, mean, top_values, histogram, computed_at
+        FROM {src_schema}.{COLUMN_STATS_TABLE} WHERE table_name = ?
+    """, (dst_table, src_table))
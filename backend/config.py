@@ -12,5 +12,76 @@ class Config:
     MAX_CONTENT_LENGTH = 100 * 1024 * 1024  # 100MB
     MAX_ITERATIONS = 100
     
+    # 数据导入配置
+    IMPORT_CHUNK_SIZE = 50000  # 每批读取/写入的行数，决定导入时的内存上限
+    ENCODING_SAMPLE_BYTES = 256 * 1024  # 编码检测读取的文件开头字节数
+    IMPORT_CACHE_SIZE_KB = 64 * 1024  # 导入期间SQLite页缓存大小（KB）
+    SQLITE_WAL_MODE = True  # 数据库使用WAL日志模式：导入写入期间查询照常读取已提交的数据
+    SQLITE_WAL_SIZE_LIMIT = 64 * 1024 * 1024  # 检查点后WAL文件保留的最大字节数（大批量导入后截断）
+    QUERY_POOL_MAX_IDLE = 4  # 每个数据库保留的空闲只读连接数
+    QUERY_POOL_IDLE_TIMEOUT = 300  # 只读连接空闲超过该时间（秒）后关闭
+    QUERY_POOL_CACHED_STATEMENTS = 256  # 每个只读连接缓存的预编译语句数
+    QUERY_MMAP_SIZE = 256 * 1024 * 1024  # 只读连接的内存映射大小（字节）
+    QUERY_CACHE_SIZE_KB = 32 * 1024  # 每个只读连接的页缓存大小（KB）
+    QUERY_MAX_ROWS = 1000  # 单次查询返回给模型的最大行数，超出部分截断
+    QUERY_MAX_RESULT_BYTES = 256 * 1024  # 单次查询返回结果的最大字节数（按值的文本长度估算）
+    QUERY_FETCH_BATCH_ROWS = 200  # 读取查询结果时每批 fetchmany 的行数
+    QUERY_COUNT_SCAN_ROWS = 100000  # 结果被截断后在同一游标上继续计数的行数上限，超过时只报告总行数的下限
+    QUERY_TIMEOUT_SECONDS = 30  # 单次查询的执行时间上限（秒），超时后中断并提示模型缩小查询范围
+    QUERY_PROGRESS_STEPS = 10000  # 每执行多少条SQLite虚拟机指令检查一次超时和取消
+    QUERY_HEARTBEAT_SECONDS = 2  # 工具执行期间分析流发送心跳的间隔（秒），用于及时发现客户端断开
+    TOOL_EXECUTION_WORKERS = 4  # 同一轮中并发执行工具调用的线程数（每个调用各自借用一个只读连接，不宜超过 QUERY_POOL_MAX_IDLE）
+    QUERY_RESULT_CACHE_ENABLED = True  # 缓存只读查询结果，数据未变化时重复查询直接返回
+    QUERY_RESULT_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 查询结果缓存的内存上限（估算）
+    IMPORT_WORKERS = 2  # 异步导入任务的工作线程数
+    IMPORT_QUEUE_SIZE = 8  # 除运行中任务外允许排队的导入任务数
+    IMPORT_JOB_TTL = 3600  # 已结束导入任务的状态保留时间（秒）
+    IMPORT_EVENT_HEARTBEAT = 15  # 导入进度SSE无变化时的心跳间隔（秒）
+    UPLOAD_COPY_BUFFER_SIZE = 1024 * 1024  # 上传内容落盘时的缓冲区大小
+    MAX_DECOMPRESSED_BYTES = 2 * 1024 * 1024 * 1024  # 压缩上传解压后的数据量上限（MAX_CONTENT_LENGTH 限制的是压缩后的大小）
+    SPOOL_MAX_MEMORY = 8 * 1024 * 1024  # 需要随机访问的格式（Parquet等）缓存时，超过该大小写入临时文件
+    BATCH_IMPORT_WORKERS = 4  # 批量导入时并行解析的进程数（SQLite 最多同时 ATTACH 10 个库，不宜超过 8）
+    BATCH_MAX_FILES = 50  # 单次批量上传的最大文件数
+    UPLOAD_DEDUP_ENABLED = True  # 按内容指纹复用已导入的数据集，重复上传同一文件时跳过解析
+    DATASET_CACHE_MAX_BYTES = 1024 * 1024 * 1024  # 每个用户数据集缓存的容量上限（按原始文件大小计）
+    UPLOAD_PART_SIZE = 8 * 1024 * 1024  # 分片上传的默认分片大小
+    UPLOAD_PART_MAX_SIZE = 32 * 1024 * 1024  # 客户端可指定的最大分片大小（需小于 MAX_CONTENT_LENGTH）
+    UPLOAD_SESSION_TTL = 3600  # 分片上传会话无新分片到达的最长时间（秒），超时后会话中止
+    UPLOAD_MAX_SESSIONS = 4  # 每个用户同时进行中的分片上传会话数
+    SAMPLE_FIRST_ROWS = 10000  # 样本优先导入时先生成的样本表行数
+    DELIMITER_SNIFF_ROWS = 50  # 识别CSV分隔符时解析的开头记录数
+    PREVIEW_MAX_BYTES = 1024 * 1024  # 上传预览只解析文件开头的字节数（解压后，不小于 ENCODING_SAMPLE_BYTES）
+    PREVIEW_HEAD_ROWS = 20  # 上传预览返回的样本行数
+    PREVIEW_TTL = 1800  # 预览结果保留时间（秒），期间导入同一文件可复用识别结果
+    PREVIEW_CACHE_SIZE = 64  # 最多保留的预览结果数
+    
+    # 自动索引配置（导入后按列画像建立索引）
+    AUTO_INDEX_ENABLED = True  # 导入完成后是否自动建立索引并执行 ANALYZE
+    AUTO_INDEX_BUDGET_RATIO = 1.0  # 自动索引总大小上限（相对表数据大小的比例）
+    AUTO_INDEX_MAX_PER_TABLE = 6  # 每张表最多自动创建的索引数
+    AUTO_INDEX_SAMPLE_ROWS = 100000  # 列画像采样的行数
+    AUTO_INDEX_MIN_ROWS = 1000  # 行数少于该值的表不建索引（全表扫描已足够快）
+    AUTO_INDEX_MAX_KEY_LENGTH = 64  # 平均长度超过该值的文本列不建索引
+    AUTO_INDEX_CATEGORY_MAX_RATIO = 0.2  # 不同值占比不超过该值的文本列视为分类列
+    ANALYZE_LIMIT = 1000  # ANALYZE 每个索引的采样行数（PRAGMA analysis_limit）
+    
+    # 列统计配置（导入时流式计算，存入 _column_stats）
+    COLUMN_STATS_ENABLED = True  # 导入时是否计算列统计
+    COLUMN_STATS_TOP_K = 5  # 每列保存的高频值个数
+    COLUMN_STATS_TRACKED_VALUES = 1000  # 统计高频值时每列最多跟踪的候选值个数
+    COLUMN_STATS_HISTOGRAM_BINS = 10  # 数值列直方图的分桶数
+    COLUMN_STATS_SKETCH_SIZE = 1024  # 近似去重计数保留的最小哈希个数（误差约 3%，不同值少于该数时为精确值）
+    COLUMN_STATS_SAMPLE_SIZE = 10000  # 计算直方图用的数值蓄水池样本大小
+    
+    # 字典编码配置（导入时可选，将低基数文本列存为整数编码）
+    DICT_ENCODE_MAX_VALUES = 1000  # 不同值个数超过该值的列不编码
+    DICT_ENCODE_MAX_RATIO = 0.05  # 首块中不同值占非空行的比例不超过该值的文本列才编码
+    DICT_ENCODE_CASE_MAX_VALUES = 16  # 不同值不超过该数时视图用 CASE 还原，否则关联字典表
+    
+    # 日期规整配置
+    DATE_DETECT_MIN_RATIO = 0.95  # 首块中能按已知日期格式解析的非空值比例不低于该值时视为日期列
+    EXCEL_SERIAL_MIN = 20000  # Excel 日期序列号的识别范围（约 1954-10-03）
+    EXCEL_SERIAL_MAX = 73051  # （2099-12-31）
+    
     # API配置
     DEFAULT_API_TIMEOUT = 60
@@ -0,0 +1,197 @@
+# connection_pool.py - 按数据库路径复用的只读SQLite连接池（查询之间保留页缓存和预编译语句缓存）
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple, Any
+from urllib.request import pathname2url
+
+from config import Config
+
+
+class ExecutionBudget:
+    """查询的执行预算状态：reason 为 'timeout'（超时）或 'cancelled'（被取消）时查询已被中断"""
+
+    def __init__(self, timeout: float, cancel_event: Optional[threading.Event] = None):
+        self.deadline = time.monotonic() + timeout
+        self.cancel_event = cancel_event
+        self.reason: Optional[str] = None
+
+    def check(self) -> int:
+        """SQLite 进度回调：返回非零值时中断当前语句"""
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.reason = "cancelled"
+            return 1
+        if time.monotonic() > self.deadline:
+            self.reason = "timeout"
+            return 1
+        return 0
+
+
+@contextmanager
+def execution_budget(conn: sqlite3.Connection, timeout: float, cancel_event: Optional[threading.Event] = None):
+    """
+    在连接上安装进度回调，执行超过 timeout 秒或 cancel_event 被置位时中断语句
+    （被中断的语句抛出 sqlite3.OperationalError: interrupted）；退出时移除回调，连接可继续复用
+
+    Yields:
+        ExecutionBudget，语句被中断后可由 reason 区分超时和取消
+    """
+    budget = ExecutionBudget(timeout, cancel_event)
+    conn.set_progress_handler(budget.check, Config.QUERY_PROGRESS_STEPS)
+    try:
+        yield budget
+    finally:
+        conn.set_progress_handler(None, 0)
+
+
+class ReadConnectionPool:
+    """
+    单个数据库文件的只读连接池
+
+    连接以 mode=ro 打开，设置 mmap_size / cache_size / temp_store，创建时 check_same_thread=False：
+    同一时刻只借给一个线程，归还后可被任意线程复用，页缓存、内存映射和预编译语句在查询之间保留。
+    空闲超过 QUERY_POOL_IDLE_TIMEOUT 的连接由后台线程关闭；数据库文件被删除重建（新对话重置）后，
+    按文件标识（设备号 + inode）识别并丢弃指向旧文件的连接
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._idle: List[Tuple[sqlite3.Connection, float]] = []
+        self._lock = threading.Lock()
+        self._file_id = None
+        self._generation = 0
+        self.opened = 0
+        self.reused = 0
+
+    def _stat_file_id(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.db_path)
+        except OSError:
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _open(self) -> sqlite3.Connection:
+        if not os.path.exists(self.db_path):
+            # 与 sqlite3.connect 的行为一致：数据库不存在时创建空库
+            sqlite3.connect(self.db_path).close()
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                               cached_statements=Config.QUERY_POOL_CACHED_STATEMENTS)
+        conn.execute(f"PRAGMA mmap_size={int(Config.QUERY_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size=-{int(Config.QUERY_CACHE_SIZE_KB)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """借出一个只读连接，退出时归还（空闲连接数达到上限或文件已被替换时直接关闭）"""
+        file_id = self._stat_file_id()
+        stale = []
+        conn = None
+        with self._lock:
+            if file_id != self._file_id:
+                stale, self._idle = self._idle, []
+                self._file_id = file_id
+                self._generation += 1
+            if self._idle:
+                conn = self._idle.pop()[0]
+                self.reused += 1
+            generation = self._generation
+        for stale_conn, _ in stale:
+            stale_conn.close()
+
+        if conn is None:
+            conn = self._open()
+            with self._lock:
+                self.opened += 1
+                if self._file_id is None:
+                    # 连接时才创建了数据库文件
+                    self._file_id = self._stat_file_id()
+
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            with self._lock:
+                if generation == self._generation and len(self._idle) < Config.QUERY_POOL_MAX_IDLE:
+                    self._idle.append((conn, time.monotonic()))
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close_idle(self, max_idle_seconds: float) -> int:
+        """关闭空闲超过 max_idle_seconds 的连接，返回关闭的个数"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [conn for conn, since in self._idle if now - since > max_idle_seconds]
+            self._idle = [(conn, since) for conn, since in self._idle if now - since <= max_idle_seconds]
+        for conn in expired:
+            conn.close()
+        return len(expired)
+
+    def invalidate(self):
+        """关闭所有空闲连接，借出中的连接归还时关闭（数据库文件即将被删除或清空时调用）"""
+        with self._lock:
+            stale, self._idle = self._idle, []
+            self._file_id = None
+            self._generation += 1
+        for conn, _ in stale:
+            conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+
+class ConnectionPoolManager:
+    """只读连接池管理器 - 每个数据库路径一个连接池，后台线程定期关闭长时间空闲的连接"""
+
+    def __init__(self):
+        self._pools: Dict[str, ReadConnectionPool] = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def get(self, db_path: str) -> ReadConnectionPool:
+        key = os.path.abspath(str(db_path))
+        with self._lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                pool = self._pools[key] = ReadConnectionPool(key)
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_idle, name="sqlite-pool-reaper", daemon=True)
+                self._reaper.start()
+        return pool
+
+    def connection(self, db_path: str):
+        """借出 db_path 的只读连接（上下文管理器）"""
+        return self.get(db_path).connection()
+
+    def invalidate(self, db_path: str):
+        """丢弃 db_path 的所有连接（删除、重建数据库文件前调用）"""
+        with self._lock:
+            pool = self._pools.get(os.path.abspath(str(db_path)))
+        if pool is not None:
+            pool.invalidate()
+
+    def _reap_idle(self):
+        interval = max(Config.QUERY_POOL_IDLE_TIMEOUT / 2, 1)
+        while True:
+            time.sleep(interval)
+            with self._lock:
+                pools = list(self._pools.values())
+            for pool in pools:
+                closed = pool.close_idle(Config.QUERY_POOL_IDLE_TIMEOUT)
+                if closed:
+                    print(f"🔌 已关闭 {closed} 个空闲的只读连接: {pool.db_path}")
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            pools = dict(self._pools)
+        return {path: pool.stats() for path, pool in pools.items()}
+
+
+# 全局只读连接池管理器实例
+connection_pools = ConnectionPoolManager()
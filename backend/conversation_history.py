@@ -8,6 +8,8 @@ import uuid
 import logging
 from config import Config
 from prompts import Prompts
+from connection_pool import connection_pools
+from query_cache import query_result_cache
 
 class ConversationHistoryManager:
     """对话历史记录管理器 - 存储用户查询历史"""
@@ -663,6 +665,8 @@ class ConversationHistoryManager:
             # 删除数据库文件（如果存在）
             db_path = Path(conv_info['db_path'])
             if db_path.exists():
+                connection_pools.invalidate(db_path)
+                query_result_cache.invalidate(db_path)
                 try:
                     db_path.unlink()
                     logging.info(f"删除数据库文件: {db_path}")
@@ -872,8 +876,15 @@ class ConversationHistoryManager:
             
             # 方法1: 如果文件存在，先删除它
             if analysis_db_path.exists():
+                connection_pools.invalidate(analysis_db_path)
+                query_result_cache.invalidate(analysis_db_path)
                 try:
                     os.remove(analysis_db_path)
+                    # WAL 模式下的日志和共享内存文件属于旧库，一并删除
+                    for suffix in ('-wal', '-shm'):
+                        sidecar = f"{analysis_db_path}{suffix}"
+                        if os.path.exists(sidecar):
+                            os.remove(sidecar)
                     logging.info("✅ 已删除旧的analysis.db文件")
                 except Exception as e:
                     logging.warning(f"⚠️ 删除旧文件失败: {e}")
@@ -882,6 +893,11 @@ class ConversationHistoryManager:
                         with sqlite3.connect(analysis_db_path) as conn:
                             cursor = conn.cursor()
                             
+                            # 先删除视图（字典编码的表以视图提供，依赖下面删除的基表）
+                            cursor.execute("SELECT name FROM sqlite_master WHERE type='view'")
+                            for (view_name,) in cursor.fetchall():
+                                cursor.execute(f"DROP VIEW IF EXISTS `{view_name}`")
+                            
                             # 获取所有表名
                             cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
                             tables = cursor.fetchall()
@@ -906,6 +922,9 @@ class ConversationHistoryManager:
             # 方法2: 创建一个全新的空数据库文件
             try:
                 with sqlite3.connect(analysis_db_path) as conn:
+                    if Config.SQLITE_WAL_MODE:
+                        # 新库直接使用WAL日志模式，导入期间查询不被阻塞
+                        conn.execute("PRAGMA journal_mode=WAL")
                     cursor = conn.cursor()
                     # 创建一个简单的元数据表来标记数据库已初始化
                     cursor.execute('''
@@ -0,0 +1,1372 @@
+# data_importer.py - 分块流式数据导入引擎
+import bz2
+import codecs
+import csv
+import gzip
+import hashlib
+import io
+import itertools
+import json
+import lzma
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import Counter
+from contextlib import contextmanager
+from datetime import date, datetime, time as dt_time, timedelta
+from typing import Dict, List, Optional, Any, Iterable, Callable
+
+import openpyxl
+import pandas as pd
+import xlrd
+
+from config import Config
+from column_stats import (ColumnStatsCollector, collect_table_stats, save_column_stats, delete_column_stats,
+                          copy_column_stats)
+from dictionary_encoding import DictionaryEncoder, choose_columns, drop_table, rename_table, base_table_name
+from date_normalizer import (detect_temporal_type, normalize_temporal, plan_date_parts, existing_date_parts,
+                             add_date_parts)
+from query_cache import bump_table_version
+
+try:
+    import resource
+except ImportError:  # Windows 下没有 resource 模块
+    resource = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # 列式格式为可选功能，未安装 pyarrow 时仅支持CSV
+    pa = None
+
+# 支持的上传格式：扩展名 -> 导入方式
+SUPPORTED_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'arrow',
+    '.feather': 'arrow',
+    '.ipc': 'arrow',
+    '.arrows': 'arrow',
+    '.xlsx': 'excel',
+    '.xls': 'excel',
+    '.csv.gz': 'csv',
+    '.csv.bz2': 'csv',
+    '.csv.xz': 'csv',
+    '.zip': 'csv',
+}
+
+# 压缩格式：扩展名 -> 压缩算法（上传时边解压边导入）
+COMPRESSED_FORMATS = {
+    '.csv.gz': 'gzip',
+    '.csv.bz2': 'bz2',
+    '.csv.xz': 'xz',
+    '.zip': 'zip',
+}
+
+
+# 导入模式：替换整表 / 追加到已有表 / 按键列插入或更新已有表
+IMPORT_MODES = ('replace', 'append', 'upsert')
+
+# replace 模式先写入暂存表（下划线开头，不出现在用户表列表中），写完后在短事务中改名替换
+STAGING_PREFIX = "_staging_"
+
+# 追加到已有表时允许的列类型组合（目标列类型 -> 可接受的新数据类型）
+_COMPATIBLE_TYPES = {
+    "INTEGER": {"INTEGER"},
+    "REAL": {"REAL", "INTEGER"},
+    "DATE": {"DATE"},
+    "DATETIME": {"DATETIME", "DATE"},
+}
+
+
+def get_file_format(filename: str) -> Optional[str]:
+    """根据文件名返回受支持的格式扩展名（如 .csv、.parquet、.csv.gz），不支持时返回 None"""
+    name = str(filename).lower()
+    # 优先匹配较长的复合扩展名（.csv.gz 先于 .gz）
+    for ext in sorted(SUPPORTED_FORMATS, key=len, reverse=True):
+        if name.endswith(ext):
+            return ext
+    return None
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """获取当前进程的常驻内存（RSS），无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        pass
+
+    if resource is not None:
+        # 非 Linux 平台退化为进程峰值内存（macOS 单位为字节，其余为KB）
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    return None
+
+
+# 带BOM的编码，按BOM长度从长到短检查
+_BOM_ENCODINGS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# 无BOM时依次尝试的候选编码；gb18030 是 gbk/gb2312 的超集，latin1 可解码任意字节作为兜底
+_CANDIDATE_ENCODINGS = ['utf-8', 'gb18030', 'latin1']
+
+# 采样之后出现的非法字节交给该错误处理器，避免整文件重读
+DECODE_FALLBACK_HANDLER = 'data_importer_fallback'
+
+_decode_state = threading.local()
+
+
+def _decode_fallback(error: UnicodeDecodeError):
+    """
+    解码错误回退策略：先尝试把出错字节按 gb18030 解码（常见于UTF-8文件中混入的GBK行），
+    仍失败则替换为 U+FFFD；按线程记录回退次数供导入统计使用
+    """
+    raw = error.object[error.start:error.end + 3]
+    if error.encoding.replace('_', '-').lower() in ('utf-8', 'utf8'):
+        for length in (2, 4):
+            try:
+                text = bytes(raw[:length]).decode('gb18030')
+            except UnicodeDecodeError:
+                continue
+            _decode_state.fallbacks = getattr(_decode_state, 'fallbacks', 0) + 1
+            return text, error.start + length
+
+    _decode_state.replacements = getattr(_decode_state, 'replacements', 0) + 1
+    return '\ufffd', error.start + 1
+
+
+codecs.register_error(DECODE_FALLBACK_HANDLER, _decode_fallback)
+
+
+def detect_encoding(sample: bytes) -> str:
+    """
+    根据文件开头的有限字节样本判断编码
+
+    Args:
+        sample: 文件开头的字节（大小由 Config.ENCODING_SAMPLE_BYTES 限定）
+
+    Returns:
+        可用于解码整个文件的编码名称
+    """
+    for bom, encoding in _BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+
+    for encoding in _CANDIDATE_ENCODINGS:
+        # 使用增量解码器，样本末尾被截断的多字节字符不算错误
+        decoder = codecs.getincrementaldecoder(encoding)()
+        try:
+            decoder.decode(sample, final=False)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+
+    return 'latin1'
+
+
+# 候选分隔符，按优先级排列（各候选一致性相同时取靠前的）
+_CANDIDATE_DELIMITERS = [',', '\t', ';', '|']
+
+
+def sniff_delimiter(text: str) -> str:
+    """
+    根据文件开头的文本判断CSV分隔符：用每个候选分隔符解析前若干条记录，
+    取字段数大于1且各记录字段数最一致的候选（无法判断时为逗号）
+    """
+    best, best_consistency = ',', 0.0
+    for delimiter in _CANDIDATE_DELIMITERS:
+        try:
+            # 最后一条记录可能被截断，不参与判断
+            widths = [len(row) for row in itertools.islice(
+                csv.reader(io.StringIO(text), delimiter=delimiter), Config.DELIMITER_SNIFF_ROWS)][:-1]
+        except csv.Error:
+            continue
+        if not widths:
+            continue
+        width, count = Counter(widths).most_common(1)[0]
+        consistency = count / len(widths)
+        if width > 1 and consistency > best_consistency:
+            best, best_consistency = delimiter, consistency
+    return best
+
+
+def _is_seekable(stream) -> bool:
+    if isinstance(stream, tempfile.SpooledTemporaryFile):
+        return True  # Python 3.11 之前的 SpooledTemporaryFile 没有 seekable()
+    try:
+        return bool(stream.seekable())
+    except Exception:
+        return False
+
+
+@contextmanager
+def _seekable_source(source, raw_copy_path: Optional[str] = None):
+    """
+    为需要随机访问的格式（Parquet、Arrow 文件、Excel）提供可寻址的数据源：
+    不可寻址的流（或需要保留原始文件时）先复制到临时文件，超过 SPOOL_MAX_MEMORY 后落盘
+    """
+    if _is_seekable(source) and not raw_copy_path:
+        yield source
+        return
+
+    with tempfile.SpooledTemporaryFile(max_size=Config.SPOOL_MAX_MEMORY) as spooled:
+        shutil.copyfileobj(source, spooled, Config.UPLOAD_COPY_BUFFER_SIZE)
+        if raw_copy_path:
+            spooled.seek(0)
+            with open(raw_copy_path, 'wb') as raw_file:
+                shutil.copyfileobj(spooled, raw_file, Config.UPLOAD_COPY_BUFFER_SIZE)
+        spooled.seek(0)
+        yield spooled
+
+
+def _read_up_to(stream, size: int) -> bytes:
+    """从流中读取至多 size 字节（网络流单次 read 可能返回不足，需循环读取）"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+
+def open_decompressed(stream, compression: str):
+    """在二进制流上套一层流式解压（gzip / bz2 / xz），不把解压结果整体放入内存或磁盘"""
+    if compression == 'gzip':
+        return gzip.GzipFile(fileobj=stream, mode='rb')
+    if compression == 'bz2':
+        return bz2.BZ2File(stream, mode='rb')
+    if compression == 'xz':
+        return lzma.LZMAFile(stream, mode='rb')
+    raise ValueError(f"不支持的压缩格式: {compression}")
+
+
+def _zip_csv_member(archive: zipfile.ZipFile) -> zipfile.ZipInfo:
+    """选出压缩包中要导入的CSV文件（忽略目录和 macOS 生成的元数据文件）"""
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir()
+        and not info.filename.startswith('__MACOSX/')
+        and not os.path.basename(info.filename).startswith('.')
+        and info.filename.lower().endswith('.csv')
+    ]
+    if not members:
+        raise ValueError("压缩包中没有CSV文件")
+    if len(members) > 1:
+        print(f"⚠️ 压缩包中有 {len(members)} 个CSV文件，只导入第一个: {members[0].filename}")
+    return members[0]
+
+
+class ImportCancelled(Exception):
+    """导入被调用方取消（由进度回调抛出，导入事务随之回滚）"""
+
+
+class UploadStream(io.RawIOBase):
+    """
+    上传数据流包装器：先回放编码检测时已读取的样本，再继续读取底层流，
+    同时统计已读字节数，并可选地把原始字节写入 sink（用于保留原始文件）；
+    指定 max_bytes 时读取量超过上限即中止（用于限制解压后的数据量）
+    """
+
+    def __init__(self, stream, prefix: bytes = b'', sink=None, max_bytes: Optional[int] = None):
+        super().__init__()
+        self._stream = stream
+        self._prefix = prefix
+        self._prefix_pos = 0
+        self._sink = sink
+        self._max_bytes = max_bytes
+        self.bytes_read = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if self._prefix_pos < len(self._prefix):
+            data = self._prefix[self._prefix_pos:self._prefix_pos + len(buffer)]
+            self._prefix_pos += len(data)
+        else:
+            data = self._stream.read(len(buffer))
+        if not data:
+            return 0
+
+        size = len(data)
+        buffer[:size] = data
+        self.bytes_read += size
+        if self._max_bytes is not None and self.bytes_read > self._max_bytes:
+            raise ValueError(f"解压后的数据超过上限 {self._max_bytes // 1024 // 1024} MB")
+        if self._sink is not None:
+            self._sink.write(data)
+        return size
+
+
+class DataImporter:
+    """分块导入器 - 按固定行数分块读取文件并批量写入SQLite，内存占用由块大小决定"""
+
+    def __init__(self, db_path: str, chunk_size: Optional[int] = None,
+                 progress_callback: Optional[Callable[[int, int], None]] = None,
+                 mode: str = 'replace', key_columns: Optional[List[str]] = None,
+                 dictionary_encode: bool = False, date_parts: bool = False, excel_dates: bool = False):
+        """
+        初始化导入器
+
+        Args:
+            db_path: 目标SQLite数据库路径
+            chunk_size: 每块行数（默认使用 Config.IMPORT_CHUNK_SIZE）
+            progress_callback: 每写完一块调用 progress_callback(已导入行数, 已读字节数)，
+                抛出 ImportCancelled 可中断导入
+            mode: 导入模式 - replace（替换整表）、append（追加到已有表）、upsert（按键列插入或更新已有表）
+            key_columns: upsert 模式下用于匹配已有行的键列
+            dictionary_encode: replace 模式下是否对低基数文本列做字典编码（基表 + 字典表 + 同名视图）
+            date_parts: replace 模式下是否为日期列派生 <列名>_year / _month / _day 整数列
+            excel_dates: 是否把列名以 date / dt / 日期 结尾、取值为 Excel 日期序列号的整数列转换为日期
+        """
+        self.db_path = db_path
+        self.chunk_size = int(chunk_size or Config.IMPORT_CHUNK_SIZE)
+        self.progress_callback = progress_callback
+        self.mode = mode
+        self.key_columns = [self.clean_column_name(col) for col in (key_columns or [])]
+        self.dictionary_encode = dictionary_encode
+        self.date_parts = date_parts
+        self.excel_dates = excel_dates
+        if self.chunk_size <= 0:
+            raise ValueError("chunk_size 必须为正整数")
+        if mode not in IMPORT_MODES:
+            raise ValueError(f"不支持的导入模式: {mode}（可选: {', '.join(IMPORT_MODES)}）")
+        if mode == 'upsert' and not self.key_columns:
+            raise ValueError("upsert 模式需要指定键列")
+
+    @staticmethod
+    def clean_column_name(col_name) -> str:
+        """清理列名"""
+        cleaned = str(col_name).strip()
+        cleaned = re.sub(r'[^\w\u4e00-\u9fff]', '_', cleaned)
+        cleaned = re.sub(r'_+', '_', cleaned)
+        cleaned = cleaned.strip('_')
+        return cleaned or 'unnamed_column'
+
+    @classmethod
+    def _clean_columns(cls, columns: Iterable[Any]) -> List[str]:
+        """清理列名并保证唯一（清理后可能出现重名）"""
+        cleaned_columns = []
+        seen = set()
+        for col in columns:
+            name = cls.clean_column_name(col)
+            candidate = name
+            suffix = 2
+            while candidate.lower() in seen:
+                candidate = f"{name}_{suffix}"
+                suffix += 1
+            seen.add(candidate.lower())
+            cleaned_columns.append(candidate)
+        return cleaned_columns
+
+    @staticmethod
+    def _numeric_candidate(series: pd.Series) -> pd.Series:
+        """去掉文本数值中的千分位分隔符和首尾空白，便于识别 "1,234.5" 这类被读成文本的数字"""
+        return series.astype(str).str.strip().str.replace(',', '', regex=False)
+
+    @classmethod
+    def _infer_column_type(cls, series: pd.Series, excel_dates: bool = False) -> str:
+        """
+        根据首块数据推断精确的SQLite列类型
+
+        Returns:
+            INTEGER / REAL / DATE / DATETIME / TEXT 之一
+        """
+        if pd.api.types.is_datetime64_any_dtype(series):
+            return "DATETIME"
+        # 混合格式的日期文本；开启 excel_dates 时还包括列名提示为日期的 Excel 序列号
+        temporal = detect_temporal_type(series, excel_dates)
+        if temporal is not None:
+            return temporal
+
+        if pd.api.types.is_bool_dtype(series) or pd.api.types.is_integer_dtype(series):
+            return "INTEGER"
+        if pd.api.types.is_float_dtype(series):
+            # 含缺失值的整数列会被 pandas 读成浮点
+            non_null = series.dropna()
+            if len(non_null) and (non_null % 1 == 0).all() and non_null.abs().max() < 2 ** 53:
+                return "INTEGER"
+            return "REAL"
+
+        non_null = series.dropna()
+        if not len(non_null):
+            return "TEXT"
+
+        text = non_null.astype(str).str.strip()
+
+        numeric = pd.to_numeric(cls._numeric_candidate(non_null), errors='coerce')
+        if numeric.notna().all():
+            if (numeric % 1 == 0).all() and numeric.abs().max() < 2 ** 53:
+                # 前导零的编码（如 "00123"）保留为文本
+                if not text.str.match(r'^[+-]?0\d').any():
+                    return "INTEGER"
+                return "TEXT"
+            return "REAL"
+
+        return "TEXT"
+
+    @classmethod
+    def _coerce_chunk(cls, chunk: pd.DataFrame, column_types: Dict[str, str]) -> pd.DataFrame:
+        """按推断的列类型规整数据块：文本数值转为数字，日期/时间统一为ISO格式字符串"""
+        chunk = chunk.copy()
+        for col, col_type in column_types.items():
+            if col not in chunk.columns:
+                # 派生列在规整之后才计算
+                continue
+            series = chunk[col]
+            if col_type in ("DATE", "DATETIME"):
+                chunk[col] = normalize_temporal(series, col_type)
+            elif pd.api.types.is_datetime64_any_dtype(series):
+                chunk[col] = series.dt.strftime('%Y-%m-%d %H:%M:%S')
+            elif col_type in ("INTEGER", "REAL") and not (
+                    pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series)):
+                numeric = pd.to_numeric(cls._numeric_candidate(series), errors='coerce')
+                # 无法转换的值保留原文，由SQLite按列亲和性存储
+                chunk[col] = numeric.astype(object).where(numeric.notna(), series)
+        return chunk
+
+    @staticmethod
+    def _chunk_to_rows(chunk: pd.DataFrame) -> List[tuple]:
+        """将DataFrame块转换为可直接 executemany 的行元组（缺失值转为 NULL）"""
+        values = chunk.astype(object)
+        values = values.where(pd.notna(values), None)
+        return list(values.itertuples(index=False, name=None))
+
+    @staticmethod
+    def _apply_import_pragmas(conn: sqlite3.Connection) -> Dict[str, Any]:
+        """
+        切换到批量导入用的PRAGMA（WAL 或内存日志、关闭同步、加大页缓存）
+
+        Returns:
+            导入前的设置，供导入结束后恢复
+        """
+        previous = {
+            "synchronous": conn.execute("PRAGMA synchronous").fetchone()[0],
+            "cache_size": conn.execute("PRAGMA cache_size").fetchone()[0],
+        }
+        if Config.SQLITE_WAL_MODE:
+            # WAL 是库文件的持久属性，导入结束后保持不变
+            enable_wal(conn)
+        else:
+            previous["journal_mode"] = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.execute("PRAGMA journal_mode=MEMORY")
+        conn.execute("PRAGMA synchronous=OFF")
+        conn.execute(f"PRAGMA cache_size=-{int(Config.IMPORT_CACHE_SIZE_KB)}")
+        return previous
+
+    @staticmethod
+    def _restore_pragmas(conn: sqlite3.Connection, previous: Dict[str, Any]):
+        """恢复导入前的安全设置"""
+        if "journal_mode" in previous:
+            conn.execute(f"PRAGMA journal_mode={previous['journal_mode']}")
+        conn.execute(f"PRAGMA synchronous={int(previous['synchronous'])}")
+        conn.execute(f"PRAGMA cache_size={int(previous['cache_size'])}")
+
+    def import_csv(self, source, table_name: str, encoding: Optional[str] = None,
+                   raw_copy_path: Optional[str] = None, compression: Optional[str] = None,
+                   csv_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        以分块方式将CSV导入到指定表（整体在一个事务中完成，失败时回滚）
+
+        source 可以是文件路径，也可以是二进制流（如上传请求的输入流）：
+        流会边读取边解析边写入，无需先落盘。编码未指定时由开头的字节样本判断，分隔符同样由样本识别，只解析一次；
+        样本之后出现的非法字节由回退策略处理，不会触发整文件重读
+
+        压缩文件边解压边解析，解压后的数据不落盘；解压总量受 Config.MAX_DECOMPRESSED_BYTES 限制。
+        zip 的文件目录位于末尾，压缩包本身需先缓存为可寻址的文件
+
+        Args:
+            source: CSV文件路径或二进制可读流
+            table_name: 目标表名（已存在则替换）
+            encoding: 文件编码（可选，默认自动检测）
+            raw_copy_path: 同时保存原始字节的文件路径（可选，压缩上传时保存压缩包本身）
+            compression: 压缩算法（gzip / bz2 / xz / zip，可选）
+            csv_format: 预览得到的编码、分隔符和列类型（可选，见 preview_csv）；
+                文件开头与预览时一致才复用，否则重新识别
+
+        Returns:
+            导入统计信息，包括行数、列名、编码、分隔符、耗时、吞吐量和峰值内存
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.import_csv(f, table_name, encoding, raw_copy_path, compression, csv_format)
+
+        if compression == 'zip':
+            with _seekable_source(source, raw_copy_path) as archive_file, zipfile.ZipFile(archive_file) as archive:
+                member = _zip_csv_member(archive)
+                if member.file_size > Config.MAX_DECOMPRESSED_BYTES:
+                    raise ValueError(f"解压后的数据超过上限 {Config.MAX_DECOMPRESSED_BYTES // 1024 // 1024} MB")
+                with archive.open(member) as member_stream:
+                    result = self._import_csv_stream(member_stream, table_name, encoding,
+                                                     compressed_position=archive_file.tell, csv_format=csv_format)
+            result["import_stats"]["archive_member"] = member.filename
+            return result
+
+        sink = open(raw_copy_path, 'wb') if raw_copy_path else None
+        try:
+            if compression:
+                # 进度按已读取的压缩字节统计，与上传文件大小对应
+                compressed = UploadStream(source, sink=sink)
+                with open_decompressed(compressed, compression) as decompressed:
+                    return self._import_csv_stream(decompressed, table_name, encoding,
+                                                   compressed_position=lambda: compressed.bytes_read,
+                                                   csv_format=csv_format)
+            return self._import_csv_stream(source, table_name, encoding, sink=sink, csv_format=csv_format)
+        finally:
+            if sink is not None:
+                sink.close()
+
+    def _import_csv_stream(self, source, table_name: str, encoding: Optional[str] = None, sink=None,
+                           compressed_position: Optional[Callable[[], int]] = None,
+                           csv_format: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        从（已解压的）二进制流分块导入CSV
+
+        Args:
+            compressed_position: 压缩输入时返回已读压缩字节数的函数，用于进度统计
+            csv_format: 预览得到的编码、分隔符和列类型（可选）
+        """
+        start_time = time.perf_counter()
+        sample = _read_up_to(source, Config.ENCODING_SAMPLE_BYTES)
+        declared_types = None
+        from_preview = bool(csv_format) and csv_format.get("sample_sha256") == hashlib.sha256(sample).hexdigest()
+        if from_preview:
+            # 文件开头与预览时相同，直接沿用预览识别的结果
+            encoding = encoding or csv_format["encoding"]
+            delimiter = csv_format["delimiter"]
+            # 预览时不转换 Excel 日期序列号，开启 excel_dates 的导入重新推断列类型
+            declared_types = None if self.excel_dates else csv_format.get("column_types")
+            print(f"♻️ 沿用预览识别的编码 {encoding}、分隔符 {delimiter!r} 和列类型")
+        else:
+            if csv_format:
+                print("⚠️ 文件开头与预览时不一致，重新识别编码和分隔符")
+            if not encoding:
+                encoding = detect_encoding(sample)
+            delimiter = sniff_delimiter(sample.decode(encoding, errors='replace'))
+        _decode_state.fallbacks = 0
+        _decode_state.replacements = 0
+
+        max_bytes = Config.MAX_DECOMPRESSED_BYTES if compressed_position else None
+        stream = UploadStream(source, prefix=sample, sink=sink, max_bytes=max_bytes)
+        bytes_read = compressed_position or (lambda: stream.bytes_read)
+
+        reader = pd.read_csv(io.BufferedReader(stream), encoding=encoding, sep=delimiter,
+                             encoding_errors=DECODE_FALLBACK_HANDLER, chunksize=self.chunk_size)
+        try:
+            result = self._load_chunks(reader, table_name,
+                                       on_chunk=lambda rows: self._report_progress(rows, bytes_read()),
+                                       declared_types=declared_types)
+        finally:
+            reader.close()
+
+        elapsed = time.perf_counter() - start_time
+        result["encoding"] = encoding
+        result["delimiter"] = delimiter
+        result["import_stats"].update({
+            "format_from_preview": from_preview,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(result["rows_imported"] / elapsed, 1) if elapsed > 0 else None,
+            "bytes_read": bytes_read(),
+            "decode_fallbacks": _decode_state.fallbacks,
+            "decode_replacements": _decode_state.replacements
+        })
+        if compressed_position:
+            result["import_stats"]["decompressed_bytes"] = stream.bytes_read
+        return result
+
+    @staticmethod
+    def _arrow_sqlite_type(arrow_type) -> str:
+        """将Arrow类型映射为SQLite列类型"""
+        if pa.types.is_dictionary(arrow_type):
+            arrow_type = arrow_type.value_type
+        if pa.types.is_boolean(arrow_type) or pa.types.is_integer(arrow_type):
+            return "INTEGER"
+        if pa.types.is_floating(arrow_type) or pa.types.is_decimal(arrow_type):
+            return "REAL"
+        if pa.types.is_date(arrow_type):
+            return "DATE"
+        if pa.types.is_timestamp(arrow_type):
+            return "DATETIME"
+        return "TEXT"
+
+    @staticmethod
+    def _arrow_batch_to_frame(batch) -> pd.DataFrame:
+        """将记录批转换为DataFrame：小数转浮点、字典编码解码、嵌套类型序列化为JSON文本"""
+        columns = {}
+        for name, column in zip(batch.schema.names, batch.columns):
+            arrow_type = column.type
+            if pa.types.is_dictionary(arrow_type):
+                column = column.dictionary_decode()
+                arrow_type = column.type
+            if pa.types.is_decimal(arrow_type):
+                column = column.cast(pa.float64())
+            if pa.types.is_nested(arrow_type):
+                columns[name] = pd.Series(
+                    [json.dumps(value, ensure_ascii=False, default=str) if value is not None else None
+                     for value in column.to_pylist()],
+                    dtype=object
+                )
+            else:
+                columns[name] = column.to_pandas(date_as_object=False)
+        return pd.DataFrame(columns)
+
+    def import_arrow(self, source, table_name: str, file_format: str = '.parquet',
+                     raw_copy_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        按记录批导入 Parquet / Arrow IPC 数据，列类型直接取自文件自带的schema
+
+        内存占用由每批行数（chunk_size）决定；Parquet 与 Arrow 文件格式需要随机访问，
+        不可寻址的流会先缓存到临时文件
+
+        Args:
+            source: 文件路径或二进制可读流
+            table_name: 目标表名（已存在则替换）
+            file_format: 文件扩展名（.parquet / .arrow / .feather / .ipc / .arrows）
+            raw_copy_path: 同时保存原始字节的文件路径（可选）
+
+        Returns:
+            导入统计信息
+        """
+        if pa is None:
+            raise ValueError("导入 Parquet/Arrow 文件需要安装 pyarrow: pip install pyarrow")
+
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.import_arrow(f, table_name, file_format, raw_copy_path)
+
+        with _seekable_source(source, raw_copy_path) as source:
+            return self._import_arrow_batches(source, table_name, file_format)
+
+    def _import_arrow_batches(self, source, table_name: str, file_format: str) -> Dict[str, Any]:
+        """从可寻址的数据源按记录批导入"""
+        start_time = time.perf_counter()
+
+        if file_format == '.parquet':
+            parquet_file = pq.ParquetFile(source)
+            schema = parquet_file.schema_arrow
+            batches = parquet_file.iter_batches(batch_size=self.chunk_size)
+        else:
+            try:
+                reader = pa_ipc.open_file(source)
+                schema = reader.schema
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                # 不是 IPC 文件格式，按 IPC 流格式读取
+                source.seek(0)
+                reader = pa_ipc.open_stream(source)
+                schema = reader.schema
+                batches = iter(reader)
+
+        declared_types = [self._arrow_sqlite_type(field.type) for field in schema]
+
+        def frames():
+            for batch in batches:
+                # 大批次按 chunk_size 切片，保证每次转换的内存有上限
+                for offset in range(0, batch.num_rows, self.chunk_size):
+                    yield self._arrow_batch_to_frame(batch.slice(offset, self.chunk_size))
+
+        result = self._load_chunks(
+            frames(), table_name,
+            on_chunk=lambda rows: self._report_progress(rows, source.tell()),
+            declared_types=declared_types
+        )
+
+        elapsed = time.perf_counter() - start_time
+        result["import_stats"].update({
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(result["rows_imported"] / elapsed, 1) if elapsed > 0 else None,
+            "arrow_schema": {field.name: str(field.type) for field in schema}
+        })
+        return result
+
+    @staticmethod
+    def _excel_cell_value(value):
+        """规整Excel单元格的值：日期时间转为ISO字符串（零点的日期只保留日期部分）"""
+        if isinstance(value, datetime):
+            if value.hour == value.minute == value.second == value.microsecond == 0:
+                return value.strftime('%Y-%m-%d')
+            return value.strftime('%Y-%m-%d %H:%M:%S')
+        if isinstance(value, date):
+            return value.strftime('%Y-%m-%d')
+        if isinstance(value, (dt_time, timedelta)):
+            return str(value)
+        if isinstance(value, str) and not value.strip():
+            return None
+        return value
+
+    def _excel_frames(self, rows: Iterable[tuple]) -> Iterable[pd.DataFrame]:
+        """
+        将逐行读取的工作表转换为按 chunk_size 分块的DataFrame：
+        第一个非空行作为表头，跳过空行，数据行按表头宽度补齐或截断
+        """
+        header = None
+        buffer = []
+        for row in rows:
+            values = [self._excel_cell_value(value) for value in row]
+            if all(value is None for value in values):
+                continue
+            if header is None:
+                header = [value if value is not None else f"column_{index + 1}"
+                          for index, value in enumerate(values)]
+                while header and values[len(header) - 1] is None:
+                    header.pop()  # 去掉表头右侧的空列
+                    values.pop()
+                continue
+
+            width = len(header)
+            buffer.append(values[:width] + [None] * (width - len(values)))
+            if len(buffer) >= self.chunk_size:
+                yield pd.DataFrame.from_records(buffer, columns=header)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame.from_records(buffer, columns=header)
+
+    @staticmethod
+    def _sheet_table_name(table_name: str, sheet_name: str, sheet_count: int) -> str:
+        """只有一个工作表时直接使用目标表名，多个工作表时追加工作表名"""
+        if sheet_count <= 1:
+            return table_name
+        return f"{table_name}_{DataImporter.clean_column_name(sheet_name)}"
+
+    def import_excel(self, source, table_name: str, file_format: str = '.xlsx',
+                     raw_copy_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        逐行流式导入Excel工作簿，每个非空工作表导入为一张表
+
+        .xlsx 使用 openpyxl 只读模式逐行解析（不把整个工作簿载入内存），
+        .xls 使用 xlrd 按需加载，每个工作表导入完成后立即释放；
+        每张表在各自的事务中分块写入，任一工作表失败时删除本次已创建的表
+
+        Args:
+            source: 文件路径或二进制可读流
+            table_name: 目标表名（多个工作表时作为表名前缀）
+            file_format: 文件扩展名（.xlsx / .xls）
+            raw_copy_path: 同时保存原始字节的文件路径（可选）
+
+        Returns:
+            导入统计信息，sheets 中为每个工作表对应的表名、行数、列名和列类型
+        """
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, 'rb') as f:
+                return self.import_excel(f, table_name, file_format, raw_copy_path)
+
+        with _seekable_source(source, raw_copy_path) as source:
+            start_time = time.perf_counter()
+            if file_format == '.xls':
+                sheets = self._import_xls_sheets(source, table_name)
+            else:
+                sheets = self._import_xlsx_sheets(source, table_name)
+
+        if not sheets:
+            raise ValueError("工作簿中没有包含数据的工作表")
+
+        elapsed = time.perf_counter() - start_time
+        rows_imported = sum(sheet["rows_imported"] for sheet in sheets)
+        import_stats = {
+            "chunk_size": self.chunk_size,
+            "chunks": sum(sheet["import_stats"]["chunks"] for sheet in sheets),
+            "sheets": len(sheets),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_imported / elapsed, 1) if elapsed > 0 else None,
+            "peak_rss_mb": max((sheet["import_stats"]["peak_rss_mb"] or 0) for sheet in sheets),
+            "peak_chunk_memory_mb": max(sheet["import_stats"]["peak_chunk_memory_mb"] for sheet in sheets)
+        }
+        return {
+            "rows_imported": rows_imported,
+            "sheets": sheets,
+            "import_stats": import_stats
+        }
+
+    def _import_sheets(self, sheet_rows: Iterable[tuple], sheet_count: int, table_name: str,
+                       bytes_read: Callable[[int, int], int]) -> List[Dict[str, Any]]:
+        """
+        依次导入各工作表（append / upsert 模式下只把第一个非空工作表写入目标表）
+
+        Args:
+            sheet_rows: (工作表序号, 工作表名, 行迭代器) 的可迭代对象
+            sheet_count: 工作表总数
+            table_name: 目标表名
+            bytes_read: bytes_read(工作表序号, 本表已导入行数) 返回用于进度显示的已读字节数
+        """
+        sheets = []
+        rows_before = 0
+        try:
+            for index, sheet_name, rows in sheet_rows:
+                if self.mode != 'replace' and sheets:
+                    print(f"⏭️ {self.mode} 模式只导入第一个工作表，已跳过: {sheet_name}")
+                    continue
+
+                frames = self._excel_frames(rows)
+                first_frame = next(frames, None)
+                if first_frame is None:
+                    print(f"⏭️ 工作表 {sheet_name} 没有数据行，已跳过")
+                    continue
+
+                if self.mode == 'replace':
+                    sheet_table = self._sheet_table_name(table_name, sheet_name, sheet_count)
+                else:
+                    sheet_table = table_name
+                result = self._load_chunks(
+                    itertools.chain([first_frame], frames), sheet_table,
+                    on_chunk=lambda rows_done: self._report_progress(
+                        rows_before + rows_done, bytes_read(index, rows_done))
+                )
+                result["sheet_name"] = sheet_name
+                result["table_name"] = sheet_table
+                sheets.append(result)
+                rows_before += result["rows_imported"]
+        except BaseException:
+            if self.mode == 'replace':
+                self._drop_tables([sheet["table_name"] for sheet in sheets])
+            raise
+        return sheets
+
+    def _import_xlsx_sheets(self, source, table_name: str) -> List[Dict[str, Any]]:
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            worksheets = workbook.worksheets
+
+            def sheet_rows():
+                for index, worksheet in enumerate(worksheets):
+                    yield index, worksheet.title, worksheet.iter_rows(values_only=True)
+
+            # 只读模式下工作表按压缩流顺序解析，用底层文件位置近似已读字节数
+            return self._import_sheets(sheet_rows(), len(worksheets), table_name,
+                                       lambda index, rows_done: source.tell())
+        finally:
+            workbook.close()
+
+    def _import_xls_sheets(self, source, table_name: str) -> List[Dict[str, Any]]:
+        # .xls 为复合文档格式（单表最多 65536 行），xlrd 需要完整的文件内容
+        contents = source.read()
+        workbook = xlrd.open_workbook(file_contents=contents, on_demand=True)
+        total_bytes = len(contents)
+        sheet_count = workbook.nsheets
+        nrows = {}
+
+        def cell_value(cell):
+            if cell.ctype == xlrd.XL_CELL_DATE:
+                return xlrd.xldate_as_datetime(cell.value, workbook.datemode)
+            if cell.ctype == xlrd.XL_CELL_BOOLEAN:
+                return bool(cell.value)
+            if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK, xlrd.XL_CELL_ERROR):
+                return None
+            if cell.ctype == xlrd.XL_CELL_NUMBER and cell.value % 1 == 0:
+                return int(cell.value)
+            return cell.value
+
+        def sheet_rows():
+            for index in range(sheet_count):
+                sheet = workbook.sheet_by_index(index)
+                nrows[index] = sheet.nrows
+                yield index, sheet.name, (tuple(cell_value(cell) for cell in sheet.row(r))
+                                          for r in range(sheet.nrows))
+                workbook.unload_sheet(index)
+
+        def bytes_read(index, rows_done):
+            # 按已处理的工作表与行数比例估算进度
+            fraction = (index + min(rows_done / max(nrows.get(index, 1), 1), 1.0)) / sheet_count
+            return int(total_bytes * fraction)
+
+        try:
+            return self._import_sheets(sheet_rows(), sheet_count, table_name, bytes_read)
+        finally:
+            workbook.release_resources()
+
+    def _drop_tables(self, table_names: List[str]):
+        """删除本次导入已创建的表（多表导入失败时回滚用）"""
+        if not table_names:
+            return
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            for name in table_names:
+                drop_table(cursor, name)
+                delete_column_stats(cursor, name)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _report_progress(self, rows_imported: int, bytes_read: int):
+        if self.progress_callback is not None:
+            self.progress_callback(rows_imported, bytes_read)
+
+    @staticmethod
+    def _existing_columns(cursor: sqlite3.Cursor, table_name: str) -> Optional[Dict[str, str]]:
+        """返回已有表（或字典编码表的视图）的 {列名: 声明类型}，表不存在时返回 None"""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') AND name=?", (table_name,))
+        if cursor.fetchone() is None:
+            return None
+        return {row[1]: (row[2] or "TEXT").upper() for row in cursor.execute(f"PRAGMA table_info(`{table_name}`)")}
+
+    def _match_existing_schema(self, table_name: str, existing: Dict[str, str], chunk: pd.DataFrame,
+                               incoming_types: Dict[str, str]) -> Dict[str, str]:
+        """
+        校验新数据与已有表的结构是否兼容，并把列名对齐为已有表的写法
+
+        新数据的列必须都存在于目标表中（缺少的列写入 NULL），列类型需可无损写入目标列；
+        首块中全部为空的列不参与类型校验
+
+        Returns:
+            按目标表列类型规整数据用的 {列名: 类型}
+        """
+        existing_by_lower = {name.lower(): name for name in existing}
+        unknown = [col for col in chunk.columns if col.lower() not in existing_by_lower]
+        if unknown:
+            raise ValueError(f"以下列在目标表 {table_name} 中不存在: {', '.join(unknown)}")
+
+        incompatible = []
+        column_types = {}
+        for col in chunk.columns:
+            target = existing_by_lower[col.lower()]
+            target_type = existing[target]
+            incoming_type = incoming_types[col]
+            allowed = _COMPATIBLE_TYPES.get(target_type)
+            if allowed is not None and incoming_type not in allowed and chunk[col].notna().any():
+                incompatible.append(f"{col}（目标 {target_type}，新数据 {incoming_type}）")
+            column_types[target] = target_type
+        if incompatible:
+            raise ValueError(f"以下列的类型与目标表不兼容: {', '.join(incompatible)}")
+
+        chunk.columns = [existing_by_lower[col.lower()] for col in chunk.columns]
+
+        if self.mode == 'upsert':
+            missing_keys = [key for key in self.key_columns if key.lower() not in
+                            {col.lower() for col in chunk.columns}]
+            if missing_keys:
+                raise ValueError(f"新数据中缺少键列: {', '.join(missing_keys)}")
+            self.key_columns = [existing_by_lower[key.lower()] for key in self.key_columns]
+
+        return column_types
+
+    def _upsert_sql(self, cursor: sqlite3.Cursor, table_name: str, columns: List[str]) -> str:
+        """
+        生成按键列插入或更新的语句：键列上需要唯一索引（不存在时创建），
+        值未变化的行不改写，只写入真正的增量
+        """
+        keys = self.key_columns
+        index_name = f"_upsert_{table_name}__{'_'.join(keys)}"
+        key_list = ", ".join(f"`{key}`" for key in keys)
+        try:
+            cursor.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS `{index_name}` ON `{table_name}` ({key_list})")
+        except sqlite3.IntegrityError:
+            raise ValueError(f"目标表 {table_name} 的键列 {', '.join(keys)} 存在重复值，无法按键更新")
+
+        column_list = ", ".join(f"`{col}`" for col in columns)
+        placeholders = ", ".join("?" for _ in columns)
+        sql = f"INSERT INTO `{table_name}` ({column_list}) VALUES ({placeholders}) ON CONFLICT ({key_list}) "
+        value_columns = [col for col in columns if col not in keys]
+        if not value_columns:
+            return sql + "DO NOTHING"
+        assignments = ", ".join(f"`{col}` = excluded.`{col}`" for col in value_columns)
+        changed = " OR ".join(f"`{table_name}`.`{col}` IS NOT excluded.`{col}`" for col in value_columns)
+        return sql + f"DO UPDATE SET {assignments} WHERE {changed}"
+
+    def _load_chunks(self, chunks: Iterable[pd.DataFrame], table_name: str,
+                     on_chunk: Optional[Callable[[int], None]] = None,
+                     declared_types: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        将DataFrame块序列写入目标表，每块规整类型后用 executemany 批量写入，全部在一个事务中完成
+
+        - replace 模式：由首块推断表结构并显式建表。数据写入暂存表 _staging_<表名>，每块单独提交
+          （不长时间占用写锁），全部写完后在一个短事务中删除旧表并把暂存表改名为目标表，
+          导入期间查询始终读到完整的旧表；失败时丢弃暂存表，旧表不受影响
+        - append / upsert 模式：校验与已有表的结构兼容后只写入新数据，
+          新增行数通过 rowid 区间统计，无需对整表 COUNT(*)
+        - 列统计（_column_stats）在同一事务中写入：replace 模式随数据块流式计算，
+          append / upsert 模式写入后对整表重新计算
+        - 字典编码：replace 模式按首块挑选低基数文本列编码；写入已编码的表时沿用其字典，
+          数据写入基表，结束时补充字典并重建视图
+        - 日期列统一为ISO格式；开启 date_parts 时派生年/月/日列（已有表带派生列时追加数据同样计算）
+
+        Args:
+            chunks: DataFrame块的可迭代对象
+            table_name: 目标表名
+            on_chunk: 每写完一块调用 on_chunk(累计行数)
+            declared_types: 按列顺序给定的SQLite列类型（来源格式自带类型时使用，跳过推断）
+
+        Returns:
+            行数、列名、列类型及内存统计（append / upsert 模式另含新增行数和更新行数）
+        """
+        rss_start = _current_rss_bytes()
+        peak_rss = rss_start
+        peak_chunk_bytes = 0
+        rows_imported = 0
+        chunk_count = 0
+        columns: List[str] = []
+        column_types: Dict[str, str] = {}
+        stats_collector = None
+        stats_seconds = 0.0
+        encoder = None
+        load_table = table_name if self.mode != 'replace' else f"{STAGING_PREFIX}{table_name}"
+        target_table = load_table
+        date_part_plan: Dict[str, List[str]] = {}
+
+        conn = sqlite3.connect(self.db_path)
+        conn.isolation_level = None  # 手动控制事务
+        cursor = conn.cursor()
+        previous_pragmas = self._apply_import_pragmas(conn)
+
+        existing = None
+        max_rowid_before = 0
+        rows_changed = 0
+
+        try:
+            cursor.execute("BEGIN")
+
+            existing = self._existing_columns(cursor, table_name)
+            if self.mode != 'replace':
+                if existing is None:
+                    raise ValueError(f"目标表 {table_name} 不存在，无法以 {self.mode} 模式导入")
+                encoder = DictionaryEncoder.load(cursor, table_name)
+                if encoder is not None:
+                    target_table = encoder.storage_table
+                max_rowid_before = cursor.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM `{target_table}`").fetchone()[0]
+                print(f"➕ 以 {self.mode} 模式写入已有表: {table_name}")
+            else:
+                if existing is not None:
+                    print(f"🔄 表 {table_name} 已存在，数据写入暂存表后替换...")
+                else:
+                    print(f"🆕 创建新表: {table_name}")
+                # 清理上次中断的导入可能残留的暂存表
+                discard_staging_table(cursor, load_table)
+
+            insert_sql = None
+            for chunk in chunks:
+                if insert_sql is None:
+                    source_columns = self._clean_columns(chunk.columns)
+                    columns = list(source_columns)
+                    chunk.columns = source_columns
+                    if declared_types:
+                        column_types = dict(zip(columns, declared_types))
+                    else:
+                        column_types = {col: self._infer_column_type(chunk[col], self.excel_dates) for col in columns}
+
+                    if self.mode == 'replace':
+                        if self.date_parts:
+                            # 派生列紧跟在对应的日期列之后
+                            date_part_plan = plan_date_parts(columns, column_types)
+                            for source, names in date_part_plan.items():
+                                position = columns.index(source) + 1
+                                columns[position:position] = names
+                                column_types.update({name: "INTEGER" for name in names})
+                            column_types = {col: column_types[col] for col in columns}
+                        if self.dictionary_encode:
+                            encoded = choose_columns(chunk, column_types)
+                            if encoded:
+                                encoder = DictionaryEncoder(load_table, encoded)
+                                target_table = encoder.storage_table
+                                print(f"🔤 字典编码列: {', '.join(encoded)}")
+                        # 由首块推断表结构，显式建表
+                        column_defs = ", ".join(
+                            encoder.column_definition(col, column_types[col]) if encoder is not None
+                            else f"`{col}` {column_types[col]}" for col in columns
+                        )
+                        cursor.execute(f"CREATE TABLE `{target_table}` ({column_defs})")
+                        placeholders = ", ".join("?" for _ in columns)
+                        insert_sql = f"INSERT INTO `{target_table}` VALUES ({placeholders})"
+                        if Config.COLUMN_STATS_ENABLED:
+                            stats_collector = ColumnStatsCollector(column_types)
+                    else:
+                        column_types = self._match_existing_schema(table_name, existing, chunk, column_types)
+                        source_columns = list(chunk.columns)
+                        date_part_plan = {
+                            source: names for source, names in existing_date_parts(existing).items()
+                            if source in source_columns and not any(name in source_columns for name in names)
+                        }
+                        columns = source_columns + [name for names in date_part_plan.values() for name in names]
+                        column_types.update({name: "INTEGER" for names in date_part_plan.values() for name in names})
+                        if self.mode == 'upsert':
+                            insert_sql = self._upsert_sql(cursor, target_table, columns)
+                        else:
+                            column_list = ", ".join(f"`{col}`" for col in columns)
+                            placeholders = ", ".join("?" for _ in columns)
+                            insert_sql = f"INSERT INTO `{target_table}` ({column_list}) VALUES ({placeholders})"
+                else:
+                    chunk.columns = source_columns
+
+                peak_chunk_bytes = max(peak_chunk_bytes, int(chunk.memory_usage(deep=True).sum()))
+
+                chunk = self._coerce_chunk(chunk, column_types)
+                if date_part_plan:
+                    chunk = add_date_parts(chunk, date_part_plan)[columns]
+                if stats_collector is not None:
+                    stats_start = time.perf_counter()
+                    stats_collector.update(chunk)
+                    stats_seconds += time.perf_counter() - stats_start
+                if encoder is not None:
+                    chunk = encoder.encode(chunk)
+                cursor.executemany(insert_sql, self._chunk_to_rows(chunk))
+                rows_changed += max(cursor.rowcount, 0)
+                rows_imported += len(chunk)
+                chunk_count += 1
+                if self.mode == 'replace':
+                    # 暂存表对查询不可见，逐块提交即可让其他写入在块之间进行
+                    cursor.execute("COMMIT")
+                    cursor.execute("BEGIN")
+
+                rss = _current_rss_bytes()
+                if rss is not None:
+                    peak_rss = max(peak_rss or 0, rss)
+
+                print(f"📝 已写入第 {chunk_count} 块，累计 {rows_imported} 行")
+                if on_chunk is not None:
+                    on_chunk(rows_imported)
+
+            if insert_sql is None:
+                raise ValueError("文件中没有可导入的列")
+
+            if self.mode != 'replace':
+                # 新插入的行 rowid 都大于导入前的最大值，只扫描新增部分
+                rows_inserted = cursor.execute(f"SELECT COUNT(*) FROM `{target_table}` WHERE rowid > ?",
+                                               (max_rowid_before,)).fetchone()[0]
+
+            if encoder is not None:
+                encoder.save(cursor, columns if self.mode == 'replace' else list(existing))
+
+            if Config.COLUMN_STATS_ENABLED:
+                stats_start = time.perf_counter()
+                if stats_collector is not None:
+                    column_stats = stats_collector.finish()
+                else:
+                    column_stats = collect_table_stats(conn, table_name, self.chunk_size)
+                save_column_stats(cursor, load_table, column_stats)
+                stats_seconds += time.perf_counter() - stats_start
+            else:
+                delete_column_stats(cursor, load_table)
+
+            if self.mode != 'replace':
+                # 只写入数据、不改表结构时，由数据版本让该表的缓存查询结果失效
+                bump_table_version(cursor, table_name)
+            cursor.execute("COMMIT")
+
+            if self.mode == 'replace':
+                swap_start = time.perf_counter()
+                cursor.execute("BEGIN IMMEDIATE")
+                replace_table(cursor, load_table, table_name)
+                bump_table_version(cursor, table_name)
+                cursor.execute("COMMIT")
+                swap_seconds = time.perf_counter() - swap_start
+                print(f"🔁 暂存表已替换为 {table_name}（{swap_seconds * 1000:.1f} ms）")
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            if self.mode == 'replace':
+                try:
+                    cursor.execute("BEGIN IMMEDIATE")
+                    discard_staging_table(cursor, load_table)
+                    cursor.execute("COMMIT")
+                except sqlite3.Error as e:
+                    if conn.in_transaction:
+                        cursor.execute("ROLLBACK")
+                    print(f"⚠️ 清理暂存表失败（下次导入时清理）: {e}")
+            raise
+        finally:
+            try:
+                self._restore_pragmas(conn, previous_pragmas)
+            finally:
+                conn.close()
+
+        result = {
+            "rows_imported": rows_imported,
+            "columns": columns,
+            "column_types": column_types,
+            "mode": self.mode,
+            "encoded_columns": encoder.columns if encoder is not None else [],
+            "import_stats": {
+                "chunk_size": self.chunk_size,
+                "chunks": chunk_count,
+                "peak_rss_mb": round(peak_rss / 1024 / 1024, 1) if peak_rss is not None else None,
+                "rss_growth_mb": round((peak_rss - rss_start) / 1024 / 1024, 1) if peak_rss is not None and rss_start is not None else None,
+                "peak_chunk_memory_mb": round(peak_chunk_bytes / 1024 / 1024, 2),
+                "stats_seconds": round(stats_seconds, 3)
+            }
+        }
+        if self.mode != 'replace':
+            # 返回目标表的完整列名（新数据可能只包含部分列）
+            result["columns"] = list(existing)
+            result["rows_inserted"] = rows_inserted
+            result["rows_updated"] = rows_changed - rows_inserted
+        return result
+
+
+def preview_csv(source, compression: Optional[str] = None) -> Dict[str, Any]:
+    """
+    只解析CSV开头至多 Config.PREVIEW_MAX_BYTES 字节：识别编码、分隔符和列类型（与导入相同的推断规则），
+    压缩文件只解压开头部分
+
+    Returns:
+        csv_format（编码、分隔符、列类型和样本指纹，可交给 import_csv 复用）、
+        样本 DataFrame（列名已清理，值为原文）、原始列名、解析的字节数、是否已读到文件结尾、解码回退次数
+    """
+    if compression == 'zip':
+        with _seekable_source(source) as archive_file, zipfile.ZipFile(archive_file) as archive:
+            with archive.open(_zip_csv_member(archive)) as member_stream:
+                return preview_csv(member_stream)
+    if compression:
+        with open_decompressed(source, compression) as decompressed:
+            return preview_csv(decompressed)
+
+    max_bytes = max(int(Config.PREVIEW_MAX_BYTES), Config.ENCODING_SAMPLE_BYTES)
+    prefix = _read_up_to(source, max_bytes + 1)
+    complete = len(prefix) <= max_bytes
+    prefix = prefix[:max_bytes]
+    # 与导入时读取的编码检测样本相同，导入时据此确认是同一个文件
+    sample = prefix[:Config.ENCODING_SAMPLE_BYTES]
+    encoding = detect_encoding(sample)
+    delimiter = sniff_delimiter(sample.decode(encoding, errors='replace'))
+
+    _decode_state.fallbacks = 0
+    _decode_state.replacements = 0
+    decoder = codecs.getincrementaldecoder(encoding)(errors=DECODE_FALLBACK_HANDLER)
+    text = decoder.decode(prefix, final=complete)
+    decoded_length = len(text)
+
+    frame = None
+    for _ in range(3):
+        if not complete:
+            # 丢弃被截断的最后一行
+            text = text[:text.rfind('\n') + 1]
+        try:
+            frame = pd.read_csv(io.StringIO(text), sep=delimiter)
+            break
+        except pd.errors.ParserError:
+            if complete:
+                raise
+            # 截断处可能位于跨行的引号字段中，再往前退一行
+            text = text[:-1]
+    if frame is None:
+        raise ValueError("无法解析文件开头的数据")
+
+    source_columns = [str(col) for col in frame.columns]
+    frame.columns = DataImporter._clean_columns(frame.columns)
+    column_types = {col: DataImporter._infer_column_type(frame[col]) for col in frame.columns}
+    return {
+        "csv_format": {
+            "encoding": encoding,
+            "delimiter": delimiter,
+            "column_types": list(column_types.values()),
+            "sample_sha256": hashlib.sha256(sample).hexdigest()
+        },
+        "frame": frame,
+        "column_types": column_types,
+        "source_columns": source_columns,
+        # 按解析的字符比例折算为字节数（用于估算总行数）
+        "bytes_parsed": int(len(prefix) * len(text) / decoded_length) if decoded_length else 0,
+        "complete": complete,
+        "decode_fallbacks": _decode_state.fallbacks,
+        "decode_replacements": _decode_state.replacements
+    }
+
+
+def enable_wal(conn: sqlite3.Connection):
+    """
+    把数据库切换到WAL日志模式（库文件的持久属性）：写事务进行期间读连接照常读取已提交的数据，
+    导入不再阻塞查询。切换需要短暂的独占访问，失败时保持原模式
+    """
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(f"PRAGMA journal_size_limit={int(Config.SQLITE_WAL_SIZE_LIMIT)}")
+    except sqlite3.OperationalError as e:
+        print(f"⚠️ 切换WAL日志模式失败: {e}")
+
+
+def discard_staging_table(cursor: sqlite3.Cursor, staging_table: str):
+    """删除暂存表（字典编码的目录记录在写完后才保存，中途失败时基表需要单独删除）"""
+    drop_table(cursor, staging_table)
+    cursor.execute(f"DROP TABLE IF EXISTS `{base_table_name(staging_table)}`")
+    delete_column_stats(cursor, staging_table)
+
+
+def replace_table(cursor: sqlite3.Cursor, staging_table: str, table_name: str):
+    """
+    用写好的暂存表替换目标表（由调用方在短事务中执行）：删除旧表，暂存表连同字典编码的基表、
+    字典表改名为目标表名，列统计随之迁移
+    """
+    drop_table(cursor, table_name)
+    # 旧表已删除，关闭改名时对其他视图的引用改写和校验，引用目标表名的视图改名后直接指向新表
+    cursor.execute("PRAGMA legacy_alter_table=ON")
+    try:
+        rename_table(cursor, staging_table, table_name)
+    finally:
+        cursor.execute("PRAGMA legacy_alter_table=OFF")
+    copy_column_stats(cursor, "main", staging_table, "main", table_name)
+    delete_column_stats(cursor, staging_table)
+
+
+def stage_csv_file(file_path: str, staging_dir: str, table_name: str,
+                   chunk_size: Optional[int] = None) -> Dict[str, Any]:
+    """
+    批量导入的工作进程入口：把一个CSV文件导入到本进程专属的暂存数据库
+
+    每个工作进程只写自己的暂存库，进程间没有写锁竞争
+
+    Returns:
+        导入结果（附带暂存库路径和表名，供合并阶段使用）
+    """
+    staging_db_path = os.path.join(staging_dir, f"staging_{os.getpid()}.db")
+    result = DataImporter(staging_db_path, chunk_size=chunk_size).import_csv(file_path, table_name)
+    result["staging_db_path"] = staging_db_path
+    result["table_name"] = table_name
+    return result
+
+
+def merge_staging_databases(db_path: str, staged_results: List[Dict[str, Any]]):
+    """
+    将各暂存库中的表合并到目标数据库：ATTACH 暂存库后在一个事务中
+    按原表结构建表并执行 INSERT ... SELECT，任一表失败则全部回滚
+
+    Args:
+        db_path: 目标数据库路径
+        staged_results: stage_csv_file 的返回结果列表
+    """
+    staging_paths = sorted({result["staging_db_path"] for result in staged_results})
+    aliases = {path: f"staging_{index}" for index, path in enumerate(staging_paths)}
+
+    conn = sqlite3.connect(db_path)
+    conn.isolation_level = None  # 手动控制事务（ATTACH 不能在事务中执行）
+    cursor = conn.cursor()
+    attached = []
+    try:
+        for path, alias in aliases.items():
+            cursor.execute(f"ATTACH DATABASE ? AS {alias}", (path,))
+            attached.append(alias)
+
+        cursor.execute("BEGIN")
+        for result in staged_results:
+            alias = aliases[result["staging_db_path"]]
+            table_name = result["table_name"]
+            create_sql = cursor.execute(
+                f"SELECT sql FROM {alias}.sqlite_master WHERE type='table' AND name=?", (table_name,)
+            ).fetchone()[0]
+            cursor.execute(f"DROP TABLE IF EXISTS main.`{table_name}`")
+            cursor.execute(create_sql)
+            cursor.execute(f"INSERT INTO main.`{table_name}` SELECT * FROM {alias}.`{table_name}`")
+            copy_column_stats(cursor, alias, table_name, "main", table_name)
+        cursor.execute("COMMIT")
+    except BaseException:
+        if conn.in_transaction:
+            cursor.execute("ROLLBACK")
+        raise
+    finally:
+        for alias in attached:
+            cursor.execute(f"DETACH DATABASE {alias}")
+        conn.close()
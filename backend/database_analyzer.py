@@ -6,12 +6,30 @@ import sqlite3
 import pandas as pd
 import os
 from datetime import datetime
+import io
 import json
 import re
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
 from typing import Dict, List, Optional, Any
 import numpy as np
 from config import Config
 from prompts import Prompts
+from data_importer import (DataImporter, SUPPORTED_FORMATS, COMPRESSED_FORMATS, get_file_format,
+                           stage_csv_file, merge_staging_databases, open_decompressed, STAGING_PREFIX,
+                           discard_staging_table, preview_csv)
+from dataset_cache import DatasetCache, FingerprintReader
+from index_builder import AutoIndexBuilder, list_table_indexes
+from column_stats import load_column_stats, delete_column_stats
+from dictionary_encoding import drop_table, describe_encoding, base_table_name, user_table_name
+from file_preview import build_quality_report
+from connection_pool import connection_pools, execution_budget, ExecutionBudget
+from query_cache import query_result_cache, bump_table_version, ALL_TABLES
+from sample_import import (staging_table_name, reservoir_sample_lines, save_sample_info, load_sample_tables,
+                           mark_sample_failed, delete_sample_info, replace_sample_table, describe_sample)
 
 def convert_to_json_serializable(obj):
     """将包含numpy类型的对象转换为JSON可序列化的格式"""
@@ -53,6 +71,7 @@ class DatabaseAnalyzer:
         self.current_db_path = None
         self.current_table_name = None  # 保持兼容性
         self.conversation_tables = []  # 当前对话中的所有表
+        self._tables_lock = threading.Lock()  # 后台导入任务与请求线程共同修改表列表
         
         # 定义工具
         self.tools = [
@@ -72,7 +91,8 @@ class DatabaseAnalyzer:
             },
             {
                 "name": "get_table_info",
-                "description": "获取当前对话中所有表的结构信息和样本数据",
+                "description": "获取当前对话中所有表的结构信息和样本数据，每列附带导入时计算的统计信息"
+                               "（空值数、不同值个数、最小/最大值、均值、高频值、数值分布直方图），无需再单独查询这些统计",
                 "input_schema": {
                     "type": "object",
                     "properties": {},
@@ -91,8 +111,9 @@ class DatabaseAnalyzer:
         Returns:
             清理后的表名
         """
-        # 移除文件扩展名
-        base_name = os.path.splitext(filename)[0]
+        # 移除文件扩展名（包括 .csv.gz 这类复合扩展名）
+        file_format = get_file_format(filename)
+        base_name = filename[:-len(file_format)] if file_format else os.path.splitext(filename)[0]
         
         # 清理文件名，只保留字母、数字、中文和下划线
         cleaned_name = re.sub(r'[^\w\u4e00-\u9fff]', '_', base_name)
@@ -134,34 +155,79 @@ class DatabaseAnalyzer:
             columns: 列名列表
             row_count: 行数
         """
-        table_info = {
+        self.add_tables_to_conversation([{
             "table_name": table_name,
-            "original_filename": filename,
+            "filename": filename,
             "columns": columns,
-            "row_count": row_count,
-            "created_at": datetime.now().isoformat(),
-            "description": f"从文件 {filename} 导入的数据表"
-        }
+            "row_count": row_count
+        }])
+    
+    def add_tables_to_conversation(self, tables: List[Dict[str, Any]]):
+        """
+        将多张新表一次性添加到当前对话的表列表中（整体替换列表，读取方不会看到只加了一半的状态）
         
-        # 检查是否已存在同名表，如果存在则更新
-        existing_index = None
-        for i, table in enumerate(self.conversation_tables):
-            if table["table_name"] == table_name:
-                existing_index = i
-                break
+        Args:
+            tables: 表信息列表，每项包含 table_name、filename、columns、row_count
+        """
+        with self._tables_lock:
+            conversation_tables = list(self.conversation_tables)
+            
+            for table in tables:
+                table_name = table["table_name"]
+                table_info = {
+                    "table_name": table_name,
+                    "original_filename": table["filename"],
+                    "columns": table["columns"],
+                    "row_count": table["row_count"],
+                    "created_at": datetime.now().isoformat(),
+                    "description": f"从文件 {table['filename']} 导入的数据表"
+                }
+                
+                # 检查是否已存在同名表，如果存在则更新
+                existing_index = None
+                for i, existing in enumerate(conversation_tables):
+                    if existing["table_name"] == table_name:
+                        existing_index = i
+                        break
+                
+                if existing_index is not None:
+                    conversation_tables[existing_index] = table_info
+                    print(f"📋 更新表信息: {table_name}")
+                else:
+                    conversation_tables.append(table_info)
+                    print(f"📋 新增表信息: {table_name}")
+            
+            self.conversation_tables = conversation_tables
+            
+            # 为了兼容性，设置current_table_name为最新的表
+            if tables:
+                self.current_table_name = tables[-1]["table_name"]
         
-        if existing_index is not None:
-            self.conversation_tables[existing_index] = table_info
-            print(f"📋 更新表信息: {table_name}")
-        else:
-            self.conversation_tables.append(table_info)
-            print(f"📋 新增表信息: {table_name}")
+        print(f"📊 当前对话共有 {len(self.conversation_tables)} 个数据表")
         
-        # 为了兼容性，设置current_table_name为最新的表
-        self.current_table_name = table_name
+    def update_table_row_count(self, table_name: str, rows_added: int, columns: Optional[List[str]] = None) -> bool:
+        """
+        追加数据后就地更新对话表列表中的行数（按新增行数累加，不重新 COUNT(*) 全表）
         
-        print(f"📊 当前对话共有 {len(self.conversation_tables)} 个数据表")
+        Returns:
+            表是否在对话表列表中
+        """
+        with self._tables_lock:
+            conversation_tables = list(self.conversation_tables)
+            for i, table in enumerate(conversation_tables):
+                if table["table_name"] == table_name:
+                    updated = dict(table, row_count=table["row_count"] + rows_added)
+                    if columns is not None:
+                        updated["columns"] = columns
+                    conversation_tables[i] = updated
+                    break
+            else:
+                return False
+            self.conversation_tables = conversation_tables
         
+        print(f"📋 更新表行数: {table_name} (+{rows_added})")
+        return True
+    
     def get_conversation_tables_summary(self) -> str:
         """
         获取当前对话中所有表的摘要信息
@@ -172,12 +238,15 @@ class DatabaseAnalyzer:
         if not self.conversation_tables:
             return "当前对话中没有数据表"
         
+        sample_tables = self._load_sample_tables()
         summary = f"当前对话中共有 {len(self.conversation_tables)} 个数据表：\n"
         for i, table in enumerate(self.conversation_tables, 1):
             summary += f"{i}. 表名: {table['table_name']}\n"
             summary += f"   来源文件: {table['original_filename']}\n"
             summary += f"   列数: {len(table['columns'])}\n"
             summary += f"   行数: {table['row_count']}\n"
+            if table['table_name'] in sample_tables:
+                summary += f"   ⚠️ 样本表: {describe_sample(sample_tables[table['table_name']])}\n"
             summary += f"   创建时间: {table['created_at'][:19]}\n\n"
         
         return summary
@@ -192,6 +261,7 @@ class DatabaseAnalyzer:
         if not self.conversation_tables:
             return []
         
+        sample_tables = self._load_sample_tables()
         tables_info = []
         for table in self.conversation_tables:
             table_info = {
@@ -203,111 +273,583 @@ class DatabaseAnalyzer:
                 "created_at": table["created_at"],
                 "description": table.get("description", f"数据表 {table['table_name']}")
             }
+            if table["table_name"] in sample_tables:
+                table_info["sample"] = sample_tables[table["table_name"]]
             tables_info.append(table_info)
         
         return convert_to_json_serializable(tables_info)
         
-    def import_csv_to_sqlite(self, csv_file_path, table_name, db_path="analysis_db.db"):
-        """从CSV文件创建SQLite表并导入数据 - 支持多表共存"""
+    def import_csv_to_sqlite(self, csv_file_path, table_name, db_path="analysis_db.db", chunk_size=None,
+                             mode="replace", key_columns=None, dictionary_encode=False, date_parts=False,
+                             excel_dates=False):
+        """
+        从CSV文件创建SQLite表并导入数据 - 支持多表共存
+        
+        文件按 chunk_size 行分块读取并批量写入，导入的内存占用取决于块大小而非文件大小；
+        mode 为 append / upsert 时向已有表追加或按 key_columns 更新，只写入增量数据
+        """
+        if not os.path.exists(csv_file_path):
+            print(f"❌ 文件不存在: {csv_file_path}")
+            return {"success": False, "message": f"文件不存在: {csv_file_path}"}
+        
+        with open(csv_file_path, 'rb') as f:
+            return self.import_file_stream(f, os.path.basename(csv_file_path), table_name, db_path, chunk_size=chunk_size,
+                                           mode=mode, key_columns=key_columns, dictionary_encode=dictionary_encode,
+                                           date_parts=date_parts, excel_dates=excel_dates)
+    
+    @staticmethod
+    def _build_auto_indexes(db_path, tables: List[Dict[str, Any]], row_counts: Optional[Dict[str, int]] = None) -> float:
+        """
+        导入完成后为各表自动建立索引并执行 ANALYZE，表上的索引列表写入每个表信息的 indexes 字段
+        
+        Args:
+            db_path: 数据库路径
+            tables: 表信息列表（至少包含 table_name）
+            row_counts: 已知的各表行数（可选，省去 COUNT(*)）
+            
+        Returns:
+            建索引总耗时（秒）
+        """
+        if not Config.AUTO_INDEX_ENABLED:
+            return 0.0
+        
+        builder = AutoIndexBuilder(db_path)
+        total_seconds = 0.0
+        for table in tables:
+            try:
+                built = builder.build(table["table_name"], row_count=(row_counts or {}).get(table["table_name"]))
+                table["indexes"] = built["indexes"]
+                total_seconds += built["elapsed_seconds"]
+            except Exception as e:
+                # 建索引失败不影响导入结果，查询仍可全表扫描
+                print(f"⚠️ 自动建立索引失败 ({table['table_name']}): {e}")
+        return round(total_seconds, 3)
+    
+    @staticmethod
+    def _dataset_variant(filename) -> str:
+        """影响导入结果的选项组合，作为数据集缓存键的一部分"""
+        return get_file_format(filename) or ""
+    
+    def import_cached_dataset(self, dataset_cache, fingerprint, filename, db_path="analysis_db.db"):
+        """
+        按内容指纹从数据集缓存中恢复表，跳过文件解析
+        
+        Args:
+            dataset_cache: DatasetCache 实例
+            fingerprint: 上传内容的 SHA-256 指纹
+            filename: 原始文件名
+            db_path: 目标数据库路径
+            
+        Returns:
+            与 import_file_stream 相同结构的结果（附带 cache 信息）；未命中缓存时返回 None
+        """
+        start_time = datetime.now()
+        restored = dataset_cache.restore(fingerprint, self._dataset_variant(filename), db_path)
+        if restored is None:
+            return None
+        
+        tables = []
+        for table in restored["tables"]:
+            table_info = {
+                "table_name": table["table_name"],
+                "rows_imported": table["rows_imported"],
+                "columns": table["columns"]
+            }
+            if table["sheet_name"] is not None:
+                table_info["sheet_name"] = table["sheet_name"]
+            tables.append(table_info)
+        
+        if restored["mode"] == "cloned":
+            # 缓存库中只保存数据，复制回分析库后重新建立索引
+            self._build_auto_indexes(db_path, tables, {table["table_name"]: table["rows_imported"] for table in tables})
+        
+        self.current_db_path = db_path
+        for table in tables:
+            source_name = f"{filename} [{table['sheet_name']}]" if len(tables) > 1 else filename
+            self.add_table_to_conversation(table["table_name"], source_name, table["columns"], table["rows_imported"])
+        
+        elapsed_ms = round((datetime.now() - start_time).total_seconds() * 1000, 1)
+        rows_count = sum(table["rows_imported"] for table in tables)
+        action = "复用" if restored["mode"] == "reused" else "复制"
+        print(f"⚡ 数据集缓存命中（{action}），{rows_count} 行，耗时 {elapsed_ms} ms")
+        
+        return convert_to_json_serializable({
+            "success": True,
+            "message": f"文件内容与已导入的数据相同，已{action}表 '{tables[0]['table_name']}'" if len(tables) == 1
+                       else f"文件内容与已导入的数据相同，已{action} {len(tables)} 个表",
+            "rows_imported": int(rows_count),
+            "columns": tables[0]["columns"],
+            "table_name": tables[0]["table_name"],
+            "tables": tables,
+            "total_tables": len(self.conversation_tables),
+            "file_format": get_file_format(filename),
+            "cache_hit": True,
+            "cache": {
+                "fingerprint": fingerprint,
+                "mode": restored["mode"],
+                "elapsed_ms": elapsed_ms
+            }
+        })
+    
+    def import_file_stream(self, stream, filename, table_name, db_path="analysis_db.db", chunk_size=None, raw_copy_path=None,
+                           progress_callback=None, dataset_cache=None, fingerprint=None, source_bytes=None,
+                           mode="replace", key_columns=None, dictionary_encode=False, date_parts=False,
+                           excel_dates=False, replace_sample=False, csv_format=None):
+        """
+        从二进制流（如上传请求体）边读取边导入数据，无需先保存为临时文件
+        
+        按文件扩展名选择导入方式：CSV（含 gzip/bz2/xz/zip 压缩）按编码检测结果分块解析；
+        Parquet / Arrow IPC 按记录批读取，列类型取自文件自带的schema；
+        Excel 逐行流式读取，每个工作表导入为一张表
+        
+        Args:
+            stream: 二进制可读流
+            filename: 原始文件名
+            table_name: 目标表名
+            db_path: 目标数据库路径
+            chunk_size: 每块行数（可选）
+            raw_copy_path: 同时保存原始文件的路径（可选，仅在用户要求保留原文件时使用）
+            progress_callback: 进度回调 progress_callback(已导入行数, 已读字节数)（可选）
+            dataset_cache: 数据集缓存（可选，提供时导入成功后写入缓存）
+            fingerprint: 上传内容的 SHA-256 指纹（可选，未提供时在导入读取流的同时计算）
+            source_bytes: 原始文件大小（可选，用于缓存容量统计）
+            mode: 导入模式 - replace（新建/替换表）、append（追加到已有表）、upsert（按键列插入或更新已有表）
+            key_columns: upsert 模式的键列列表
+            dictionary_encode: 是否对低基数文本列做字典编码（表以同名视图提供，查询方式不变）
+            date_parts: 是否为日期列额外生成 <列名>_year / _month / _day 整数列
+            excel_dates: 是否把列名以 date / dt / 日期 结尾、取值为 Excel 日期序列号的整数列转换为日期
+            replace_sample: 样本优先导入的全量阶段 - 先写入暂存表，完成后原子替换同名样本表
+            csv_format: 上传预览识别的编码、分隔符和列类型（可选，文件开头与预览一致时复用）
+        """
         try:
-            print(f"📥 开始导入CSV文件: {csv_file_path}")
+            file_format = get_file_format(filename)
+            if file_format is None:
+                return {"success": False, "message": f"不支持的文件格式: {os.path.splitext(filename)[1]}"}
+            
+            # 需要写入数据集缓存但还没有指纹时，边导入边计算，不额外缓存上传内容
+            if dataset_cache is not None and mode == "replace" and not fingerprint:
+                stream = FingerprintReader(stream)
+            
+            print(f"📥 开始导入{file_format[1:].upper()}数据: {filename}")
             print(f"📊 目标数据库: {db_path}")
             print(f"📋 目标表名: {table_name}")
             
-            if not os.path.exists(csv_file_path):
-                print(f"❌ 文件不存在: {csv_file_path}")
-                return {"success": False, "message": f"文件不存在: {csv_file_path}"}
+            importer = DataImporter(db_path, chunk_size=chunk_size, progress_callback=progress_callback,
+                                    mode=mode, key_columns=key_columns, dictionary_encode=dictionary_encode,
+                                    date_parts=date_parts, excel_dates=excel_dates)
+            target_table = staging_table_name(table_name) if replace_sample else table_name
             
-            # 读取CSV文件
-            print("📖 正在读取CSV文件...")
+            used_encoding = None
             try:
-                # 尝试多种编码
-                encodings = ['utf-8', 'gbk', 'gb2312', 'utf-8-sig', 'latin1']
-                df = None
-                used_encoding = None
-                
-                for encoding in encodings:
-                    try:
-                        df = pd.read_csv(csv_file_path, encoding=encoding)
-                        used_encoding = encoding
-                        print(f"✅ 使用编码 {encoding} 成功读取CSV文件")
-                        break
-                    except UnicodeDecodeError:
-                        continue
-                
-                if df is None:
-                    raise ValueError("无法使用常见编码读取CSV文件")
-                    
-                print(f"✅ 文件读取成功，共 {len(df)} 行 × {len(df.columns)} 列")
-                
+                if SUPPORTED_FORMATS[file_format] == 'csv':
+                    # 由开头的字节样本判断编码后，边读取边分块导入（只解析一次；压缩文件边解压边解析）
+                    print("📖 正在分块读取并导入CSV数据...")
+                    import_result = importer.import_csv(stream, target_table, raw_copy_path=raw_copy_path,
+                                                        compression=COMPRESSED_FORMATS.get(file_format),
+                                                        csv_format=csv_format)
+                    used_encoding = import_result["encoding"]
+                    print(f"✅ 使用编码 {used_encoding} 成功读取CSV数据")
+                elif file_format in ('.xlsx', '.xls'):
+                    print("📖 正在逐行读取并导入Excel工作表...")
+                    import_result = importer.import_excel(stream, target_table, file_format=file_format,
+                                                          raw_copy_path=raw_copy_path)
+                else:
+                    print("📖 正在按记录批读取并导入列式数据...")
+                    import_result = importer.import_arrow(stream, target_table, file_format=file_format,
+                                                          raw_copy_path=raw_copy_path)
             except Exception as e:
                 print(f"❌ 文件读取失败: {str(e)}")
+                if raw_copy_path and os.path.exists(raw_copy_path):
+                    os.remove(raw_copy_path)
                 return {"success": False, "message": f"文件读取失败: {str(e)}"}
             
-            # 清理列名
-            df.columns = [self._clean_column_name(col) for col in df.columns]
+            if replace_sample:
+                # 全量数据已写入暂存表，在短事务中替换样本表
+                conn = sqlite3.connect(db_path, isolation_level=None)
+                try:
+                    replaced = replace_sample_table(conn, table_name)
+                finally:
+                    conn.close()
+                if not replaced:
+                    return {"success": False, "message": f"样本表 '{table_name}' 已被删除，放弃全量导入"}
+                print(f"🔁 全量数据已替换样本表: {table_name}")
             
-            # 连接到SQLite数据库
-            print(f"🔌 正在连接数据库: {db_path}")
-            conn = sqlite3.connect(db_path)
-            cursor = conn.cursor()
+            rows_count = import_result["rows_imported"]
+            import_stats = import_result["import_stats"]
             
-            # 检查表是否已存在
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name=?", (table_name,))
-            table_exists = cursor.fetchone() is not None
-            
-            if table_exists:
-                print(f"🔄 表 {table_name} 已存在，将替换数据...")
-                cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
-            else:
-                print(f"🆕 创建新表: {table_name}")
-            
-            # 创建新表并导入数据
-            print("📝 正在导入数据...")
-            df.to_sql(table_name, conn, if_exists='replace', index=False)
-            
-            # 获取导入的行数
-            print("🔢 正在统计导入行数...")
-            cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
-            rows_count = cursor.fetchone()[0]
-            
-            conn.commit()
-            conn.close()
+            # Excel 工作簿的每个工作表对应一张表，其他格式只有一张表
+            table_results = import_result["sheets"] if "sheets" in import_result else [
+                dict(import_result, table_name=table_name)
+            ]
+            tables = []
+            for table_result in table_results:
+                table = {
+                    "table_name": table_result["table_name"],
+                    "rows_imported": table_result["rows_imported"],
+                    "columns": table_result["columns"]
+                }
+                if "sheet_name" in table_result:
+                    table["sheet_name"] = table_result["sheet_name"]
+                if table_result.get("encoded_columns"):
+                    table["encoded_columns"] = table_result["encoded_columns"]
+                if mode != "replace":
+                    table["rows_inserted"] = table_result["rows_inserted"]
+                    table["rows_updated"] = table_result["rows_updated"]
+                tables.append(table)
+            columns = tables[0]["columns"]
             
             # 保存当前数据库信息
             self.current_db_path = db_path
             
-            # 获取原始文件名
-            original_filename = os.path.basename(csv_file_path)
+            if mode == "replace":
+                # 添加到对话表列表
+                for table in tables:
+                    source_name = f"{filename} [{table['sheet_name']}]" if len(tables) > 1 else filename
+                    self.add_table_to_conversation(table["table_name"], source_name, table["columns"], table["rows_imported"])
+            else:
+                for table in tables:
+                    if not self.update_table_row_count(table["table_name"], table["rows_inserted"], table["columns"]):
+                        # 对话表列表中没有该表（如服务重启后尚未同步），只在这种情况下统计一次行数
+                        conn = sqlite3.connect(db_path)
+                        try:
+                            row_count = conn.execute(f"SELECT COUNT(*) FROM `{table['table_name']}`").fetchone()[0]
+                        finally:
+                            conn.close()
+                        self.add_table_to_conversation(table["table_name"], filename, table["columns"], row_count)
+            
+            # 导入后按列画像自动建立索引，并执行 ANALYZE 更新查询规划器的统计信息
+            row_counts = {table["table_name"]: table["row_count"] for table in self.conversation_tables}
+            import_stats["index_seconds"] = self._build_auto_indexes(db_path, tables, row_counts)
             
-            # 添加到对话表列表
-            self.add_table_to_conversation(table_name, original_filename, list(df.columns), rows_count)
+            print(f"✅ 导入完成，共导入 {rows_count} 行数据 "
+                  f"({import_stats['rows_per_second']} 行/秒, 峰值内存 {import_stats['peak_rss_mb']} MB)")
             
-            print(f"✅ 导入完成，共导入 {rows_count} 行数据")
+            if mode == "append":
+                message = f"成功向表 '{tables[0]['table_name']}' 追加 {tables[0]['rows_inserted']} 行数据"
+            elif mode == "upsert":
+                message = (f"成功按键列更新表 '{tables[0]['table_name']}'：新增 {tables[0]['rows_inserted']} 行，"
+                           f"更新 {tables[0]['rows_updated']} 行")
+            elif len(tables) == 1:
+                message = f"成功导入 {rows_count} 行数据到表 '{tables[0]['table_name']}'"
+            else:
+                message = f"成功导入 {rows_count} 行数据到 {len(tables)} 个表"
             
             result = {
                 "success": True,
-                "message": f"成功导入 {rows_count} 行数据到表 '{table_name}'",
+                "message": message,
                 "rows_imported": int(rows_count),
-                "columns": list(df.columns),
-                "table_name": table_name,
+                "columns": columns,
+                "table_name": tables[0]["table_name"],
+                "tables": tables,
                 "total_tables": len(self.conversation_tables),
-                "file_format": ".csv"
+                "file_format": file_format,
+                "mode": mode,
+                "import_stats": import_stats
             }
             
+            if used_encoding:
+                result["encoding"] = used_encoding
+            
+            if raw_copy_path:
+                result["raw_file_path"] = str(raw_copy_path)
+            
+            cached = False
+            if dataset_cache is not None and mode == "replace":
+                if isinstance(stream, FingerprintReader):
+                    fingerprint = stream.finish()
+                    source_bytes = stream.bytes_read
+                result["cache_hit"] = False
+                try:
+                    dataset_cache.store(fingerprint, self._dataset_variant(filename), db_path, filename,
+                                        source_bytes or 0, tables)
+                    result["cache"] = {"fingerprint": fingerprint, "mode": "stored"}
+                    cached = True
+                except Exception as e:
+                    # 缓存失败不影响本次导入结果
+                    print(f"⚠️ 写入数据集缓存失败: {e}")
+            
+            if not cached:
+                # 表已被本次导入替换或追加了数据，原有的指纹登记不再有效
+                conn = sqlite3.connect(db_path)
+                try:
+                    DatasetCache.forget_tables(conn, [table["table_name"] for table in tables])
+                    conn.commit()
+                finally:
+                    conn.close()
+            
             return convert_to_json_serializable(result)
             
         except Exception as e:
             print(f"❌ 导入失败: {str(e)}")
             return {"success": False, "message": f"导入失败: {str(e)}"}
     
+    def preview_file_stream(self, stream, filename, file_size=None):
+        """
+        上传预览：只解析CSV开头至多 Config.PREVIEW_MAX_BYTES 字节（压缩文件只解压开头），
+        识别编码、分隔符和列类型，返回样本行、列分析和数据质量提示，不写入数据库
+        
+        Args:
+            stream: 二进制可读流
+            filename: 原始文件名（判断格式和压缩方式）
+            file_size: 文件大小（可选，未压缩时据此估算总行数）
+        
+        Returns:
+            预览结果；csv_format 可交给导入复用（由调用方保存）
+        """
+        try:
+            file_format = get_file_format(filename)
+            if file_format is None or SUPPORTED_FORMATS[file_format] != 'csv':
+                return {"success": False, "message": "预览只支持CSV文件（含 gzip / bz2 / xz / zip 压缩）"}
+            compression = COMPRESSED_FORMATS.get(file_format)
+            
+            start_time = datetime.now()
+            preview = preview_csv(stream, compression)
+            frame = preview["frame"]
+            report = build_quality_report(frame, preview["column_types"], preview["source_columns"],
+                                          preview["decode_replacements"])
+            
+            rows = len(frame)
+            if preview["complete"]:
+                estimated_total_rows = rows
+            elif not compression and file_size and preview["bytes_parsed"]:
+                estimated_total_rows = round(rows * file_size / preview["bytes_parsed"])
+            else:
+                estimated_total_rows = None
+            
+            head = frame.head(Config.PREVIEW_HEAD_ROWS)
+            preview_seconds = round((datetime.now() - start_time).total_seconds(), 3)
+            print(f"🔍 预览 {filename}: 解析开头 {preview['bytes_parsed']} 字节、{rows} 行 "
+                  f"(编码 {preview['csv_format']['encoding']}, 分隔符 {preview['csv_format']['delimiter']!r}, "
+                  f"耗时 {preview_seconds} 秒)")
+            
+            return convert_to_json_serializable({
+                "success": True,
+                "message": "文件预览成功",
+                "filename": filename,
+                "file_format": file_format,
+                "encoding": preview["csv_format"]["encoding"],
+                "delimiter": preview["csv_format"]["delimiter"],
+                "csv_format": preview["csv_format"],
+                "complete": preview["complete"],
+                "bytes_parsed": preview["bytes_parsed"],
+                "estimated_total_rows": estimated_total_rows,
+                "preview_seconds": preview_seconds,
+                "quality_report": report["quality_report"],
+                "preview_data": {
+                    "shape": [rows, len(frame.columns)],
+                    "columns": list(frame.columns),
+                    "column_types": preview["column_types"],
+                    "head": head.astype(object).where(pd.notna(head), None).values.tolist(),
+                    "basic_stats": report["basic_stats"]
+                }
+            })
+        
+        except Exception as e:
+            print(f"❌ 文件预览失败: {str(e)}")
+            return {"success": False, "message": f"文件预览失败: {str(e)}"}
+    
+    def import_sample_table(self, file_path, filename, table_name, db_path="analysis_db.db", sample_rows=None,
+                            date_parts=False, excel_dates=False):
+        """
+        样本优先导入的第一阶段：对CSV文件的数据行做蓄水池抽样，以目标表名导入样本表并立即加入对话，
+        之后由 load_full_after_sample 在后台导入全量数据并替换样本表
+        
+        Args:
+            file_path: 已落盘的上传文件路径
+            filename: 原始文件名（判断格式和压缩方式）
+            table_name: 目标表名（样本表与全量表同名）
+            db_path: 目标数据库路径
+            sample_rows: 样本行数（默认 Config.SAMPLE_FIRST_ROWS）
+            date_parts: 是否为日期列生成派生列（需与全量导入一致）
+            excel_dates: 是否转换 Excel 日期序列号列（需与全量导入一致）
+        """
+        try:
+            file_format = get_file_format(filename)
+            compression = COMPRESSED_FORMATS.get(file_format)
+            if file_format is None or SUPPORTED_FORMATS[file_format] != 'csv' or compression == 'zip':
+                return {"success": False, "message": "样本优先导入只支持CSV文件（含 gzip / bz2 / xz 压缩）"}
+            
+            sample_rows = sample_rows or Config.SAMPLE_FIRST_ROWS
+            start_time = datetime.now()
+            with open(file_path, 'rb') as raw:
+                source = open_decompressed(raw, compression) if compression else raw
+                try:
+                    header, lines, data_bytes = reservoir_sample_lines(source, sample_rows)
+                finally:
+                    source.close()
+            if not lines:
+                return {"success": False, "message": "文件中没有数据行"}
+            
+            # 文件行数不超过样本行数时样本即全量；否则按样本的平均行长估算总行数
+            if len(lines) < sample_rows:
+                estimated_total_rows = len(lines)
+            else:
+                estimated_total_rows = round(data_bytes * len(lines) / sum(len(line) for line in lines))
+            
+            importer = DataImporter(db_path, date_parts=date_parts, excel_dates=excel_dates)
+            import_result = importer.import_csv(io.BytesIO(header + b''.join(lines)), table_name)
+            conn = sqlite3.connect(db_path)
+            try:
+                save_sample_info(conn.cursor(), table_name, import_result["rows_imported"], estimated_total_rows, filename)
+                conn.commit()
+            finally:
+                conn.close()
+            
+            self.current_db_path = db_path
+            self.add_table_to_conversation(table_name, filename, import_result["columns"], import_result["rows_imported"])
+            sample_seconds = round((datetime.now() - start_time).total_seconds(), 3)
+            print(f"🎯 已导入样本表 {table_name}: {import_result['rows_imported']} 行 "
+                  f"(估算全量 {estimated_total_rows} 行, 耗时 {sample_seconds} 秒)")
+            
+            return convert_to_json_serializable({
+                "success": True,
+                "message": f"已导入 {import_result['rows_imported']} 行样本到表 '{table_name}'，全量数据正在后台导入",
+                "table_name": table_name,
+                "columns": import_result["columns"],
+                "sample_rows": import_result["rows_imported"],
+                "estimated_total_rows": estimated_total_rows,
+                "sample_seconds": sample_seconds
+            })
+        
+        except Exception as e:
+            print(f"❌ 样本导入失败: {str(e)}")
+            return {"success": False, "message": f"样本导入失败: {str(e)}"}
+    
+    def load_full_after_sample(self, stream, filename, table_name, db_path="analysis_db.db", **kwargs):
+        """
+        样本优先导入的第二阶段：全量数据写入暂存表后原子替换样本表；
+        失败时保留样本表，并在样本目录中记录原因（LLM 会被告知目前只有样本）
+        """
+        result = self.import_file_stream(stream, filename, table_name, db_path, replace_sample=True, **kwargs)
+        if not result.get("success"):
+            conn = sqlite3.connect(db_path)
+            try:
+                mark_sample_failed(conn.cursor(), table_name, result.get("message"))
+                conn.commit()
+            finally:
+                conn.close()
+        return result
+    
+    def _load_sample_tables(self) -> Dict[str, Dict[str, Any]]:
+        """当前数据库中仍是样本的表（样本优先导入的全量阶段尚未完成）"""
+        if not self.current_db_path or not os.path.exists(self.current_db_path):
+            return {}
+        try:
+            with connection_pools.connection(self.current_db_path) as conn:
+                return load_sample_tables(conn.cursor())
+        except sqlite3.Error:
+            return {}
+    
+    def import_csv_batch(self, files: List[Dict[str, str]], db_path="analysis_db.db", chunk_size=None, staging_root=None):
+        """
+        并行批量导入多个CSV文件
+        
+        解析阶段在进程池中并行执行，每个工作进程写入自己的暂存库；
+        随后在一个事务中把所有暂存表合并进目标数据库，并一次性更新对话表列表
+        
+        Args:
+            files: 文件列表，每项包含 path（磁盘路径）、filename（原始文件名）、table_name
+            db_path: 目标数据库路径
+            chunk_size: 每块行数（可选）
+            staging_root: 暂存库所在目录（可选，默认系统临时目录）
+        """
+        if not files:
+            return {"success": False, "message": "未提供要导入的文件"}
+        
+        staging_dir = tempfile.mkdtemp(prefix="batch_import_", dir=staging_root)
+        workers = max(1, min(len(files), Config.BATCH_IMPORT_WORKERS, os.cpu_count() or 1, 8))
+        
+        try:
+            print(f"📦 开始批量导入 {len(files)} 个文件（{workers} 个进程并行解析）")
+            parse_start = datetime.now()
+            
+            staged_results = []
+            failures = []
+            # 使用 spawn 启动工作进程，避免在多线程的Web进程中 fork
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+                futures = [
+                    (item, executor.submit(stage_csv_file, item["path"], staging_dir, item["table_name"], chunk_size))
+                    for item in files
+                ]
+                for item, future in futures:
+                    try:
+                        staged = future.result()
+                        staged["filename"] = item["filename"]
+                        staged_results.append(staged)
+                    except Exception as e:
+                        failures.append({"filename": item["filename"], "message": str(e)})
+            
+            parse_seconds = (datetime.now() - parse_start).total_seconds()
+            
+            if failures:
+                # 任一文件解析失败则整批不入库，保持原子性
+                print(f"❌ 批量导入失败: {len(failures)} 个文件解析失败")
+                return {
+                    "success": False,
+                    "message": f"{len(failures)} 个文件解析失败，本批次未导入任何数据",
+                    "failures": failures
+                }
+            
+            print("🔗 正在合并暂存数据库...")
+            merge_start = datetime.now()
+            merge_staging_databases(db_path, staged_results)
+            merge_seconds = (datetime.now() - merge_start).total_seconds()
+            
+            index_seconds = self._build_auto_indexes(
+                db_path, staged_results, {staged["table_name"]: staged["rows_imported"] for staged in staged_results}
+            )
+            
+            self.current_db_path = db_path
+            self.add_tables_to_conversation([
+                {
+                    "table_name": staged["table_name"],
+                    "filename": staged["filename"],
+                    "columns": staged["columns"],
+                    "row_count": staged["rows_imported"]
+                }
+                for staged in staged_results
+            ])
+            
+            total_rows = sum(staged["rows_imported"] for staged in staged_results)
+            print(f"✅ 批量导入完成: {len(staged_results)} 个表，共 {total_rows} 行 "
+                  f"(解析 {parse_seconds:.2f}s, 合并 {merge_seconds:.2f}s)")
+            
+            result = {
+                "success": True,
+                "message": f"成功导入 {len(staged_results)} 个文件，共 {total_rows} 行数据",
+                "tables": [
+                    {
+                        "table_name": staged["table_name"],
+                        "filename": staged["filename"],
+                        "rows_imported": staged["rows_imported"],
+                        "columns": staged["columns"],
+                        "encoding": staged["encoding"],
+                        "indexes": staged.get("indexes", []),
+                        "import_stats": staged["import_stats"]
+                    }
+                    for staged in staged_results
+                ],
+                "rows_imported": total_rows,
+                "total_tables": len(self.conversation_tables),
+                "batch_stats": {
+                    "workers": workers,
+                    "parse_seconds": round(parse_seconds, 3),
+                    "merge_seconds": round(merge_seconds, 3),
+                    "index_seconds": index_seconds,
+                    "rows_per_second": round(total_rows / parse_seconds, 1) if parse_seconds > 0 else None
+                }
+            }
+            return convert_to_json_serializable(result)
+            
+        except Exception as e:
+            print(f"❌ 批量导入失败: {str(e)}")
+            return {"success": False, "message": f"批量导入失败: {str(e)}"}
+        finally:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+    
     def _clean_column_name(self, col_name):
         """清理列名"""
-        cleaned = str(col_name).strip()
-        cleaned = re.sub(r'[^\w\u4e00-\u9fff]', '_', cleaned)
-        cleaned = re.sub(r'_+', '_', cleaned)
-        cleaned = cleaned.strip('_')
-        return cleaned or 'unnamed_column'
+        return DataImporter.clean_column_name(col_name)
 
     def get_table_schema(self):
         """获取数据库中所有表的结构信息"""
@@ -315,56 +857,71 @@ class DatabaseAnalyzer:
             return "未连接到数据库"
         
         try:
-            conn = sqlite3.connect(self.current_db_path)
-            cursor = conn.cursor()
-            
-            # 获取所有用户数据表（排除系统表）
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '_db_info'
-                ORDER BY name
-            """)
-            tables = cursor.fetchall()
-            
-            if not tables:
-                conn.close()
-                return "数据库中没有数据表"
-            
-            all_tables_info = []
-            
-            for table_row in tables:
-                table_name = table_row[0]
-                
-                # 获取表结构
-                schema_info = cursor.execute(f"PRAGMA table_info(`{table_name}`)").fetchall()
-                
-                # 获取样本数据
-                sample_data = cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 3").fetchall()
-                column_names = [description[0] for description in cursor.description]
+            with connection_pools.connection(self.current_db_path) as conn:
+                cursor = conn.cursor()
                 
-                # 获取行数
-                row_count = cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`").fetchone()[0]
+                # 获取所有用户数据表（排除系统表和以下划线开头的内部表）
+                cursor.execute("""
+                    SELECT name FROM sqlite_master 
+                    WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 1) != '_'
+                    ORDER BY name
+                """)
+                tables = cursor.fetchall()
                 
-                # 从conversation_tables中获取更多信息
-                table_meta = None
-                for table_info in self.conversation_tables:
-                    if table_info["table_name"] == table_name:
-                        table_meta = table_info
-                        break
+                if not tables:
+                    return "数据库中没有数据表"
                 
-                table_schema = {
-                    "table_name": table_name,
-                    "original_filename": table_meta["original_filename"] if table_meta else "未知",
-                    "description": table_meta["description"] if table_meta else f"数据表 {table_name}",
-                    "columns": [{"name": col[1], "type": col[2]} for col in schema_info],
-                    "row_count": row_count,
-                    "sample_data": [dict(zip(column_names, row)) for row in sample_data],
-                    "created_at": table_meta["created_at"] if table_meta else "未知"
-                }
+                all_tables_info = []
+                sample_tables = load_sample_tables(cursor)
                 
-                all_tables_info.append(table_schema)
-            
-            conn.close()
+                for table_row in tables:
+                    table_name = table_row[0]
+                    
+                    # 获取表结构
+                    schema_info = cursor.execute(f"PRAGMA table_info(`{table_name}`)").fetchall()
+                    
+                    # 获取样本数据
+                    sample_data = cursor.execute(f"SELECT * FROM `{table_name}` LIMIT 3").fetchall()
+                    column_names = [description[0] for description in cursor.description]
+                    
+                    # 获取行数
+                    row_count = cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`").fetchone()[0]
+                    
+                    # 导入时计算的列统计（没有统计的列不附带 stats）
+                    column_stats = load_column_stats(cursor, table_name)
+                    columns = []
+                    for col in schema_info:
+                        # 视图中用 CASE 还原的字典编码列没有声明类型
+                        column = {"name": col[1], "type": col[2] or "TEXT"}
+                        if col[1] in column_stats:
+                            column["stats"] = column_stats[col[1]]
+                        columns.append(column)
+                    
+                    # 从conversation_tables中获取更多信息
+                    table_meta = None
+                    for table_info in self.conversation_tables:
+                        if table_info["table_name"] == table_name:
+                            table_meta = table_info
+                            break
+                    
+                    table_schema = {
+                        "table_name": table_name,
+                        "original_filename": table_meta["original_filename"] if table_meta else "未知",
+                        "description": table_meta["description"] if table_meta else f"数据表 {table_name}",
+                        "columns": columns,
+                        "indexes": list_table_indexes(cursor, table_name),
+                        "row_count": row_count,
+                        "sample_data": [dict(zip(column_names, row)) for row in sample_data],
+                        "created_at": table_meta["created_at"] if table_meta else "未知"
+                    }
+                    encoding = describe_encoding(cursor, table_name)
+                    if encoding is not None:
+                        table_schema["dictionary_encoding"] = encoding
+                    if table_name in sample_tables:
+                        table_schema["sample"] = dict(sample_tables[table_name],
+                                                      notice=describe_sample(sample_tables[table_name]))
+                    
+                    all_tables_info.append(table_schema)
             
             # 构建综合信息
             result = {
@@ -394,53 +951,51 @@ class DatabaseAnalyzer:
             return
         
         try:
-            conn = sqlite3.connect(self.current_db_path)
-            cursor = conn.cursor()
-            
-            # 获取所有用户数据表
-            cursor.execute("""
-                SELECT name FROM sqlite_master 
-                WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '_db_info'
-                ORDER BY name
-            """)
-            tables = cursor.fetchall()
-            
-            # 清空现有列表
-            self.conversation_tables = []
-            
-            for table_row in tables:
-                table_name = table_row[0]
-                
-                # 获取表信息
-                cursor.execute(f"PRAGMA table_info(`{table_name}`)")
-                columns_info = cursor.fetchall()
-                columns = [col[1] for col in columns_info]
+            with connection_pools.connection(self.current_db_path) as conn:
+                cursor = conn.cursor()
                 
-                cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
-                row_count = cursor.fetchone()[0]
+                # 获取所有用户数据表
+                cursor.execute("""
+                    SELECT name FROM sqlite_master 
+                    WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 1) != '_'
+                    ORDER BY name
+                """)
+                tables = cursor.fetchall()
                 
-                # 尝试从表名推断原始文件名
-                original_filename = "未知文件"
-                if "_" in table_name:
-                    # 移除时间戳部分
-                    parts = table_name.split("_")
-                    if len(parts) >= 2:
-                        # 假设最后一个或两个部分是时间戳
-                        name_parts = parts[:-1] if len(parts[-1]) == 6 else parts[:-2]
-                        original_filename = "_".join(name_parts) + ".csv"
+                # 清空现有列表
+                self.conversation_tables = []
                 
-                table_info = {
-                    "table_name": table_name,
-                    "original_filename": original_filename,
-                    "columns": columns,
-                    "row_count": row_count,
-                    "created_at": "未知",  # 切换对话时无法获取准确的创建时间
-                    "description": f"数据表 {table_name}"
-                }
-                
-                self.conversation_tables.append(table_info)
-            
-            conn.close()
+                for table_row in tables:
+                    table_name = table_row[0]
+                    
+                    # 获取表信息
+                    cursor.execute(f"PRAGMA table_info(`{table_name}`)")
+                    columns_info = cursor.fetchall()
+                    columns = [col[1] for col in columns_info]
+                    
+                    cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
+                    row_count = cursor.fetchone()[0]
+                    
+                    # 尝试从表名推断原始文件名
+                    original_filename = "未知文件"
+                    if "_" in table_name:
+                        # 移除时间戳部分
+                        parts = table_name.split("_")
+                        if len(parts) >= 2:
+                            # 假设最后一个或两个部分是时间戳
+                            name_parts = parts[:-1] if len(parts[-1]) == 6 else parts[:-2]
+                            original_filename = "_".join(name_parts) + ".csv"
+                    
+                    table_info = {
+                        "table_name": table_name,
+                        "original_filename": original_filename,
+                        "columns": columns,
+                        "row_count": row_count,
+                        "created_at": "未知",  # 切换对话时无法获取准确的创建时间
+                        "description": f"数据表 {table_name}"
+                    }
+                    
+                    self.conversation_tables.append(table_info)
             
             # 设置current_table_name为最新的表（如果有的话）
             if self.conversation_tables:
@@ -452,42 +1007,162 @@ class DatabaseAnalyzer:
             print(f"⚠️ 同步表列表失败: {e}")
             self.conversation_tables = []
         
-    def query_database(self, sql):
-        """执行SQL查询 - 支持多表查询"""
+    # 只读语句在编译期间只会触发这些授权动作
+    _READ_ONLY_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+    
+    @staticmethod
+    def _inspect_statement(conn, sql):
+        """
+        编译（不执行）SQL语句，由授权回调判断语句是否只读、会写入哪些用户表
+        
+        sqlite3 模块没有提供 sqlite3_stmt_readonly，这里对语句加 EXPLAIN 前缀触发编译：
+        授权回调在编译时为每个读写动作调用一次，语句本身不会被执行。
+        WITH 开头的查询、EXPLAIN 为只读；PRAGMA、CREATE INDEX、ANALYZE 等不是只读，但不写入用户表
+        
+        Returns:
+            (是否只读, 会被插入/更新/删除、建表、删表或改名的表/视图名集合)
+        """
+        if re.match(r'\s*EXPLAIN\b', sql, re.IGNORECASE):
+            return True, set()
+        
+        actions = set()
+        written_tables = set()
+        
+        def authorizer(action, arg1, arg2, db_name, trigger_name):
+            actions.add(action)
+            if action in (sqlite3.SQLITE_INSERT, sqlite3.SQLITE_UPDATE, sqlite3.SQLITE_DELETE,
+                          sqlite3.SQLITE_CREATE_TABLE, sqlite3.SQLITE_DROP_TABLE,
+                          sqlite3.SQLITE_CREATE_VIEW, sqlite3.SQLITE_DROP_VIEW):
+                table = arg1
+            elif action == sqlite3.SQLITE_ALTER_TABLE:
+                table = arg2
+            else:
+                table = None
+            if table and not table.startswith('sqlite_'):
+                # 字典编码表的数据在基表中，用户看到的是同名视图
+                written_tables.add(user_table_name(table))
+            return sqlite3.SQLITE_OK
+        
+        conn.set_authorizer(authorizer)
+        try:
+            conn.execute("EXPLAIN " + sql).close()
+        finally:
+            conn.set_authorizer(None)
+        
+        return actions <= DatabaseAnalyzer._READ_ONLY_ACTIONS, written_tables
+    
+    def query_database(self, sql, cancel_event: Optional[threading.Event] = None):
+        """
+        执行SQL查询 - 支持多表查询
+        
+        执行时间超过 QUERY_TIMEOUT_SECONDS 或 cancel_event 被置位（分析流中止）时中断查询，
+        返回带 timed_out / cancelled 标记的结果
+        """
         if not self.current_db_path:
             return {"error": "未连接到数据库"}
         
         try:
-            conn = sqlite3.connect(self.current_db_path)
-            cursor = conn.cursor()
-            
-            start_time = datetime.now()
-            cursor.execute(sql)
-            execution_time = (datetime.now() - start_time).total_seconds()
+            # 只读语句（含 WITH / EXPLAIN 等）使用连接池中的连接，页缓存和预编译语句在查询之间复用
+            with connection_pools.connection(self.current_db_path) as conn:
+                read_only, written_tables = self._inspect_statement(conn, sql)
+                if read_only:
+                    cursor = conn.cursor()
+                    # 样本表目录先于查询读取（查询超时后连接上的语句都会被中断）
+                    sample_tables = load_sample_tables(cursor)
+                    # 缓存查找与查询在同一个读事务中，数据版本和结果读自同一快照
+                    cursor.execute("BEGIN")
+                    
+                    with execution_budget(conn, Config.QUERY_TIMEOUT_SECONDS, cancel_event) as budget:
+                        start_time = datetime.now()
+                        cached, cache_token = query_result_cache.lookup(cursor, self.current_db_path, sql)
+                        if cached is not None:
+                            result_data = dict(cached["result"],
+                                               execution_time=(datetime.now() - start_time).total_seconds())
+                            result_data["cache"] = {
+                                "hit": True,
+                                "saved_time": cached["execution_time"],
+                                "entry_hits": cached["hits"],
+                                "hit_rate": query_result_cache.hit_rate()
+                            }
+                        else:
+                            try:
+                                cursor.execute(sql)
+                                results, truncated, scanned = self._fetch_bounded(cursor)
+                                total_rows, total_exact = len(results), True
+                                if truncated:
+                                    total_rows, total_exact = self._count_remaining_rows(cursor, scanned, budget)
+                            except sqlite3.OperationalError:
+                                if budget.reason is None:
+                                    raise
+                                return self._interrupted_query_result(sql, budget.reason, start_time)
+                            execution_time = (datetime.now() - start_time).total_seconds()
+                            columns = [description[0] for description in cursor.description]
+                            
+                            result_data = {
+                                "success": True,
+                                "columns": columns,
+                                "data": results,
+                                "row_count": len(results),
+                                "returned_rows": len(results),
+                                "truncated": truncated,
+                                "total_rows_estimate": total_rows,
+                                "total_rows_exact": total_exact,
+                                "execution_time": execution_time,
+                                "sql": sql
+                            }
+                            if truncated:
+                                total_text = f"共 {total_rows} 行" if total_exact else f"总行数至少 {total_rows} 行"
+                                result_data["notice"] = (f"结果已截断：只返回了前 {len(results)} 行（{total_text}）。"
+                                                         f"请用 WHERE 过滤、GROUP BY 聚合或 LIMIT 缩小结果后再查询")
+                            # 计数时超时的结果只有下限，不缓存
+                            if budget.reason is None:
+                                query_result_cache.store(cache_token, result_data)
+                            result_data = dict(result_data, cache={
+                                "hit": False,
+                                "cacheable": cache_token is not None,
+                                "hit_rate": query_result_cache.hit_rate()
+                            })
+                    cursor.close()
+            if read_only:
+                # 查询用到样本表时提醒LLM结果基于样本
+                referenced = [name for name in sample_tables if re.search(rf'\b{re.escape(name)}\b', sql)]
+                if referenced:
+                    result_data["sample_notice"] = {name: describe_sample(sample_tables[name]) for name in referenced}
+                return result_data
             
-            if sql.strip().upper().startswith('SELECT'):
-                results = cursor.fetchall()
-                columns = [description[0] for description in cursor.description]
+            # 写入语句使用独立的短连接（只读连接不能修改数据库）
+            conn = sqlite3.connect(self.current_db_path)
+            try:
+                with execution_budget(conn, Config.QUERY_TIMEOUT_SECONDS, cancel_event) as budget:
+                    cursor = conn.cursor()
+                    
+                    start_time = datetime.now()
+                    try:
+                        cursor.execute(sql)
+                    except sqlite3.OperationalError:
+                        if budget.reason is None:
+                            raise
+                        conn.rollback()
+                        return self._interrupted_query_result(sql, budget.reason, start_time)
+                    execution_time = (datetime.now() - start_time).total_seconds()
                 
-                result_data = {
-                    "success": True,
-                    "columns": columns,
-                    "data": results,
-                    "row_count": len(results),
-                    "execution_time": execution_time,
-                    "sql": sql
-                }
-            else:
+                affected_rows = cursor.rowcount
+                # 被修改、删除或重建的表内容已与上传时不同，不能再按内容指纹复用
+                DatasetCache.forget_tables(conn, written_tables)
+                # 只有被写入的表的列统计失效；只读的 WITH 查询、CREATE INDEX、ANALYZE 等不影响统计
+                for table_name in written_tables:
+                    delete_column_stats(cursor, table_name)
+                # 写语句会改动哪些表的数据版本不逐一区分，更新库级数据版本，该库缓存的查询结果全部失效
+                bump_table_version(cursor, ALL_TABLES)
                 conn.commit()
-                result_data = {
+                return {
                     "success": True,
-                    "message": f"SQL执行成功，影响行数: {cursor.rowcount}",
+                    "message": f"SQL执行成功，影响行数: {affected_rows}",
                     "execution_time": execution_time,
                     "sql": sql
                 }
-            
-            conn.close()
-            return result_data
+            finally:
+                conn.close()
             
         except Exception as e:
             return {
@@ -496,10 +1171,76 @@ class DatabaseAnalyzer:
                 "sql": sql
             }
     
-    def execute_tool(self, tool_name, tool_input):
+    @staticmethod
+    def _interrupted_query_result(sql: str, reason: str, start_time: datetime) -> Dict[str, Any]:
+        """被超时或取消中断的查询结果（超时时提示模型缩小查询范围）"""
+        execution_time = (datetime.now() - start_time).total_seconds()
+        if reason == "cancelled":
+            return {
+                "success": False,
+                "cancelled": True,
+                "error": "分析已中止，查询被取消",
+                "execution_time": execution_time,
+                "sql": sql
+            }
+        print(f"⏱️ 查询超过 {Config.QUERY_TIMEOUT_SECONDS} 秒被中断: {sql[:200]}")
+        return {
+            "success": False,
+            "timed_out": True,
+            "error": f"查询执行超过 {Config.QUERY_TIMEOUT_SECONDS} 秒，已被取消",
+            "suggestion": "请缩小查询范围后重试：添加 WHERE 过滤条件，JOIN 时指定关联条件避免笛卡尔积，"
+                          "先在子查询中聚合或过滤再关联，或用 LIMIT 限制结果",
+            "execution_time": execution_time,
+            "sql": sql
+        }
+    
+    @staticmethod
+    def _fetch_bounded(cursor: sqlite3.Cursor):
+        """
+        按批 fetchmany 读取查询结果，行数或字节数达到 QUERY_MAX_ROWS / QUERY_MAX_RESULT_BYTES 时停止
+        
+        Returns:
+            (结果行列表, 是否截断, 已从游标读出的行数)
+        """
+        rows = []
+        size = 0
+        scanned = 0
+        while True:
+            batch = cursor.fetchmany(Config.QUERY_FETCH_BATCH_ROWS)
+            if not batch:
+                return rows, False, scanned
+            scanned += len(batch)
+            for row in batch:
+                size += sum(len(str(value)) for value in row) + len(row) * 4
+                if len(rows) >= Config.QUERY_MAX_ROWS or (rows and size > Config.QUERY_MAX_RESULT_BYTES):
+                    return rows, True, scanned
+                rows.append(row)
+    
+    @staticmethod
+    def _count_remaining_rows(cursor: sqlite3.Cursor, scanned: int, budget: ExecutionBudget):
+        """
+        结果被截断后在已打开的游标上继续数行（不保存结果、不重新执行查询），最多数到 QUERY_COUNT_SCAN_ROWS 行；
+        计数时超时则停在已数到的行数
+        
+        Returns:
+            (总行数；未数完时为下限, 是否为准确总数)
+        """
+        try:
+            while scanned < Config.QUERY_COUNT_SCAN_ROWS:
+                batch = cursor.fetchmany(min(Config.QUERY_FETCH_BATCH_ROWS, Config.QUERY_COUNT_SCAN_ROWS - scanned))
+                if not batch:
+                    return scanned, True
+                scanned += len(batch)
+            return scanned, cursor.fetchone() is None
+        except sqlite3.OperationalError:
+            if budget.reason != "timeout":
+                raise
+            return scanned, False
+    
+    def execute_tool(self, tool_name, tool_input, cancel_event: Optional[threading.Event] = None):
         """执行工具调用"""
         if tool_name == "query_database":
-            return self.query_database(tool_input["sql"])
+            return self.query_database(tool_input["sql"], cancel_event)
         elif tool_name == "get_table_info":
             return self.get_table_schema()
         else:
@@ -508,6 +1249,8 @@ class DatabaseAnalyzer:
     def _clear_analysis_db(self, db_path):
         """清空分析数据库（新对话时调用）"""
         try:
+            connection_pools.invalidate(db_path)
+            query_result_cache.invalidate(db_path)
             if os.path.exists(db_path):
                 conn = sqlite3.connect(db_path)
                 cursor = conn.cursor()
@@ -515,14 +1258,27 @@ class DatabaseAnalyzer:
                 # 获取所有用户创建的表
                 cursor.execute("""
                     SELECT name FROM sqlite_master 
-                    WHERE type='table' AND name NOT LIKE 'sqlite_%' AND name != '_db_info'
+                    WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 1) != '_'
                 """)
                 tables = cursor.fetchall()
                 
                 # 删除所有用户表
                 for table in tables:
-                    cursor.execute(f"DROP TABLE IF EXISTS `{table[0]}`")
+                    drop_table(cursor, table[0])
                     print(f"🗑️ 删除表: {table[0]}")
+                DatasetCache.forget_tables(conn, [table[0] for table in tables])
+                # 中断的导入可能残留暂存表（字典编码时为其基表）
+                encoded_prefix = base_table_name(STAGING_PREFIX)
+                cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+                staging_tables = {
+                    name[len(base_table_name('')):] if name.startswith(encoded_prefix) else name
+                    for (name,) in cursor.fetchall()
+                    if name.startswith(STAGING_PREFIX) or name.startswith(encoded_prefix)
+                }
+                for staging_table in staging_tables:
+                    discard_staging_table(cursor, staging_table)
+                delete_column_stats(cursor)
+                delete_sample_info(cursor)
                 
                 conn.commit()
                 conn.close()
@@ -617,7 +1373,7 @@ class DatabaseAnalyzer:
             # 首先检查表是否存在
             cursor.execute("""
                 SELECT name FROM sqlite_master 
-                WHERE type='table' AND name = ? AND name NOT LIKE 'sqlite_%' AND name != '_db_info'
+                WHERE type IN ('table', 'view') AND name = ? AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 1) != '_'
             """, (table_name,))
             
             table_exists = cursor.fetchone()
@@ -632,8 +1388,10 @@ class DatabaseAnalyzer:
             cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`")
             row_count = cursor.fetchone()[0]
             
-            # 删除表
-            cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+            # 删除表（字典编码的表一并删除基表和字典表）
+            drop_table(cursor, table_name)
+            delete_column_stats(cursor, table_name)
+            delete_sample_info(cursor, table_name)
             conn.commit()
             
             # 从conversation_tables列表中移除该表
@@ -667,10 +1425,86 @@ class DatabaseAnalyzer:
                 "message": f"删除表失败: {str(e)}"
             }
     
-    def run_analysis_loop(self, messages: List[Dict[str, Any]], system_prompt: str, history_manager: Any, current_conversation: Dict[str, Any], max_iterations: int = 5):
+    def _is_read_only_tool_call(self, block: Dict[str, Any]) -> bool:
+        """
+        工具调用是否只读：get_table_info 只读；query_database 由授权回调判断SQL是否只读，
+        无法编译的语句（如引用同一轮中稍后才创建的表）按写入处理
+        """
+        if block["name"] != "query_database":
+            return True
+        sql = (block.get("input") or {}).get("sql")
+        if not sql or not self.current_db_path:
+            return True
+        try:
+            with connection_pools.connection(self.current_db_path) as conn:
+                read_only, _ = self._inspect_statement(conn, sql)
+            return read_only
+        except sqlite3.Error:
+            return False
+    
+    def _execute_tools_streaming(self, tool_blocks: List[Dict[str, Any]],
+                                 cancel_event: Optional[threading.Event] = None):
+        """
+        执行同一轮的多个工具调用：开头连续的只读调用在有界线程池中并发执行（各自从连接池借用只读连接），
+        从第一个写入调用起按 tool_use 顺序逐个执行，后面的调用能看到前面写入的结果。
+        每完成一个立即产出完成事件；等待期间每 QUERY_HEARTBEAT_SECONDS 产出一次心跳事件：
+        SSE客户端断开后写入心跳失败，分析流随之关闭并置位 cancel_event，正在执行的查询被中断
+        
+        用法: outcomes = yield from self._execute_tools_streaming(...)
+        
+        Returns:
+            tool_use_id -> {"result": 结果, "finished_at": 完成时间} 或 {"error": 异常}
+        """
+        concurrent_count = 0
+        while concurrent_count < len(tool_blocks) and self._is_read_only_tool_call(tool_blocks[concurrent_count]):
+            concurrent_count += 1
+        stages = [tool_blocks[:concurrent_count]] + [[block] for block in tool_blocks[concurrent_count:]]
+        
+        outcomes = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, min(Config.TOOL_EXECUTION_WORKERS, concurrent_count)),
+                                      thread_name_prefix="tool")
+        try:
+            for stage in stages:
+                futures = {
+                    executor.submit(self.execute_tool, block["name"], block["input"], cancel_event): block
+                    for block in stage
+                }
+                pending = set(futures)
+                while pending:
+                    done, pending = wait(pending, timeout=Config.QUERY_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED)
+                    if not done:
+                        yield {"type": "heartbeat"}
+                        continue
+                    for future in done:
+                        block = futures[future]
+                        tool_name = block["name"]
+                        try:
+                            result = future.result()
+                        except Exception as tool_error:
+                            outcomes[block["id"]] = {"error": tool_error}
+                            error_msg = f'工具执行失败: {str(tool_error)}'
+                            yield {"type": "error", "message": error_msg}
+                            continue
+                        outcomes[block["id"]] = {"result": result, "finished_at": datetime.now().isoformat()}
+                        
+                        complete_msg = f'✅ 工具 {tool_name} 执行完成'
+                        yield {"type": "status", "message": complete_msg}
+                        if isinstance(result, dict) and result.get("sample_notice"):
+                            sample_msg = f'⚠️ 查询基于样本数据: {", ".join(result["sample_notice"])}（全量数据导入中）'
+                            yield {"type": "status", "message": sample_msg}
+                        yield {"type": "tool_result", "tool": tool_name, "result": result}
+        finally:
+            # 分析流被关闭时不等待仍在执行的查询（由 cancel_event 中断）
+            executor.shutdown(wait=False, cancel_futures=True)
+        return outcomes
+    
+    def run_analysis_loop(self, messages: List[Dict[str, Any]], system_prompt: str, history_manager: Any, current_conversation: Dict[str, Any], max_iterations: int = 5,
+                          cancel_event: Optional[threading.Event] = None):
         """
         执行分析循环：调用LLM -> 执行工具 -> 更新历史
         这是一个生成器，会产生流式事件
+        
+        cancel_event 被置位（分析流中止）时，正在执行的查询被中断
         """
         iteration = 0
         while iteration < max_iterations:
@@ -757,35 +1591,28 @@ class DatabaseAnalyzer:
                     tool_results = []
                     tool_calls_record = []
                     
-                    for content_block in assistant_message["content"]:
-                        if content_block.get("type") == "tool_use":
-                            tool_name = content_block["name"]
-                            tool_input = content_block["input"]
-                            tool_id = content_block["id"]
-                            
-                            try:
-                                result = self.execute_tool(tool_name, tool_input)
-                                
-                                tool_calls_record.append({
-                                    "tool_name": tool_name,
-                                    "tool_input": tool_input,
-                                    "tool_result": result,
-                                    "execution_time": datetime.now().isoformat()
-                                })
-                                
-                                tool_results.append({
-                                    "type": "tool_result",
-                                    "tool_use_id": tool_id,
-                                    "content": json.dumps(result, ensure_ascii=False, indent=2)
-                                })
-                                
-                                complete_msg = f'✅ 工具 {tool_name} 执行完成'
-                                yield {"type": "status", "message": complete_msg}
-                                yield {"type": "tool_result", "tool": tool_name, "result": result}
-                                
-                            except Exception as tool_error:
-                                error_msg = f'工具执行失败: {str(tool_error)}'
-                                yield {"type": "error", "message": error_msg}
+                    # 只读的工具调用并发执行，写入及其后的调用按顺序执行；结果按 tool_use 的顺序回传
+                    tool_blocks = [block for block in assistant_message["content"] if block.get("type") == "tool_use"]
+                    outcomes = yield from self._execute_tools_streaming(tool_blocks, cancel_event)
+                    
+                    for content_block in tool_blocks:
+                        outcome = outcomes.get(content_block["id"])
+                        if outcome is None or "error" in outcome:
+                            continue
+                        result = outcome["result"]
+                        
+                        tool_calls_record.append({
+                            "tool_name": content_block["name"],
+                            "tool_input": content_block["input"],
+                            "tool_result": result,
+                            "execution_time": outcome["finished_at"]
+                        })
+                        
+                        tool_results.append({
+                            "type": "tool_result",
+                            "tool_use_id": content_block["id"],
+                            "content": json.dumps(result, ensure_ascii=False, indent=2)
+                        })
                     
                     if tool_results:
                         # 保存工具结果消息
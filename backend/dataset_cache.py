@@ -0,0 +1,324 @@
+# dataset_cache.py - 按内容指纹复用已导入的数据集
+import hashlib
+import json
+import sqlite3
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Any, Tuple
+
+from config import Config
+from column_stats import copy_column_stats, delete_column_stats
+
+# 分析数据库中记录"表 <- 内容指纹"对应关系的内部表，同一对话内重复上传时直接复用原表
+FINGERPRINT_TABLE = "_upload_fingerprints"
+
+
+class FingerprintReader:
+    """
+    包装二进制流，读取的同时计算 SHA-256 指纹
+
+    导入过程本身就会把上传流读完一遍，指纹在这一遍中顺带算出，不需要先缓存整个上传内容
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._digest = hashlib.sha256()
+        self.bytes_read = 0
+
+    def read(self, size: int = -1) -> bytes:
+        block = self._stream.read(size)
+        if block:
+            self._digest.update(block)
+            self.bytes_read += len(block)
+        return block
+
+    def finish(self) -> str:
+        """读完流中剩余的字节（导入方可能没有读到末尾），返回十六进制指纹"""
+        while self.read(Config.UPLOAD_COPY_BUFFER_SIZE):
+            pass
+        return self._digest.hexdigest()
+
+
+def copy_with_fingerprint(stream, file_path: str) -> Tuple[str, int]:
+    """将上传流写入文件并同时计算 SHA-256 指纹，返回 (指纹, 字节数)"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(file_path, 'wb') as f:
+        while True:
+            block = stream.read(Config.UPLOAD_COPY_BUFFER_SIZE)
+            if not block:
+                break
+            digest.update(block)
+            f.write(block)
+            size += len(block)
+    return digest.hexdigest(), size
+
+
+class DatasetCache:
+    """
+    用户级数据集缓存 - 以上传内容的 SHA-256 指纹为键保存导入结果
+
+    缓存库独立于 analysis.db（新建对话时 analysis.db 会被重置），因此跨对话有效：
+    - 当前分析库中仍有同一指纹导入的表：直接复用，不做任何拷贝
+    - 否则从缓存库整表复制回分析库（INSERT ... SELECT，无需重新解析文件）
+    超出容量上限时按最近使用时间淘汰
+    """
+
+    def __init__(self, cache_db_path: str, max_bytes: int = Config.DATASET_CACHE_MAX_BYTES):
+        self.cache_db_path = str(cache_db_path)
+        self.max_bytes = max_bytes
+        self._init_catalog()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.cache_db_path, timeout=30)
+        conn.isolation_level = None  # 手动控制事务（ATTACH 不能在事务中执行）
+        return conn
+
+    def _init_catalog(self):
+        conn = self._connect()
+        try:
+            # 增量回收：淘汰数据集后释放空间
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS _datasets (
+                    fingerprint TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    table_index INTEGER NOT NULL,
+                    cache_table TEXT NOT NULL,
+                    table_name TEXT NOT NULL,
+                    sheet_name TEXT,
+                    filename TEXT,
+                    columns TEXT,
+                    row_count INTEGER,
+                    source_bytes INTEGER,
+                    created_at TEXT,
+                    last_used_at TEXT,
+                    PRIMARY KEY (fingerprint, variant, table_index)
+                )
+            """)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _cache_table_name(fingerprint: str, variant: str, table_index: int) -> str:
+        variant_key = hashlib.sha1(variant.encode('utf-8')).hexdigest()[:8]
+        return f"ds_{fingerprint[:24]}_{variant_key}_{table_index}"
+
+    @staticmethod
+    def _ensure_fingerprint_table(cursor: sqlite3.Cursor, schema: str = "main"):
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {schema}.{FINGERPRINT_TABLE} (
+                table_name TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                variant TEXT NOT NULL,
+                table_index INTEGER NOT NULL
+            )
+        """)
+
+    def lookup(self, fingerprint: str, variant: str) -> Optional[List[Dict[str, Any]]]:
+        """查找指纹对应的缓存数据集，未命中时返回 None"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT table_index, cache_table, table_name, sheet_name, filename, columns, row_count
+                FROM _datasets WHERE fingerprint = ? AND variant = ?
+                ORDER BY table_index
+            """, (fingerprint, variant)).fetchall()
+        finally:
+            conn.close()
+
+        if not rows:
+            return None
+        return [
+            {
+                "table_index": row[0],
+                "cache_table": row[1],
+                "table_name": row[2],
+                "sheet_name": row[3],
+                "filename": row[4],
+                "columns": json.loads(row[5]),
+                "rows_imported": row[6]
+            }
+            for row in rows
+        ]
+
+    def store(self, fingerprint: str, variant: str, db_path: str, filename: str,
+              source_bytes: int, tables: List[Dict[str, Any]]):
+        """
+        把刚导入分析库的表复制进缓存库，并在分析库中登记指纹
+
+        Args:
+            fingerprint: 上传内容的 SHA-256 指纹
+            variant: 影响导入结果的选项（如文件格式），不同选项分别缓存
+            db_path: 分析数据库路径
+            filename: 原始文件名
+            source_bytes: 原始文件大小
+            tables: 导入结果中的表列表（table_name、columns、rows_imported，Excel 另有 sheet_name）
+        """
+        if source_bytes > self.max_bytes:
+            print(f"⚠️ 文件超过数据集缓存容量上限，不缓存: {filename}")
+            return
+
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("ATTACH DATABASE ? AS analysis", (str(db_path),))
+            try:
+                cursor.execute("BEGIN")
+                self._delete_dataset(cursor, fingerprint, variant)
+                for index, table in enumerate(tables):
+                    cache_table = self._cache_table_name(fingerprint, variant, index)
+                    self._copy_table(cursor, "analysis", table["table_name"], "main", cache_table)
+                    cursor.execute("""
+                        INSERT INTO _datasets (fingerprint, variant, table_index, cache_table, table_name, sheet_name,
+                                               filename, columns, row_count, source_bytes, created_at, last_used_at)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (fingerprint, variant, index, cache_table, table["table_name"], table.get("sheet_name"),
+                          filename, json.dumps(table["columns"], ensure_ascii=False), table["rows_imported"],
+                          source_bytes, now, now))
+                    self._register_fingerprint(cursor, "analysis", table["table_name"], fingerprint, variant, index)
+                cursor.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE analysis")
+
+            self._evict(cursor)
+            print(f"💾 已缓存数据集 {fingerprint[:12]}（{len(tables)} 个表）")
+        finally:
+            conn.close()
+
+    def restore(self, fingerprint: str, variant: str, db_path: str) -> Optional[Dict[str, Any]]:
+        """
+        将缓存数据集放入分析库：同一指纹的表仍在分析库中时直接复用，否则从缓存库复制
+
+        Returns:
+            {"mode": "reused" / "cloned", "tables": [...]}；未命中时返回 None
+        """
+        entries = self.lookup(fingerprint, variant)
+        if entries is None:
+            return None
+
+        conn = self._connect()
+        cursor = conn.cursor()
+        try:
+            cursor.execute("ATTACH DATABASE ? AS analysis", (str(db_path),))
+            try:
+                cursor.execute("BEGIN")
+                self._ensure_fingerprint_table(cursor, "analysis")
+                existing = {
+                    row[0]: (row[1], row[2], row[3]) for row in cursor.execute(f"""
+                        SELECT f.table_name, f.fingerprint, f.variant, f.table_index
+                        FROM analysis.{FINGERPRINT_TABLE} f
+                        JOIN analysis.sqlite_master m ON m.type IN ('table', 'view') AND m.name = f.table_name
+                    """)
+                }
+                # 分析库中仍保留的、由同一内容导入的表：table_index -> 表名
+                reusable = {
+                    info[2]: name for name, info in existing.items()
+                    if info[0] == fingerprint and info[1] == variant
+                }
+
+                tables = []
+                mode = "reused"
+                for entry in entries:
+                    table_name = reusable.get(entry["table_index"])
+                    if table_name is None:
+                        mode = "cloned"
+                        table_name = self._free_table_name(cursor, entry["table_name"])
+                        self._copy_table(cursor, "main", entry["cache_table"], "analysis", table_name)
+                        self._register_fingerprint(cursor, "analysis", table_name, fingerprint, variant,
+                                                   entry["table_index"])
+                    tables.append(dict(entry, table_name=table_name))
+
+                cursor.execute("UPDATE _datasets SET last_used_at = ? WHERE fingerprint = ? AND variant = ?",
+                               (datetime.now().isoformat(), fingerprint, variant))
+                cursor.execute("COMMIT")
+            except BaseException:
+                if conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                raise
+            finally:
+                cursor.execute("DETACH DATABASE analysis")
+        finally:
+            conn.close()
+
+        return {"mode": mode, "tables": tables}
+
+    @staticmethod
+    def forget_tables(conn: sqlite3.Connection, table_names: Iterable[str]):
+        """
+        在调用方的事务中取消表的指纹登记
+
+        表被修改、删除或同名重建后内容已与指纹不符，之后的重复上传不能再复用这些表
+        """
+        table_names = list(table_names)
+        if not table_names:
+            return
+        exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                              (FINGERPRINT_TABLE,)).fetchone()
+        if exists:
+            conn.executemany(f"DELETE FROM {FINGERPRINT_TABLE} WHERE table_name = ?",
+                             [(name,) for name in table_names])
+
+    def _register_fingerprint(self, cursor: sqlite3.Cursor, schema: str, table_name: str,
+                              fingerprint: str, variant: str, table_index: int):
+        self._ensure_fingerprint_table(cursor, schema)
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {schema}.{FINGERPRINT_TABLE} (table_name, fingerprint, variant, table_index)
+            VALUES (?, ?, ?, ?)
+        """, (table_name, fingerprint, variant, table_index))
+
+    @staticmethod
+    def _free_table_name(cursor: sqlite3.Cursor, table_name: str) -> str:
+        """分析库中已有同名的其他表时追加序号"""
+        candidate = table_name
+        suffix = 2
+        while cursor.execute("SELECT 1 FROM analysis.sqlite_master WHERE name = ?", (candidate,)).fetchone():
+            candidate = f"{table_name}_{suffix}"
+            suffix += 1
+        return candidate
+
+    @staticmethod
+    def _copy_table(cursor: sqlite3.Cursor, src_schema: str, src_table: str, dst_schema: str, dst_table: str):
+        """按源表的列定义建表并整表复制（列类型保持不变，列统计随表复制）"""
+        columns = cursor.execute(f"PRAGMA {src_schema}.table_info(`{src_table}`)").fetchall()
+        if not columns:
+            raise ValueError(f"表 {src_table} 不存在")
+        column_defs = ", ".join(f"`{col[1]}` {col[2]}".rstrip() for col in columns)
+        cursor.execute(f"DROP TABLE IF EXISTS {dst_schema}.`{dst_table}`")
+        cursor.execute(f"CREATE TABLE {dst_schema}.`{dst_table}` ({column_defs})")
+        cursor.execute(f"INSERT INTO {dst_schema}.`{dst_table}` SELECT * FROM {src_schema}.`{src_table}`")
+        copy_column_stats(cursor, src_schema, src_table, dst_schema, dst_table)
+
+    @staticmethod
+    def _delete_dataset(cursor: sqlite3.Cursor, fingerprint: str, variant: str):
+        for (cache_table,) in cursor.execute(
+                "SELECT cache_table FROM _datasets WHERE fingerprint = ? AND variant = ?",
+                (fingerprint, variant)).fetchall():
+            cursor.execute(f"DROP TABLE IF EXISTS main.`{cache_table}`")
+            delete_column_stats(cursor, cache_table)
+        cursor.execute("DELETE FROM _datasets WHERE fingerprint = ? AND variant = ?", (fingerprint, variant))
+
+    def _evict(self, cursor: sqlite3.Cursor):
+        """缓存总量超过上限时，按最近使用时间从旧到新淘汰数据集"""
+        datasets = cursor.execute("""
+            SELECT fingerprint, variant, MAX(source_bytes), MAX(last_used_at) AS last_used
+            FROM _datasets GROUP BY fingerprint, variant ORDER BY last_used
+        """).fetchall()
+        total = sum(row[2] or 0 for row in datasets)
+        evicted = 0
+        for fingerprint, variant, source_bytes, _ in datasets:
+            if total <= self.max_bytes:
+                break
+            cursor.execute("BEGIN")
+            self._delete_dataset(cursor, fingerprint, variant)
+            cursor.execute("COMMIT")
+            total -= source_bytes or 0
+            evicted += 1
+
+        if evicted:
+            cursor.execute("PRAGMA incremental_vacuum")
+            print(f"🧹 数据集缓存已淘汰 {evicted} 个数据集")
@@ -0,0 +1,166 @@
+# date_normalizer.py - 导入时识别混合格式的日期/时间列并统一为可排序的ISO格式
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from config import Config
+
+# 年-月-日（分隔符可为 - / . 或 年月日），可带 时:分[:秒[.小数]]
+_DATE_TEXT_PATTERN = (r'^\s*(\d{4})[-/.年](\d{1,2})[-/.月](\d{1,2})日?'
+                      r'(?:[ T](\d{1,2}):(\d{2})(?::(\d{2})(?:\.\d+)?)?)?\s*$')
+
+# 用于快速排除明显不是日期的列
+_DATE_PREFIX_PATTERN = r'^\s*\d{4}[-/.年]\d{1,2}'
+
+# 规整后的日期文本（用于派生年/月/日列）
+_ISO_DATE_PATTERN = r'^\d{4}-\d{2}-\d{2}'
+
+# 已经是目标格式的值无需解析（大多数文件的日期列本身就是ISO格式）
+_NORMALIZED_PATTERNS = {
+    "DATE": r'\d{4}-\d{2}-\d{2}',
+    "DATETIME": r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}',
+}
+
+# 列名以 date / dt 为完整词结尾（如 order_date、dt）或以“日期”结尾时，才可能把数值列当作 Excel 日期序列号
+# （只匹配完整的词：response_time_ms、lifetime_value、days 之类的数值列不受影响）
+_DATE_NAME_PATTERN = re.compile(r'(?:^|_)(?:date|dt)$|日期$', re.IGNORECASE)
+
+# Excel 日期序列号的起点（1900 日期系统，已包含 1900-02-29 的历史误差）
+_EXCEL_EPOCH = pd.Timestamp("1899-12-30")
+
+DATE_FORMAT = '%Y-%m-%d'
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+DATE_PART_SUFFIXES = ("year", "month", "day")
+
+
+def parse_date_text(series: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    向量化解析混合格式的日期文本（2024-01-05、2024/1/5、2024.1.5、2024年1月5日，可带时间）
+
+    Returns:
+        (解析结果 datetime64，无法解析的为 NaT, 每个值是否带时间部分)
+    """
+    parts = series.astype(str).str.extract(_DATE_TEXT_PATTERN)
+    numbers = parts.astype(float)
+    parsed = pd.to_datetime({
+        "year": numbers[0],
+        "month": numbers[1],
+        "day": numbers[2],
+        "hour": numbers[3].fillna(0),
+        "minute": numbers[4].fillna(0),
+        "second": numbers[5].fillna(0),
+    }, errors='coerce')
+    parsed.index = series.index
+    has_time = numbers[3].notna()
+    has_time.index = series.index
+    return parsed, has_time
+
+
+def _is_excel_serial_column(series: pd.Series) -> bool:
+    if series.name is None or not _DATE_NAME_PATTERN.search(str(series.name)):
+        return False
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return False
+    non_null = series.dropna()
+    return (bool(len(non_null)) and bool((non_null % 1 == 0).all())
+            and bool(non_null.between(Config.EXCEL_SERIAL_MIN, Config.EXCEL_SERIAL_MAX).all()))
+
+
+def detect_temporal_type(series: pd.Series, excel_dates: bool = False) -> Optional[str]:
+    """
+    判断首块数据中的列是否为日期/时间列
+
+    - 文本列：至少 DATE_DETECT_MIN_RATIO 比例的非空值能按已知格式解析
+    - 数值列：仅在 excel_dates 开启时识别，要求列名以 date / dt / 日期 结尾、取值都是
+      Excel 日期序列号范围内的整数（转换会覆盖原数值，因此默认不做）
+
+    Returns:
+        "DATE" / "DATETIME"，不是日期列时返回 None
+    """
+    non_null = series.dropna()
+    if not len(non_null):
+        return None
+
+    if excel_dates and _is_excel_serial_column(series):
+        return "DATE"
+    if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+        return None
+
+    text = non_null.astype('string')
+    if not text.head(100).str.match(_DATE_PREFIX_PATTERN).any():
+        return None
+    # 已是ISO格式的值直接计入，只解析其余的值
+    is_date = text.str.fullmatch(_NORMALIZED_PATTERNS["DATE"]).astype(bool)
+    is_datetime = text.str.fullmatch(_NORMALIZED_PATTERNS["DATETIME"]).astype(bool)
+    pending = text[~(is_date | is_datetime)].astype(object)
+    parsed, has_time = parse_date_text(pending)
+    valid = parsed.notna()
+    if (is_date.sum() + is_datetime.sum() + valid.sum()) / len(text) < Config.DATE_DETECT_MIN_RATIO:
+        return None
+    return "DATETIME" if is_datetime.any() or has_time[valid].any() else "DATE"
+
+
+def normalize_temporal(series: pd.Series, col_type: str) -> pd.Series:
+    """
+    把日期列统一为ISO格式文本（DATE: YYYY-MM-DD，DATETIME: YYYY-MM-DD HH:MM:SS），
+    按文本排序即按时间排序，范围条件可以直接使用索引；无法解析的值保留原文
+    """
+    fmt = DATE_FORMAT if col_type == "DATE" else DATETIME_FORMAT
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.strftime(fmt)
+
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        in_range = series.between(Config.EXCEL_SERIAL_MIN, Config.EXCEL_SERIAL_MAX)
+        parsed = (_EXCEL_EPOCH + pd.to_timedelta(series.where(in_range), unit='D')).dt.round('s')
+        return parsed.dt.strftime(fmt).astype(object).where(parsed.notna(), series)
+
+    # 只解析不是目标格式的值（string 类型上的正则匹配比逐个 Python 对象匹配快得多）
+    text = series.astype('string')
+    pending = (text.notna() & ~text.str.fullmatch(_NORMALIZED_PATTERNS[col_type]).fillna(False)).astype(bool)
+    result = series.astype(object)
+    if pending.any():
+        parsed, _ = parse_date_text(text[pending].astype(object))
+        result[pending] = parsed.dt.strftime(fmt).astype(object).where(parsed.notna(), result[pending])
+    return result
+
+
+def plan_date_parts(columns: List[str], column_types: Dict[str, str]) -> Dict[str, List[str]]:
+    """为日期列规划派生列（<列名>_year / _month / _day）：日期列 -> 派生列名（与已有列重名的跳过）"""
+    existing = {col.lower() for col in columns}
+    plan = {}
+    for col in columns:
+        if column_types.get(col) not in ("DATE", "DATETIME"):
+            continue
+        names = [f"{col}_{suffix}" for suffix in DATE_PART_SUFFIXES]
+        if any(name.lower() in existing for name in names):
+            continue
+        plan[col] = names
+    return plan
+
+
+def existing_date_parts(existing: Dict[str, str]) -> Dict[str, List[str]]:
+    """已有表中带派生列的日期列（追加/更新导入时同样需要计算派生列）"""
+    plan = {}
+    for col, col_type in existing.items():
+        if col_type not in ("DATE", "DATETIME"):
+            continue
+        names = [f"{col}_{suffix}" for suffix in DATE_PART_SUFFIXES]
+        if all(name in existing for name in names):
+            plan[col] = names
+    return plan
+
+
+def add_date_parts(chunk: pd.DataFrame, plan: Dict[str, List[str]]) -> pd.DataFrame:
+    """由规整后的日期列计算年/月/日整数列（非日期值对应的派生列为空）"""
+    for col, names in plan.items():
+        if col not in chunk.columns:
+            continue
+        text = chunk[col].astype(str)
+        valid = text.str.match(_ISO_DATE_PATTERN) & chunk[col].notna()
+        for name, (start, end) in zip(names, ((0, 4), (5, 7), (8, 10))):
+            values = pd.to_numeric(text.str.slice(start, end), errors='coerce')
+            chunk[name] = values.where(valid, np.nan).astype('Int64')
+    return chunk
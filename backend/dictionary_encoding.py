@@ -0,0 +1,207 @@
+# dictionary_encoding.py - 低基数文本列的字典编码（整数编码 + 字典表 + 还原原列名的视图）
+import sqlite3
+from typing import Dict, List, Optional, Any
+
+import pandas as pd
+
+from config import Config
+
+# 字典编码目录：记录哪些表的哪些列被编码、对应的基表和字典表
+DICTIONARY_CATALOG = "_dictionary_columns"
+
+
+def base_table_name(table_name: str) -> str:
+    """编码后实际存储数据的基表名（下划线开头，不出现在用户表列表中）"""
+    return f"_enc_{table_name}"
+
+
+def user_table_name(stored_name: str) -> str:
+    """由实际写入的表名得到用户看到的表名：基表还原为同名视图，其他表原样返回"""
+    return stored_name[len("_enc_"):] if stored_name.startswith("_enc_") else stored_name
+
+
+def dictionary_table_name(table_name: str, column: str) -> str:
+    return f"_dict_{table_name}__{column}"
+
+
+def _sql_literal(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _catalog_exists(cursor: sqlite3.Cursor) -> bool:
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                          (DICTIONARY_CATALOG,)).fetchone() is not None
+
+
+def encoded_columns(cursor: sqlite3.Cursor, table_name: str) -> Dict[str, str]:
+    """返回表中被字典编码的列：列名 -> 字典表名；未编码的表返回空字典"""
+    if not _catalog_exists(cursor):
+        return {}
+    return {
+        row[0]: row[1] for row in cursor.execute(
+            f"SELECT column_name, dictionary_table FROM {DICTIONARY_CATALOG} WHERE table_name = ?", (table_name,))
+    }
+
+
+def storage_table(cursor: sqlite3.Cursor, table_name: str) -> str:
+    """数据实际所在的表：字典编码的表返回基表，否则返回表本身"""
+    return base_table_name(table_name) if encoded_columns(cursor, table_name) else table_name
+
+
+def drop_table(cursor: sqlite3.Cursor, table_name: str):
+    """删除用户表；字典编码的表一并删除视图、基表、字典表和目录记录"""
+    columns = encoded_columns(cursor, table_name)
+    if not columns:
+        cursor.execute(f"DROP TABLE IF EXISTS `{table_name}`")
+        return
+    cursor.execute(f"DROP VIEW IF EXISTS `{table_name}`")
+    cursor.execute(f"DROP TABLE IF EXISTS `{base_table_name(table_name)}`")
+    for dictionary in columns.values():
+        cursor.execute(f"DROP TABLE IF EXISTS `{dictionary}`")
+    cursor.execute(f"DELETE FROM {DICTIONARY_CATALOG} WHERE table_name = ?", (table_name,))
+
+
+def rename_table(cursor: sqlite3.Cursor, table_name: str, new_name: str):
+    """重命名用户表；字典编码的表一并重命名基表、字典表和目录记录，并按新表名重建视图"""
+    columns = encoded_columns(cursor, table_name)
+    if not columns:
+        cursor.execute(f"ALTER TABLE `{table_name}` RENAME TO `{new_name}`")
+        return
+    cursor.execute(f"DROP VIEW IF EXISTS `{table_name}`")
+    cursor.execute(f"ALTER TABLE `{base_table_name(table_name)}` RENAME TO `{base_table_name(new_name)}`")
+    for col, dictionary in columns.items():
+        cursor.execute(f"ALTER TABLE `{dictionary}` RENAME TO `{dictionary_table_name(new_name, col)}`")
+        cursor.execute(f"""
+            UPDATE {DICTIONARY_CATALOG} SET table_name = ?, base_table = ?, dictionary_table = ?
+            WHERE table_name = ? AND column_name = ?
+        """, (new_name, base_table_name(new_name), dictionary_table_name(new_name, col), table_name, col))
+    view_columns = [row[1] for row in cursor.execute(f"PRAGMA table_info(`{base_table_name(new_name)}`)")]
+    DictionaryEncoder.load(cursor, new_name).save(cursor, view_columns)
+
+
+def choose_columns(chunk: pd.DataFrame, column_types: Dict[str, str]) -> List[str]:
+    """
+    按首块数据挑选适合字典编码的列：文本列中不同值个数不超过 DICT_ENCODE_MAX_VALUES、
+    且不同值占非空行的比例不超过 DICT_ENCODE_MAX_RATIO 的列
+    """
+    selected = []
+    for col, col_type in column_types.items():
+        if col_type != "TEXT":
+            continue
+        non_null = chunk[col].dropna()
+        if not len(non_null):
+            continue
+        distinct = non_null.nunique()
+        if distinct <= Config.DICT_ENCODE_MAX_VALUES and distinct <= len(non_null) * Config.DICT_ENCODE_MAX_RATIO:
+            selected.append(col)
+    return selected
+
+
+class DictionaryEncoder:
+    """
+    字典编码器 - 导入时把选定的文本列逐块替换为整数编码，新出现的值追加编码
+
+    数据写入基表 _enc_<表名>，每个编码列对应字典表 _dict_<表名>__<列名>(code, value)；
+    以原表名创建视图把编码还原为原值，LLM 生成的SQL无需任何修改。
+    不同值较少的列在视图中用 CASE 表达式还原，其余列用标量子查询按主键查字典表；
+    两种方式都只在查询用到该列时才计算，不会像 LEFT JOIN 那样让每条查询都逐行关联。
+    """
+
+    def __init__(self, table_name: str, columns: List[str]):
+        self.table_name = table_name
+        self.columns = list(columns)
+        self.mappings: Dict[str, Dict[str, int]] = {col: {} for col in self.columns}
+        self._saved_sizes: Dict[str, int] = {col: 0 for col in self.columns}
+
+    @classmethod
+    def load(cls, cursor: sqlite3.Cursor, table_name: str) -> Optional["DictionaryEncoder"]:
+        """读取已编码表的字典（追加/更新导入时沿用已有编码）；未编码的表返回 None"""
+        columns = encoded_columns(cursor, table_name)
+        if not columns:
+            return None
+        encoder = cls(table_name, list(columns))
+        for col, dictionary in columns.items():
+            encoder.mappings[col] = {value: code for code, value in cursor.execute(
+                f"SELECT code, value FROM `{dictionary}` ORDER BY code")}
+            encoder._saved_sizes[col] = len(encoder.mappings[col])
+        return encoder
+
+    @property
+    def storage_table(self) -> str:
+        return base_table_name(self.table_name)
+
+    def encode(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        """把数据块中的编码列替换为整数编码（缺失值保持为空）"""
+        chunk = chunk.copy()
+        for col in self.columns:
+            if col not in chunk.columns:
+                continue
+            mapping = self.mappings[col]
+            values = chunk[col]
+            values = values.where(values.isna(), values.astype(str))
+            for value in pd.unique(values.dropna()):
+                if value not in mapping:
+                    mapping[value] = len(mapping) + 1
+            chunk[col] = values.map(mapping).astype('Int64')
+        return chunk
+
+    def column_definition(self, col: str, col_type: str) -> str:
+        """基表的列定义：编码列存为 INTEGER"""
+        return f"`{col}` INTEGER" if col in self.mappings else f"`{col}` {col_type}"
+
+    def save(self, cursor: sqlite3.Cursor, columns: List[str]):
+        """
+        写入新增的字典项，并按当前字典重建视图和目录记录（应与数据写入在同一事务中）
+
+        Args:
+            columns: 视图的列顺序（与基表一致）
+        """
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {DICTIONARY_CATALOG} (
+                table_name TEXT NOT NULL,
+                column_name TEXT NOT NULL,
+                base_table TEXT NOT NULL,
+                dictionary_table TEXT NOT NULL,
+                PRIMARY KEY (table_name, column_name)
+            )
+        """)
+        for col in self.columns:
+            dictionary = dictionary_table_name(self.table_name, col)
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS `{dictionary}` (code INTEGER PRIMARY KEY, value TEXT UNIQUE)")
+            new_items = list(self.mappings[col].items())[self._saved_sizes[col]:]
+            cursor.executemany(f"INSERT INTO `{dictionary}` (value, code) VALUES (?, ?)", new_items)
+            self._saved_sizes[col] = len(self.mappings[col])
+            cursor.execute(f"""
+                INSERT OR REPLACE INTO {DICTIONARY_CATALOG} (table_name, column_name, base_table, dictionary_table)
+                VALUES (?, ?, ?, ?)
+            """, (self.table_name, col, self.storage_table, dictionary))
+
+        cursor.execute(f"DROP VIEW IF EXISTS `{self.table_name}`")
+        cursor.execute(f"CREATE VIEW `{self.table_name}` AS {self._view_select(columns)}")
+
+    def _view_select(self, columns: List[str]) -> str:
+        selects = []
+        for col in columns:
+            mapping = self.mappings.get(col)
+            if mapping is None:
+                selects.append(f"e.`{col}` AS `{col}`")
+            elif len(mapping) <= Config.DICT_ENCODE_CASE_MAX_VALUES:
+                branches = " ".join(f"WHEN {code} THEN {_sql_literal(value)}" for value, code in mapping.items())
+                selects.append(f"CASE e.`{col}` {branches} END AS `{col}`")
+            else:
+                dictionary = dictionary_table_name(self.table_name, col)
+                selects.append(f"(SELECT value FROM `{dictionary}` WHERE code = e.`{col}`) AS `{col}`")
+        return f"SELECT {', '.join(selects)} FROM `{self.storage_table}` e"
+
+
+def describe_encoding(cursor: sqlite3.Cursor, table_name: str) -> Optional[Dict[str, Any]]:
+    """表的字典编码信息（供表结构接口展示）；未编码的表返回 None"""
+    columns = encoded_columns(cursor, table_name)
+    if not columns:
+        return None
+    return {
+        "base_table": base_table_name(table_name),
+        "columns": [{"column": col, "dictionary_table": dictionary} for col, dictionary in columns.items()],
+        "hint": f"{table_name} 是视图，编码列在基表中存为整数编码（字典表结构: code, value）。"
+                f"对编码列做 GROUP BY 时，先在基表上按编码分组再关联字典表取值会更快"
+    }
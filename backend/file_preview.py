@@ -0,0 +1,228 @@
+# file_preview.py - 上传预览：由文件开头的样本给出列分析和数据质量提示，识别出的CSV格式供随后的导入复用
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional, Any
+
+import pandas as pd
+
+from config import Config
+from data_importer import DataImporter
+from dictionary_encoding import choose_columns
+
+_NUMERIC_TYPES = ("INTEGER", "REAL")
+_TEMPORAL_TYPES = ("DATE", "DATETIME")
+
+# 日期列规整后的格式，不符合的值是无法解析的日期
+_ISO_TEMPORAL_PATTERN = r'\d{4}-\d{2}-\d{2}(?: \d{2}:\d{2}:\d{2})?'
+
+# 文本列中可解析为数字的值达到该比例时，其余的值视为类型不一致
+_MOSTLY_NUMERIC_RATIO = 0.8
+
+# 缺失值超过该比例的列单独给出建议
+_HIGH_MISSING_RATIO = 0.5
+
+
+def _examples(values: pd.Series, limit: int = 3) -> List[str]:
+    return [str(value) for value in pd.unique(values)[:limit]]
+
+
+def _outlier_count(values: pd.Series) -> int:
+    """IQR 方法：超出 [Q1 - 1.5 IQR, Q3 + 1.5 IQR] 的值的个数"""
+    if len(values) < 4:
+        return 0
+    q1, q3 = values.quantile(0.25), values.quantile(0.75)
+    iqr = q3 - q1
+    return int(((values < q1 - 1.5 * iqr) | (values > q3 + 1.5 * iqr)).sum())
+
+
+def build_quality_report(frame: pd.DataFrame, column_types: Dict[str, str], source_columns: List[str],
+                         decode_replacements: int = 0) -> Dict[str, Any]:
+    """
+    基于样本的快速数据质量检查：缺失值、重复行、类型不一致、首尾空白、异常值（IQR），
+    按文档中的扣分规则给出 0-100 的质量评分
+
+    Args:
+        frame: 样本 DataFrame（列名已清理，值为原文）
+        column_types: 推断的列类型
+        source_columns: 文件中的原始列名（与 frame 的列一一对应）
+        decode_replacements: 无法解码而被替换的字节数
+
+    Returns:
+        quality_report（basic_info / column_analysis / data_quality_issues / recommendations / overall_score）
+        和数值列的 basic_stats
+    """
+    rows = len(frame)
+    coerced = DataImporter._coerce_chunk(frame, column_types)
+    column_analysis = {}
+    basic_stats = {}
+    issues = []
+    type_issue_count = 0
+    outlier_columns = 0
+    format_issue_count = 0
+
+    for col, source_name in zip(frame.columns, source_columns):
+        col_type = column_types[col]
+        series = frame[col]
+        non_null = series.dropna()
+        null_count = rows - len(non_null)
+        analysis = {
+            "type": col_type,
+            "null_count": null_count,
+            "null_ratio": round(null_count / rows, 4) if rows else 0.0,
+            "distinct": int(non_null.nunique()),
+            "examples": _examples(non_null)
+        }
+        if source_name != col:
+            analysis["source_name"] = source_name
+            issues.append({"type": "renamed_column", "column": col,
+                           "message": f"列名 '{source_name}' 含特殊字符或重复，导入后为 '{col}'"})
+        column_analysis[col] = analysis
+
+        if not len(non_null):
+            issues.append({"type": "empty_column", "column": col, "message": f"列 {col} 在样本中全部为空"})
+            continue
+        if null_count:
+            issues.append({"type": "missing_values", "column": col, "count": null_count,
+                           "ratio": analysis["null_ratio"],
+                           "message": f"列 {col} 有 {null_count} 个缺失值（{analysis['null_ratio']:.1%}）"})
+        if analysis["distinct"] == 1 and rows > 1:
+            issues.append({"type": "constant_column", "column": col,
+                           "message": f"列 {col} 在样本中只有一个取值: {analysis['examples'][0]}"})
+
+        values = coerced[col].dropna()
+        if col_type in _NUMERIC_TYPES:
+            numbers = pd.to_numeric(values, errors='coerce')
+            invalid = values[numbers.isna()]
+            numbers = numbers.dropna().astype(float)
+            if len(numbers):
+                basic_stats[col] = {
+                    "min": numbers.min(), "max": numbers.max(),
+                    "mean": round(numbers.mean(), 4), "median": numbers.median()
+                }
+                outliers = _outlier_count(numbers)
+                if outliers:
+                    outlier_columns += 1
+                    analysis["outliers"] = outliers
+                    issues.append({"type": "outliers", "column": col, "count": outliers,
+                                   "message": f"列 {col} 有 {outliers} 个超出 1.5 倍四分位距的值"})
+        elif col_type in _TEMPORAL_TYPES:
+            text = values.astype('string')
+            valid = text.str.fullmatch(_ISO_TEMPORAL_PATTERN).astype(bool)
+            invalid = values[~valid]
+            if valid.any():
+                basic_stats[col] = {"min": text[valid].min(), "max": text[valid].max()}
+        else:
+            text = non_null.astype(str)
+            numbers = pd.to_numeric(DataImporter._numeric_candidate(non_null), errors='coerce')
+            ratio = numbers.notna().mean()
+            invalid = non_null[numbers.isna()] if _MOSTLY_NUMERIC_RATIO <= ratio < 1 else non_null.iloc[:0]
+            padded = int((text != text.str.strip()).sum())
+            if padded:
+                format_issue_count += 1
+                issues.append({"type": "whitespace", "column": col, "count": padded,
+                               "message": f"列 {col} 有 {padded} 个值带有首尾空白"})
+
+        if len(invalid):
+            type_issue_count += 1
+            issues.append({"type": "type_mismatch", "column": col, "count": int(len(invalid)),
+                           "examples": _examples(invalid),
+                           "message": f"列 {col} 有 {len(invalid)} 个值与其余的值类型不一致（如 "
+                                      f"{', '.join(_examples(invalid))}），导入后按原文保存"})
+
+    duplicate_rows = int(frame.duplicated().sum()) if rows else 0
+    if duplicate_rows:
+        issues.append({"type": "duplicate_rows", "count": duplicate_rows,
+                       "message": f"样本中有 {duplicate_rows} 行完全重复"})
+    if decode_replacements:
+        format_issue_count += 1
+        issues.append({"type": "encoding", "count": decode_replacements,
+                       "message": f"有 {decode_replacements} 个字节无法按识别的编码解码，已替换为 �"})
+
+    cells = rows * len(frame.columns)
+    missing_pct = frame.isna().sum().sum() / cells * 100 if cells else 0.0
+    duplicate_pct = duplicate_rows / rows * 100 if rows else 0.0
+    deductions = (min(missing_pct * 0.5, 30) + min(duplicate_pct * 0.3, 15) + min(type_issue_count * 5, 20)
+                  + min(outlier_columns * 3, 15) + min(format_issue_count * 5, 20))
+
+    return {
+        "quality_report": {
+            "basic_info": {
+                "sample_rows": rows,
+                "columns": len(frame.columns),
+                "missing_cells": int(frame.isna().sum().sum()),
+                "duplicate_rows": duplicate_rows
+            },
+            "column_analysis": column_analysis,
+            "data_quality_issues": issues,
+            "recommendations": _recommendations(frame, column_types, column_analysis, duplicate_rows, type_issue_count),
+            "overall_score": max(0, round(100 - deductions))
+        },
+        "basic_stats": basic_stats
+    }
+
+
+def _recommendations(frame: pd.DataFrame, column_types: Dict[str, str], column_analysis: Dict[str, Dict[str, Any]],
+                     duplicate_rows: int, type_issue_count: int) -> List[str]:
+    """结合导入选项给出建议"""
+    recommendations = []
+    encodable = choose_columns(frame, column_types)
+    if encodable:
+        recommendations.append(f"低基数文本列 {', '.join(encodable)} 可开启 dictionary_encode 导入，数据库更小")
+    temporal = [col for col, col_type in column_types.items() if col_type in _TEMPORAL_TYPES]
+    if temporal:
+        recommendations.append(f"日期列 {', '.join(temporal)} 导入时统一为ISO格式；"
+                               f"按年/月统计较多时可开启 date_parts 生成派生列")
+    sparse = [col for col, analysis in column_analysis.items() if analysis["null_ratio"] > _HIGH_MISSING_RATIO]
+    if sparse:
+        recommendations.append(f"列 {', '.join(sparse)} 缺失值超过一半，分析时注意过滤空值")
+    if duplicate_rows:
+        recommendations.append("样本中存在完全重复的行，计数类分析请确认是否需要去重")
+    if type_issue_count:
+        recommendations.append("部分列含有与其他值类型不一致的内容，导入后按原文保存，数值计算前需要清洗")
+    return recommendations
+
+
+class PreviewCache:
+    """预览结果缓存 - 按 preview_id 保存识别出的CSV格式，随后的导入凭 preview_id 复用，过期或超出容量时淘汰"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self):
+        """移除过期和超出容量的结果（调用方需持有 _lock）"""
+        now = time.monotonic()
+        for preview_id, entry in list(self._entries.items()):
+            if now - entry["created"] > Config.PREVIEW_TTL:
+                del self._entries[preview_id]
+        while len(self._entries) > Config.PREVIEW_CACHE_SIZE:
+            self._entries.popitem(last=False)
+
+    def put(self, user_id: str, filename: str, csv_format: Dict[str, Any]) -> str:
+        preview_id = f"preview_{uuid.uuid4().hex[:16]}"
+        with self._lock:
+            self._entries[preview_id] = {
+                "user_id": user_id,
+                "filename": filename,
+                "csv_format": csv_format,
+                "created": time.monotonic()
+            }
+            self._prune()
+        return preview_id
+
+    def get_format(self, preview_id: Optional[str], user_id: str) -> Optional[Dict[str, Any]]:
+        """当前用户的预览识别结果；不存在、已过期或属于其他用户时返回 None（导入时重新识别）"""
+        if not preview_id:
+            return None
+        with self._lock:
+            self._prune()
+            entry = self._entries.get(preview_id)
+        if entry is None or entry["user_id"] != user_id:
+            return None
+        return entry["csv_format"]
+
+
+# 全局预览结果缓存实例
+preview_cache = PreviewCache()
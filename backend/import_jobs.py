@@ -0,0 +1,206 @@
+# import_jobs.py - 异步导入任务管理器
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Callable
+
+from config import Config
+from data_importer import ImportCancelled
+
+
+class ImportQueueFull(Exception):
+    """导入任务队列已满"""
+
+
+class ImportJob:
+    """单个导入任务的状态与进度"""
+
+    TERMINAL_STATES = ('completed', 'failed', 'cancelled')
+
+    def __init__(self, user_id: str, filename: str, table_name: str, total_bytes: Optional[int] = None):
+        self.job_id = f"job_{uuid.uuid4().hex[:16]}"
+        self.user_id = user_id
+        self.filename = filename
+        self.table_name = table_name
+        self.total_bytes = total_bytes
+        self.status = 'queued'
+        self.rows_processed = 0
+        self.bytes_read = 0
+        self.result = None
+        self.error = None
+        self.created_at = datetime.now().isoformat()
+        self.started_at = None
+        self.finished_at = None
+        self.cancel_event = threading.Event()
+        self.future = None
+
+        self._started_monotonic = None
+        self._version = 0
+        self._condition = threading.Condition()
+
+    def _touch(self):
+        """状态变化后唤醒等待进度的订阅者（调用方需持有 _condition）"""
+        self._version += 1
+        self._condition.notify_all()
+
+    def mark_running(self):
+        with self._condition:
+            self.status = 'running'
+            self.started_at = datetime.now().isoformat()
+            self._started_monotonic = time.monotonic()
+            self._touch()
+
+    def update_progress(self, rows_processed: int, bytes_read: int):
+        """导入器每写完一块调用一次；任务被取消时抛出 ImportCancelled 中断导入"""
+        with self._condition:
+            self.rows_processed = rows_processed
+            self.bytes_read = bytes_read
+            self._touch()
+        if self.cancel_event.is_set():
+            raise ImportCancelled("导入任务已取消")
+
+    def finish(self, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        with self._condition:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = datetime.now().isoformat()
+            self._touch()
+
+    def wait_for_change(self, last_version: int, timeout: float) -> int:
+        """阻塞直到任务状态版本号变化或超时，返回当前版本号"""
+        with self._condition:
+            if self._version == last_version:
+                self._condition.wait(timeout)
+            return self._version
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in self.TERMINAL_STATES
+
+    def eta_seconds(self) -> Optional[float]:
+        """按已读字节占比估算剩余时间"""
+        if self.status != 'running' or not self.total_bytes or not self.bytes_read:
+            return None
+        elapsed = time.monotonic() - self._started_monotonic
+        remaining = max(self.total_bytes - self.bytes_read, 0)
+        return round(elapsed * remaining / self.bytes_read, 1)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._condition:
+            progress = None
+            if self.total_bytes:
+                progress = round(min(self.bytes_read / self.total_bytes, 1.0) * 100, 1)
+            return {
+                "job_id": self.job_id,
+                "filename": self.filename,
+                "table_name": self.table_name,
+                "status": self.status,
+                "rows_processed": self.rows_processed,
+                "bytes_read": self.bytes_read,
+                "total_bytes": self.total_bytes,
+                "progress_percent": 100.0 if self.status == 'completed' else progress,
+                "eta_seconds": self.eta_seconds(),
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "result": self.result,
+                "error": self.error
+            }
+
+
+class ImportJobManager:
+    """
+    异步导入任务管理器 - 在独立的有界线程池中执行导入，
+    限制排队任务数量，避免大批量上传占满资源影响分析接口
+    """
+
+    def __init__(self, max_workers: int = Config.IMPORT_WORKERS, max_pending: int = Config.IMPORT_QUEUE_SIZE):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="import-job")
+        self._jobs: Dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def _prune_finished_jobs(self):
+        """清理过期的已结束任务（调用方需持有 _lock）"""
+        now = datetime.now()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.is_finished and job.finished_at
+            and (now - datetime.fromisoformat(job.finished_at)).total_seconds() > Config.IMPORT_JOB_TTL
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def submit(self, job: ImportJob, work: Callable[[ImportJob], Dict[str, Any]],
+               cleanup: Optional[Callable[[], None]] = None) -> ImportJob:
+        """
+        提交导入任务
+
+        Args:
+            job: 任务对象
+            work: 执行导入的函数，接收任务对象（用于上报进度），返回导入结果字典
+            cleanup: 任务结束（无论成功与否）后执行的清理函数
+
+        Raises:
+            ImportQueueFull: 进行中和排队的任务数已达上限
+        """
+        with self._lock:
+            self._prune_finished_jobs()
+            active = sum(1 for j in self._jobs.values() if not j.is_finished)
+            if active >= self.max_workers + self.max_pending:
+                raise ImportQueueFull(f"导入任务队列已满（{active} 个任务进行中），请稍后再试")
+            self._jobs[job.job_id] = job
+
+        def run():
+            try:
+                if job.cancel_event.is_set():
+                    if not job.is_finished:
+                        job.finish('cancelled', error="导入任务已取消")
+                    return
+                job.mark_running()
+                result = work(job)
+                if job.cancel_event.is_set() and not result.get("success"):
+                    job.finish('cancelled', error="导入任务已取消")
+                elif result.get("success"):
+                    job.finish('completed', result=result)
+                else:
+                    job.finish('failed', result=result, error=result.get("message"))
+            except ImportCancelled as e:
+                job.finish('cancelled', error=str(e))
+            except Exception as e:
+                job.finish('failed', error=str(e))
+            finally:
+                if cleanup:
+                    try:
+                        cleanup()
+                    except Exception as e:
+                        print(f"⚠️ 导入任务清理失败: {e}")
+
+        job.future = self._executor.submit(run)
+        print(f"📤 已提交导入任务: {job.job_id} ({job.filename})")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[ImportJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> bool:
+        """取消任务：排队中的任务直接标记为已取消，运行中的任务在当前块写入后中断并回滚"""
+        job = self.get_job(job_id)
+        if not job or job.is_finished:
+            return False
+
+        job.cancel_event.set()
+        if job.status == 'queued':
+            # 排队中的任务立即标记为已取消并释放队列名额，工作线程取到后直接执行清理
+            job.finish('cancelled', error="导入任务已取消")
+        print(f"🛑 已请求取消导入任务: {job_id}")
+        return True
+
+
+# 全局导入任务管理器实例
+import_job_manager = ImportJobManager()
@@ -0,0 +1,229 @@
+# index_builder.py - 导入后按列画像自动建立索引
+import re
+import sqlite3
+import time
+from typing import Dict, List, Optional, Any
+
+from config import Config
+from column_stats import load_column_stats
+from dictionary_encoding import storage_table
+
+# 自动创建的索引名前缀，便于与用户/键列唯一索引区分
+AUTO_INDEX_PREFIX = "_auto_"
+
+# 可能用作关联/筛选键的列名（如 customer_id、order_no、CustomerID、商品编号）
+_KEY_NAME_PATTERN = re.compile(r'(^|_)(id|key|code|no|num|sku)$|[a-z0-9](Id|ID)$|编号|编码|代码|单号|工号|账号')
+
+# 每个索引条目在B树中的额外开销（rowid、记录头、页内指针等）的估算字节数
+_INDEX_ENTRY_OVERHEAD = 10
+
+# 数值在记录中以变长整数/8字节浮点存储，LENGTH() 返回的是文本长度，估算时取上限
+_NUMERIC_KEY_BYTES = 8
+
+
+def list_table_indexes(cursor: sqlite3.Cursor, table_name: str) -> List[Dict[str, Any]]:
+    """列出表上的索引及其列（不含 SQLite 为 UNIQUE 约束自动生成的索引；字典编码的表列出其基表上的索引）"""
+    table_name = storage_table(cursor, table_name)
+    indexes = []
+    for row in cursor.execute(f"PRAGMA index_list(`{table_name}`)").fetchall():
+        index_name, unique, origin = row[1], bool(row[2]), row[3]
+        if origin != 'c':
+            continue
+        columns = [info[2] for info in cursor.execute(f"PRAGMA index_info(`{index_name}`)").fetchall()]
+        indexes.append({
+            "name": index_name,
+            "columns": columns,
+            "unique": unique,
+            "auto": index_name.startswith(AUTO_INDEX_PREFIX)
+        })
+    return indexes
+
+
+class AutoIndexBuilder:
+    """
+    自动索引构建器 - 导入完成后对表做列画像（类型、基数、平均长度），
+    为可能出现在 WHERE / GROUP BY / JOIN 中的列建立单列索引，
+    索引总大小控制在表大小的一定比例内，最后执行 ANALYZE 为查询规划器提供统计信息
+    """
+
+    def __init__(self, db_path: str, budget_ratio: float = Config.AUTO_INDEX_BUDGET_RATIO,
+                 max_indexes: int = Config.AUTO_INDEX_MAX_PER_TABLE,
+                 sample_rows: int = Config.AUTO_INDEX_SAMPLE_ROWS):
+        self.db_path = db_path
+        self.budget_ratio = budget_ratio
+        self.max_indexes = max_indexes
+        self.sample_rows = sample_rows
+
+    def profile_table(self, cursor: sqlite3.Cursor, table_name: str,
+                      stats_table: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        基于前 sample_rows 行对每列做画像：非空数、不同值个数、平均长度
+
+        所有列在同一条聚合查询中统计（每200列一批），只扫描一遍样本；
+        导入时已计算列统计（_column_stats）的表直接使用其中的空值数和不同值个数，
+        样本上只计算平均长度，省去代价较高的 COUNT(DISTINCT)
+
+        Args:
+            table_name: 实际存储数据的表
+            stats_table: 列统计登记的表名（字典编码表的统计登记在视图名下），默认与 table_name 相同
+        """
+        columns = [(row[1], (row[2] or "TEXT").upper())
+                   for row in cursor.execute(f"PRAGMA table_info(`{table_name}`)").fetchall()]
+        catalog = load_column_stats(cursor, stats_table or table_name)
+        if not all(name in catalog for name, _ in columns):
+            catalog = {}
+
+        profiles = []
+        for start in range(0, len(columns), 200):
+            batch = columns[start:start + 200]
+            if catalog:
+                aggregates = ", ".join(f"0, 0, AVG(LENGTH(`{name}`))" for name, _ in batch)
+            else:
+                aggregates = ", ".join(
+                    f"COUNT(`{name}`), COUNT(DISTINCT `{name}`), AVG(LENGTH(`{name}`))" for name, _ in batch
+                )
+            column_list = ", ".join(f"`{name}`" for name, _ in batch)
+            row = cursor.execute(
+                f"SELECT COUNT(*), {aggregates} FROM (SELECT {column_list} FROM `{table_name}` LIMIT ?)",
+                (self.sample_rows,)
+            ).fetchone()
+            sampled = row[0]
+            for i, (name, col_type) in enumerate(batch):
+                non_null, distinct, avg_length = row[1 + i * 3:4 + i * 3]
+                if catalog:
+                    stats = catalog[name]
+                    non_null = stats["row_count"] - stats["null_count"]
+                    distinct = stats["distinct_count"]
+                profiles.append({
+                    "column": name,
+                    "type": col_type,
+                    "sampled_rows": sampled,
+                    "non_null": non_null,
+                    "distinct": distinct,
+                    "distinct_ratio": distinct / non_null if non_null else 0.0,
+                    "avg_length": avg_length or 0.0
+                })
+        return profiles
+
+    def _classify(self, profile: Dict[str, Any]) -> Optional[str]:
+        """判断列是否值得建索引，返回原因；不值得时返回 None"""
+        if profile["distinct"] < 2 or profile["avg_length"] > Config.AUTO_INDEX_MAX_KEY_LENGTH:
+            return None
+
+        col_type = profile["type"]
+        if col_type in ("DATE", "DATETIME"):
+            return "date"
+        name = profile["column"]
+        if _KEY_NAME_PATTERN.search(name) or _KEY_NAME_PATTERN.search(name.lower()):
+            return "key"
+        if col_type == "TEXT" and profile["distinct_ratio"] <= Config.AUTO_INDEX_CATEGORY_MAX_RATIO:
+            return "category"
+        # 其余数值列多为度量值（金额、数量），通常被聚合而非过滤
+        return None
+
+    @staticmethod
+    def _table_bytes(cursor: sqlite3.Cursor, table_name: str, row_count: int,
+                     profiles: List[Dict[str, Any]]) -> int:
+        """表数据占用的字节数（优先使用 dbstat，不可用时按样本平均行长估算）"""
+        try:
+            size = cursor.execute("SELECT SUM(pgsize) FROM dbstat WHERE name = ?", (table_name,)).fetchone()[0]
+            if size:
+                return int(size)
+        except sqlite3.OperationalError:
+            pass
+        avg_row = sum(p["avg_length"] for p in profiles) + _INDEX_ENTRY_OVERHEAD
+        return int(row_count * avg_row)
+
+    def plan(self, cursor: sqlite3.Cursor, table_name: str, row_count: Optional[int] = None,
+             stats_table: Optional[str] = None) -> List[Dict[str, Any]]:
+        """按优先级（键列 > 日期列 > 分类列）挑选索引列，直到达到数量或大小预算"""
+        if row_count is None:
+            row_count = cursor.execute(f"SELECT COUNT(*) FROM `{table_name}`").fetchone()[0]
+        if row_count < Config.AUTO_INDEX_MIN_ROWS:
+            return []
+
+        profiles = self.profile_table(cursor, table_name, stats_table)
+        budget = self._table_bytes(cursor, table_name, row_count, profiles) * self.budget_ratio
+
+        existing = {tuple(index["columns"]) for index in list_table_indexes(cursor, table_name)}
+        priority = {"key": 0, "date": 1, "category": 2}
+        candidates = []
+        for profile in profiles:
+            reason = self._classify(profile)
+            if reason is None or (profile["column"],) in existing:
+                continue
+            key_bytes = profile["avg_length"]
+            if profile["type"] in ("INTEGER", "REAL"):
+                key_bytes = min(key_bytes, _NUMERIC_KEY_BYTES)
+            estimated = int(row_count * (key_bytes + _INDEX_ENTRY_OVERHEAD))
+            candidates.append(dict(profile, reason=reason, estimated_bytes=estimated))
+
+        # 同类列中，选择性更高（不同值更多）的列优先
+        candidates.sort(key=lambda c: (priority[c["reason"]], -c["distinct_ratio"]))
+
+        planned = []
+        used = 0
+        for candidate in candidates:
+            if len(planned) >= self.max_indexes:
+                break
+            if used + candidate["estimated_bytes"] > budget:
+                continue
+            planned.append(candidate)
+            used += candidate["estimated_bytes"]
+        return planned
+
+    def build(self, table_name: str, row_count: Optional[int] = None) -> Dict[str, Any]:
+        """
+        为表建立自动索引并执行 ANALYZE
+
+        Args:
+            table_name: 表名
+            row_count: 表的行数（导入时已知，可省去一次 COUNT(*)）
+
+        Returns:
+            {"created": [...], "indexes": 表上全部索引, "elapsed_seconds": 耗时}
+        """
+        start_time = time.perf_counter()
+        conn = sqlite3.connect(self.db_path)
+        conn.isolation_level = None
+        cursor = conn.cursor()
+        created = []
+        try:
+            cursor.execute(f"PRAGMA cache_size=-{int(Config.IMPORT_CACHE_SIZE_KB)}")
+            # 字典编码的表在基表上建索引（编码列为整数，按画像规则不会被选作分类列）
+            target_table = storage_table(cursor, table_name)
+            planned = self.plan(cursor, target_table, row_count, stats_table=table_name)
+            if planned:
+                cursor.execute("BEGIN")
+                for candidate in planned:
+                    index_name = f"{AUTO_INDEX_PREFIX}{table_name}__{candidate['column']}"
+                    cursor.execute(f"CREATE INDEX IF NOT EXISTS `{index_name}` "
+                                   f"ON `{target_table}` (`{candidate['column']}`)")
+                    created.append({
+                        "name": index_name,
+                        "column": candidate["column"],
+                        "reason": candidate["reason"],
+                        "estimated_bytes": candidate["estimated_bytes"]
+                    })
+                cursor.execute("COMMIT")
+
+            # 近似 ANALYZE：每个索引只采样部分行，大表上也能快速完成
+            cursor.execute(f"PRAGMA analysis_limit={int(Config.ANALYZE_LIMIT)}")
+            cursor.execute(f"ANALYZE `{target_table}`")
+            indexes = list_table_indexes(cursor, table_name)
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        elapsed = time.perf_counter() - start_time
+        if created:
+            print(f"🗂️ 表 {table_name} 自动创建 {len(created)} 个索引: "
+                  f"{', '.join(index['column'] for index in created)} ({elapsed:.2f}s)")
+        return {
+            "created": created,
+            "indexes": indexes,
+            "elapsed_seconds": round(elapsed, 3)
+        }
@@ -31,10 +31,13 @@ class Prompts:
 - 使用JOIN等SQL语句可以关联多个表进行分析
 - 在查询时请明确指定表名，避免歧义
 - 可以比较不同表的数据，寻找关联性和差异
+- 表信息中带有 sample、查询结果中带有 sample_notice 时，该表目前只是均匀随机样本（全量数据仍在导入），分析时说明结论基于样本，总量类指标按比例估算
+- 类型为 DATE / DATETIME 的列已统一存为 'YYYY-MM-DD' / 'YYYY-MM-DD HH:MM:SS' 文本，按日期筛选时直接用范围条件（如 order_date >= '2024-01-01' AND order_date < '2024-02-01'，或 BETWEEN），不要对列套用 strftime/date 等函数，这样才能使用索引；表中若有 <列名>_year / _month / _day 整数列，按年月分组时优先使用这些列
 
 **可用工具：**
-- get_table_info: 获取当前对话中所有表的结构信息
+- get_table_info: 获取当前对话中所有表的结构信息（含每列的空值数、不同值个数、最小/最大值、均值、高频值和分布直方图，这些统计无需再用SQL查询）
 - query_database: 执行SQL查询获取数据，支持多表查询
+  - 返回的行数和数据量有上限；结果中 truncated 为 true 时只返回了前 returned_rows 行（total_rows_estimate 为总行数，total_rows_exact 为 false 时只是下限），不要基于截断的明细下总量结论，应改用 GROUP BY 聚合、WHERE 过滤或 LIMIT 重新查询
 
 **高效批量分析策略 (Parallel Tool Use) - 强制执行规则：**
 1. **优先并行执行**：你必须分析用户请求，拆解出所有独立的数据需求，并**一次性生成所有必要的SQL查询**。
@@ -0,0 +1,229 @@
+# query_cache.py - 查询结果缓存：按规范化SQL和所涉表的数据版本缓存只读查询结果，表被导入/删除/修改后自动失效
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Any, Tuple
+
+from config import Config
+from dictionary_encoding import encoded_columns, base_table_name
+
+# 表数据版本目录：导入、模型写入等只改数据不改结构的操作在同一事务中更新所涉表的版本
+TABLE_VERSIONS = "_table_versions"
+
+# 模型通过 query_database 执行的写语句影响哪些表不做解析，统一更新该库级版本
+ALL_TABLES = "*"
+
+# 规范化时保留原样的片段：字符串字面量、带引号的标识符；注释被去掉
+_SQL_TOKEN = re.compile(r"""('(?:[^']|'')*')|("(?:[^"]|"")*"|`(?:[^`]|``)*`|\[[^\]]*\])|(--[^\n]*|/\*.*?\*/)""",
+                        re.DOTALL)
+
+# 结果不确定的查询不缓存（随机数、当前时间）
+_NONDETERMINISTIC = re.compile(r"\brandom(?:blob)?\s*\(|'now'|\bcurrent_(?:date|time|timestamp)\b|\bchanges\s*\(|"
+                               r"\blast_insert_rowid\s*\(|\btotal_changes\s*\(", re.IGNORECASE)
+
+# 可以参与缓存的内部表前缀（字典编码的基表和字典表随所属表一起更新版本）
+_VERSIONED_INTERNAL_PREFIXES = ("_enc_", "_dict_")
+
+
+def normalize_sql(sql: str) -> str:
+    """去掉注释和末尾分号，字面量和带引号的标识符之外的部分统一小写并合并空白"""
+    parts = []
+    position = 0
+    for match in _SQL_TOKEN.finditer(sql):
+        parts.append(sql[position:match.start()].lower())
+        if match.group(3) is None:
+            parts.append(match.group(0))
+        else:
+            parts.append(" ")
+        position = match.end()
+    parts.append(sql[position:].lower())
+    return re.sub(r"\s+", " ", "".join(parts)).strip().rstrip(";").strip()
+
+
+def bump_table_version(cursor: sqlite3.Cursor, table_name: str):
+    """
+    更新表的数据版本（应与数据写入在同一事务中）；字典编码的表一并更新基表和字典表
+
+    版本取当前纳秒时间戳（不小于旧版本 + 1），数据库被删除重建后新表的版本也不会与旧缓存重合
+    """
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {TABLE_VERSIONS} (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    names = [table_name]
+    if table_name != ALL_TABLES:
+        columns = encoded_columns(cursor, table_name)
+        if columns:
+            names.append(base_table_name(table_name))
+            names.extend(columns.values())
+    cursor.executemany(f"""
+        INSERT INTO {TABLE_VERSIONS} (table_name, version) VALUES (?, ?)
+        ON CONFLICT (table_name) DO UPDATE SET version = max(version + 1, excluded.version)
+    """, [(name, time.time_ns()) for name in names])
+
+
+def _versions_exist(cursor: sqlite3.Cursor) -> bool:
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                          (TABLE_VERSIONS,)).fetchone() is not None
+
+
+def _references(names, text: str):
+    return [name for name in names if re.search(rf"(?<!\w){re.escape(name.lower())}(?!\w)", text)]
+
+
+def data_version(cursor: sqlite3.Cursor, normalized_sql: str) -> Optional[Tuple]:
+    """
+    查询所涉数据的版本：库结构版本（任何建表、删表、改表、建索引都会改变）加上SQL中出现的每张表的数据版本，
+    用到视图时展开视图定义中引用的表
+
+    Returns:
+        版本元组；查询用到了不随数据版本更新的内部表（如列统计目录）、或库中存在触发器
+        （写入一张表可能改动其他表）时返回 None，表示不可缓存
+    """
+    schema_version = cursor.execute("PRAGMA schema_version").fetchone()[0]
+    tables, views = [], {}
+    for name, object_type, definition in cursor.execute(
+            "SELECT name, type, sql FROM sqlite_master WHERE type IN ('table', 'view', 'trigger')"):
+        if object_type == "trigger":
+            return None
+        if object_type == "view":
+            views[name] = (definition or "").lower()
+        tables.append(name)
+
+    referenced = set(_references(tables, normalized_sql.lower()))
+    pending = [name for name in referenced if name in views]
+    while pending:
+        for name in _references(tables, views[pending.pop()]):
+            if name not in referenced:
+                referenced.add(name)
+                if name in views:
+                    pending.append(name)
+    if any(name.startswith("_") and not name.startswith(_VERSIONED_INTERNAL_PREFIXES) for name in referenced):
+        return None
+
+    referenced = sorted(referenced)
+    versions = {}
+    if _versions_exist(cursor):
+        keys = referenced + [ALL_TABLES]
+        placeholders = ", ".join("?" for _ in keys)
+        versions = dict(cursor.execute(
+            f"SELECT table_name, version FROM {TABLE_VERSIONS} WHERE table_name IN ({placeholders})", keys))
+    return (schema_version, versions.get(ALL_TABLES, 0), tuple((name, versions.get(name, 0)) for name in referenced))
+
+
+def _result_size(result: Dict[str, Any]) -> int:
+    """结果占用内存的估算（字节）"""
+    rows = result.get("data") or []
+    return (sys.getsizeof(rows) + sum(sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row) for row in rows)
+            + sum(sys.getsizeof(value) for value in result.values() if isinstance(value, str)))
+
+
+class QueryResultCache:
+    """
+    查询结果缓存 - 按 (数据库路径, 规范化SQL) 保存只读查询的结果和当时的数据版本
+
+    命中时要求数据版本与当前一致，因此导入、删除、建表改表后旧结果不会被返回；
+    按估算的内存占用做LRU淘汰，总量不超过 QUERY_RESULT_CACHE_MAX_BYTES
+    """
+
+    def __init__(self):
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0
+
+    def _remove(self, key: Tuple[str, str]):
+        """移除一条结果（调用方需持有 _lock）"""
+        entry = self._entries.pop(key)
+        self._bytes -= entry["size"]
+
+    def lookup(self, cursor: sqlite3.Cursor, db_path: str, sql: str) -> Tuple[Optional[Dict[str, Any]], Optional[Tuple]]:
+        """
+        查找缓存的结果（cursor 应处于随后执行查询的同一个读事务中，版本与结果读自同一快照）
+
+        Returns:
+            (命中的缓存条目, None) 或 (None, 写回用的标识)；不可缓存的查询返回 (None, None)
+        """
+        if not Config.QUERY_RESULT_CACHE_ENABLED:
+            return None, None
+        normalized = normalize_sql(sql)
+        if _NONDETERMINISTIC.search(normalized):
+            return None, None
+        version = data_version(cursor, normalized)
+        if version is None:
+            return None, None
+        key = (os.path.abspath(str(db_path)), normalized)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["version"] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                entry["hits"] += 1
+                self.saved_seconds += entry["execution_time"]
+                return entry, None
+            if entry is not None:
+                # 数据已变化的旧结果
+                self._remove(key)
+            self.misses += 1
+        return None, (key, version)
+
+    def store(self, token: Optional[Tuple], result: Dict[str, Any]):
+        """写入查询结果（token 为 lookup 返回的标识）；超过容量时淘汰最久未用的结果"""
+        if token is None:
+            return
+        key, version = token
+        size = _result_size(result)
+        if size > Config.QUERY_RESULT_CACHE_MAX_BYTES:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = {
+                "result": result,
+                "version": version,
+                "size": size,
+                "execution_time": result.get("execution_time") or 0.0,
+                "hits": 0
+            }
+            self._bytes += size
+            while self._bytes > Config.QUERY_RESULT_CACHE_MAX_BYTES:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, db_path: str):
+        """丢弃某个数据库的全部缓存结果（数据库文件被删除重建时调用）"""
+        db_path = os.path.abspath(str(db_path))
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == db_path]:
+                self._remove(key)
+
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 4) if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": Config.QUERY_RESULT_CACHE_ENABLED,
+                "entries": len(self._entries),
+                "memory_bytes": self._bytes,
+                "max_bytes": Config.QUERY_RESULT_CACHE_MAX_BYTES,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hit_rate(),
+                "evictions": self.evictions,
+                "saved_seconds": round(self.saved_seconds, 4)
+            }
+
+
+# 全局查询结果缓存实例
+query_result_cache = QueryResultCache()
@@ -0,0 +1,161 @@
+# sample_import.py - 样本优先导入：先用蓄水池抽样生成可立即查询的样本表，全量导入完成后原子替换
+import math
+import random
+import sqlite3
+from datetime import datetime
+from itertools import islice
+from typing import Dict, List, Optional, Any, Tuple
+
+from data_importer import replace_table, discard_staging_table
+
+# 样本表目录：记录哪些表当前只是样本、样本行数、估算的全量行数和全量导入状态
+SAMPLE_CATALOG = "_sample_tables"
+
+
+def staging_table_name(table_name: str) -> str:
+    """全量数据导入期间使用的暂存表名（下划线开头，不出现在用户表列表中）"""
+    return f"_full_{table_name}"
+
+
+def reservoir_sample_lines(stream, sample_rows: int, seed: Optional[int] = None) -> Tuple[bytes, List[bytes], int]:
+    """
+    对CSV的数据行做均匀的蓄水池抽样（Algorithm L：按几何分布跳过行，跳过的行由 islice 在C层面消费，
+    只在被选中时才回到Python），整个文件只顺序读一遍
+
+    含有换行的引号字段会被按行切开，这类不完整的行在解析样本时丢弃
+
+    Args:
+        stream: 二进制可读流（已解压）
+        sample_rows: 样本行数
+        seed: 随机种子（可选，用于复现）
+
+    Returns:
+        (表头行, 样本行列表, 数据部分的字节数)
+    """
+    rng = random.Random(seed)
+    header = stream.readline()
+    reservoir = list(islice(stream, sample_rows))
+    if len(reservoir) == sample_rows:
+        w = math.exp(math.log(rng.random()) / sample_rows)
+        while True:
+            skip = int(math.log(rng.random()) / math.log(1 - w))
+            line = next(islice(stream, skip, None), None)
+            if line is None:
+                break
+            reservoir[rng.randrange(sample_rows)] = line
+            w *= math.exp(math.log(rng.random()) / sample_rows)
+    data_bytes = stream.tell() - len(header)
+    # 最后一行可能没有换行符，拼接前补齐
+    return header, [line if line.endswith(b'\n') else line + b'\n' for line in reservoir], data_bytes
+
+
+def save_sample_info(cursor: sqlite3.Cursor, table_name: str, sample_rows: int,
+                     estimated_total_rows: Optional[int], filename: str):
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SAMPLE_CATALOG} (
+            table_name TEXT PRIMARY KEY,
+            sample_rows INTEGER NOT NULL,
+            estimated_total_rows INTEGER,
+            filename TEXT,
+            status TEXT NOT NULL,
+            error TEXT,
+            created_at TEXT NOT NULL
+        )
+    """)
+    cursor.execute(f"""
+        INSERT OR REPLACE INTO {SAMPLE_CATALOG}
+            (table_name, sample_rows, estimated_total_rows, filename, status, error, created_at)
+        VALUES (?, ?, ?, ?, 'loading', NULL, ?)
+    """, (table_name, sample_rows, estimated_total_rows, filename, datetime.now().isoformat()))
+
+
+def _catalog_exists(cursor: sqlite3.Cursor) -> bool:
+    return cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?",
+                          (SAMPLE_CATALOG,)).fetchone() is not None
+
+
+def load_sample_tables(cursor: sqlite3.Cursor) -> Dict[str, Dict[str, Any]]:
+    """当前仍是样本的表：表名 -> 样本信息"""
+    if not _catalog_exists(cursor):
+        return {}
+    cursor.execute(f"""
+        SELECT table_name, sample_rows, estimated_total_rows, filename, status, error, created_at
+        FROM {SAMPLE_CATALOG}
+    """)
+    return {
+        row[0]: {
+            "sample_rows": row[1],
+            "estimated_total_rows": row[2],
+            "filename": row[3],
+            "status": row[4],
+            "error": row[5],
+            "created_at": row[6]
+        }
+        for row in cursor.fetchall()
+    }
+
+
+def mark_sample_failed(cursor: sqlite3.Cursor, table_name: str, error: str):
+    """全量导入失败：丢弃可能残留的暂存表，样本表保留，目录中记录失败原因"""
+    discard_staging(cursor, table_name)
+    if _catalog_exists(cursor):
+        cursor.execute(f"UPDATE {SAMPLE_CATALOG} SET status = 'failed', error = ? WHERE table_name = ?",
+                       (error, table_name))
+
+
+def delete_sample_info(cursor: sqlite3.Cursor, table_name: Optional[str] = None):
+    """删除表的样本记录（table_name 为 None 时清空整个目录）"""
+    if not _catalog_exists(cursor):
+        return
+    if table_name is None:
+        cursor.execute(f"DELETE FROM {SAMPLE_CATALOG}")
+    else:
+        cursor.execute(f"DELETE FROM {SAMPLE_CATALOG} WHERE table_name = ?", (table_name,))
+
+
+def discard_staging(cursor: sqlite3.Cursor, table_name: str):
+    discard_staging_table(cursor, staging_table_name(table_name))
+
+
+def replace_sample_table(conn: sqlite3.Connection, table_name: str) -> bool:
+    """
+    在一个短事务中用暂存表中的全量数据替换样本表：删除样本表，把暂存表改名为原表名，
+    列统计随之迁移（自动索引随表改名）
+
+    Args:
+        conn: isolation_level=None 的连接（由本函数控制事务）
+
+    Returns:
+        是否完成替换；样本表在全量导入期间已被删除时丢弃暂存表并返回 False
+    """
+    staging = staging_table_name(table_name)
+    cursor = conn.cursor()
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if table_name not in load_sample_tables(cursor):
+            discard_staging(cursor, table_name)
+            cursor.execute("COMMIT")
+            return False
+
+        replace_table(cursor, staging, table_name)
+        delete_sample_info(cursor, table_name)
+        cursor.execute("COMMIT")
+        return True
+    except Exception:
+        cursor.execute("ROLLBACK")
+        raise
+
+
+def describe_sample(info: Dict[str, Any]) -> str:
+    """提供给LLM的样本说明"""
+    total = info.get("estimated_total_rows")
+    if total:
+        scope = f"约占全量 {total} 行的 {info['sample_rows'] / total:.1%}"
+    else:
+        scope = "全量行数未知"
+    if info.get("status") == "failed":
+        state = f"全量导入失败（{info.get('error')}），目前只有样本"
+    else:
+        state = "全量数据正在后台导入，完成后会自动替换为全量表"
+    return (f"该表是均匀随机样本（{info['sample_rows']} 行，{scope}），{state}。"
+            f"分布、占比、均值等结论可以基于样本给出；计数、求和等总量需按比例换算，并告知用户结果基于样本")
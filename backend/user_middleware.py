@@ -152,6 +152,7 @@ class UserManager:
         return {
             'user_dir': user_dir,
             'db_path': user_dir / "analysis.db",
+            'dataset_cache_path': user_dir / "dataset_cache.db",
             'memory_path': user_dir / "conversation_memory.json",
             'reports_dir': user_dir / "reports",
             'uploads_dir': user_dir / "uploads"
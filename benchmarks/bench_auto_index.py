@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+自动索引前后的查询耗时对比
+
+在确定性生成的订单表/客户表上回放一组分析对话中常见的模型生成查询
+（benchmarks/llm_query_workload.json），分别测量导入后无索引、
+以及 AutoIndexBuilder 建立索引并 ANALYZE 之后的耗时
+
+用法: python benchmarks/bench_auto_index.py [--rows 1000000] [--repeat 5] [--workload path.json]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from data_importer import DataImporter  # noqa: E402
+from index_builder import AutoIndexBuilder  # noqa: E402
+
+DEFAULT_WORKLOAD = Path(__file__).resolve().parent / 'llm_query_workload.json'
+
+
+def generate_csvs(orders_path: str, customers_path: str, rows: int, seed: int = 42):
+    """生成订单表和客户表的确定性测试数据"""
+    rng = np.random.RandomState(seed)
+    customers = max(rows // 50, 1000)
+    pd.DataFrame({
+        "customer_id": np.arange(1, customers + 1),
+        "city": rng.choice(["杭州", "上海", "北京", "深圳", "成都", "武汉", "西安", "南京"], customers),
+        "level": rng.choice(["普通", "银卡", "金卡", "钻石"], customers),
+    }).to_csv(customers_path, index=False)
+
+    order_dates = pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.randint(0, 730, rows), unit="D")
+    pd.DataFrame({
+        "order_id": np.arange(1, rows + 1),
+        "customer_id": rng.randint(1, customers + 1, rows),
+        "region": rng.choice(["华东", "华北", "华南", "西南", "西北", "东北"], rows),
+        "category": rng.choice(["电子产品", "服装", "食品", "家居", "图书", "美妆", "运动", "母婴"], rows),
+        "order_date": order_dates.strftime("%Y-%m-%d"),
+        "amount": rng.uniform(1, 5000, rows).round(2),
+        "quantity": rng.randint(1, 20, rows),
+    }).to_csv(orders_path, index=False)
+
+
+def time_workload(db_path: str, queries, tables, repeat: int):
+    """返回每条查询耗时中位数（毫秒）"""
+    conn = sqlite3.connect(db_path)
+    timings = {}
+    try:
+        for query in queries:
+            sql = query["sql"].format(**tables)
+            conn.execute(sql).fetchall()  # 预热页缓存
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                conn.execute(sql).fetchall()
+                samples.append((time.perf_counter() - start) * 1000)
+            timings[query["name"]] = statistics.median(samples)
+    finally:
+        conn.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="自动索引前后的查询耗时对比")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--workload", default=str(DEFAULT_WORKLOAD))
+    args = parser.parse_args()
+
+    with open(args.workload, encoding="utf-8") as f:
+        queries = json.load(f)["queries"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        orders_csv = os.path.join(tmp, "orders.csv")
+        customers_csv = os.path.join(tmp, "customers.csv")
+        db_path = os.path.join(tmp, "bench.db")
+        tables = {"orders": "orders", "customers": "customers"}
+
+        print(f"📦 生成 {args.rows} 行订单数据...")
+        generate_csvs(orders_csv, customers_csv, args.rows)
+        importer = DataImporter(db_path)
+        orders = importer.import_csv(orders_csv, "orders")
+        customers = importer.import_csv(customers_csv, "customers")
+
+        before = time_workload(db_path, queries, tables, args.repeat)
+
+        builder = AutoIndexBuilder(db_path)
+        db_size_before = os.path.getsize(db_path)
+        for table_name, result in (("orders", orders), ("customers", customers)):
+            built = builder.build(table_name, row_count=result["rows_imported"])
+            print(f"🗂️ {table_name}: {[index['column'] for index in built['created']]} "
+                  f"({built['elapsed_seconds']:.2f}s)")
+        db_size_after = os.path.getsize(db_path)
+        print(f"数据库大小: {db_size_before / 1024 / 1024:.1f} MB -> {db_size_after / 1024 / 1024:.1f} MB\n")
+
+        after = time_workload(db_path, queries, tables, args.repeat)
+
+        print(f"{'查询':<24}{'无索引(ms)':>12}{'自动索引(ms)':>14}{'加速比':>8}")
+        for name in before:
+            print(f"{name:<24}{before[name]:>12.2f}{after[name]:>14.2f}{before[name] / max(after[name], 1e-6):>7.1f}x")
+        total_before, total_after = sum(before.values()), sum(after.values())
+        print(f"{'合计':<24}{total_before:>12.2f}{total_after:>14.2f}{total_before / max(total_after, 1e-6):>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
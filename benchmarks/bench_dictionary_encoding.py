@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+字典编码前后的数据库大小与查询耗时对比
+
+同一份CSV分别以普通方式和字典编码方式导入（DataImporter dictionary_encode=True），
+对比数据库文件大小，以及在原表名（编码时为视图）上执行的 GROUP BY / 筛选查询耗时；
+另外测量在基表上先按编码分组、再关联字典表取值的写法。
+
+用法: python benchmarks/bench_dictionary_encoding.py [--rows 1000000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from config import Config  # noqa: E402
+from data_importer import DataImporter  # noqa: E402
+
+QUERIES = {
+    "group_by_region": "SELECT region, SUM(amount) FROM sales GROUP BY region",
+    "group_by_channel_region": "SELECT channel, region, COUNT(*) FROM sales GROUP BY channel, region",
+    "group_by_category": "SELECT category, COUNT(*), AVG(amount) FROM sales GROUP BY category",
+    "filter_channel": "SELECT SUM(amount) FROM sales WHERE channel = '直播带货'",
+    "count": "SELECT COUNT(*) FROM sales",
+}
+
+# 在基表上按编码分组后再关联字典表（get_table_info 中对编码表给出的写法提示）
+CODE_GROUPED_QUERIES = {
+    "group_by_region": "SELECT d.value, g.total FROM (SELECT region, SUM(amount) AS total FROM _enc_sales "
+                       "GROUP BY region) g JOIN _dict_sales__region d ON d.code = g.region",
+    "group_by_category": "SELECT d.value, g.n, g.avg_amount FROM (SELECT category, COUNT(*) AS n, AVG(amount) AS avg_amount "
+                         "FROM _enc_sales GROUP BY category) g JOIN _dict_sales__category d ON d.code = g.category",
+}
+
+
+def generate_csv(path: str, rows: int, seed: int = 42):
+    """生成以低基数文本列为主的确定性订单数据"""
+    rng = np.random.RandomState(seed)
+    pd.DataFrame({
+        "order_id": np.arange(1, rows + 1),
+        "region": rng.choice(["华东地区", "华北地区", "华南地区", "西南地区", "西北地区", "东北地区"], rows),
+        "channel": rng.choice(["线上商城", "线下门店", "分销渠道", "直播带货"], rows),
+        "category": rng.choice([f"品类{i:02d}-家居日用" for i in range(40)], rows),
+        "amount": rng.uniform(1, 5000, rows).round(2),
+    }).to_csv(path, index=False)
+
+
+def time_query(db_path: str, sql: str, repeat: int) -> float:
+    """返回查询耗时中位数（毫秒）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql).fetchall()  # 预热页缓存
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="字典编码前后的数据库大小与查询耗时对比")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # 只比较存储方式本身，导入时不建自动索引
+    Config.AUTO_INDEX_ENABLED = False
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "sales.csv")
+        plain_db = os.path.join(tmp, "plain.db")
+        encoded_db = os.path.join(tmp, "encoded.db")
+
+        print(f"📦 生成 {args.rows} 行测试数据...")
+        generate_csv(csv_path, args.rows)
+
+        DataImporter(plain_db).import_csv(csv_path, "sales")
+        result = DataImporter(encoded_db, dictionary_encode=True).import_csv(csv_path, "sales")
+
+        plain_mb = os.path.getsize(plain_db) / 1024 / 1024
+        encoded_mb = os.path.getsize(encoded_db) / 1024 / 1024
+        print(f"\n编码列: {result['encoded_columns']}")
+        print(f"数据库大小: 普通 {plain_mb:.1f} MB, 字典编码 {encoded_mb:.1f} MB ({encoded_mb / plain_mb:.0%})\n")
+
+        print(f"{'查询':<26}{'普通(ms)':>10}{'编码视图(ms)':>14}{'按编码分组(ms)':>16}")
+        for name, sql in QUERIES.items():
+            plain_ms = time_query(plain_db, sql, args.repeat)
+            view_ms = time_query(encoded_db, sql, args.repeat)
+            code_ms = time_query(encoded_db, CODE_GROUPED_QUERIES[name], args.repeat) \
+                if name in CODE_GROUPED_QUERIES else None
+            code_text = f"{code_ms:>16.1f}" if code_ms is not None else f"{'-':>16}"
+            print(f"{name:<26}{plain_ms:>10.1f}{view_ms:>14.1f}{code_text}")
+
+
+if __name__ == "__main__":
+    main()
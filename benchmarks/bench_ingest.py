@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+CSV导入吞吐量基准测试
+
+按 行数 × 宽窄表 × 编码 生成确定性的合成CSV（混合整数、浮点、千分位文本数字、日期、
+时间、中文分类、前导零编码、缺失值），通过 DatabaseAnalyzer.import_csv_to_sqlite
+走完整的导入路径，记录 行/秒、峰值内存（RSS）和生成的数据库大小。
+
+每个用例在独立的子进程中运行，峰值内存互不影响；同一参数生成的数据文件内容完全相同，
+可用 --data-dir 在多次运行之间复用，结果可以跨提交比较。
+
+用法:
+    # 记录基线
+    python benchmarks/bench_ingest.py --output ingest_baseline.json
+    # 与基线比较，任一用例吞吐量下降超过 15% 时以非零状态退出
+    python benchmarks/bench_ingest.py --baseline ingest_baseline.json --threshold 0.15
+    # 完整矩阵（5M 行宽表约数 GB，建议指定 --data-dir 复用生成的文件）
+    python benchmarks/bench_ingest.py --sizes 10000,100000,1000000,5000000 --data-dir /tmp/ingest-data
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+sys.path.insert(0, str(BACKEND_DIR))
+
+# 数据生成逻辑变化时递增，避免复用旧版本生成的文件
+DATA_VERSION = 1
+GENERATE_BLOCK_ROWS = 100000
+SHAPES = {"narrow": 1, "wide": 6}  # 每组10列，宽表重复6组共60列
+ENCODINGS = ("utf-8", "gbk")
+
+REGIONS = ["华东", "华北", "华南", "西南", "西北", "东北"]
+PRODUCTS = ["笔记本电脑", "手机", "耳机", "显示器", "键盘", "鼠标", "路由器", "平板"]
+NOTES = ["正常", "加急订单", "客户要求开发票", "退货重发", "", "VIP 客户", "赠品随单"]
+
+
+def _column_group(rng: np.random.RandomState, start: int, rows: int, group: int) -> dict:
+    """生成一组10列混合类型的数据"""
+    suffix = f"_{group}" if group else ""
+    amount = rng.uniform(1, 100000, rows).round(2)
+    quantity = rng.randint(1, 500, rows).astype(float)
+    quantity[rng.rand(rows) < 0.05] = np.nan
+    seconds = rng.randint(0, 730 * 86400, rows)
+    timestamps = pd.to_datetime("2023-01-01") + pd.to_timedelta(seconds, unit="s")
+    return {
+        f"订单编号{suffix}": np.arange(start + 1, start + rows + 1),
+        f"region{suffix}": rng.choice(REGIONS, rows),
+        f"product{suffix}": rng.choice(PRODUCTS, rows),
+        f"amount{suffix}": [f"{a:,.2f}" for a in amount],
+        f"price{suffix}": rng.normal(500, 120, rows).round(3),
+        f"quantity{suffix}": quantity,
+        f"order_date{suffix}": timestamps.strftime("%Y-%m-%d"),
+        f"updated_at{suffix}": timestamps.strftime("%Y-%m-%d %H:%M:%S"),
+        f"sku{suffix}": [f"{code:06d}" for code in rng.randint(0, 50000, rows)],
+        f"备注{suffix}": rng.choice(NOTES, rows),
+    }
+
+
+def generate_csv(path: str, rows: int, shape: str, encoding: str, seed: int = 42):
+    """分块写出确定性的合成CSV（每块使用独立的随机种子，内存占用与总行数无关）"""
+    tmp_path = f"{path}.part"
+    with open(tmp_path, "w", encoding=encoding, newline="") as f:
+        for block, start in enumerate(range(0, rows, GENERATE_BLOCK_ROWS)):
+            block_rows = min(GENERATE_BLOCK_ROWS, rows - start)
+            rng = np.random.RandomState([seed, block])
+            data = {}
+            for group in range(SHAPES[shape]):
+                data.update(_column_group(rng, start, block_rows, group))
+            pd.DataFrame(data).to_csv(f, index=False, header=(block == 0))
+    os.replace(tmp_path, path)
+
+
+def dataset_path(data_dir: str, rows: int, shape: str, encoding: str) -> str:
+    path = os.path.join(data_dir, f"ingest_v{DATA_VERSION}_{shape}_{rows}_{encoding}.csv")
+    if not os.path.exists(path):
+        print(f"📦 生成 {shape} {rows} 行 {encoding} 数据...")
+        generate_csv(path, rows, shape, encoding)
+    return path
+
+
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # Windows 下没有 resource 模块
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 上单位为 KB，macOS 上为字节
+    return round(peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def run_import(csv_path: str, db_path: str) -> dict:
+    """子进程入口：执行一次完整导入，返回耗时、峰值内存和数据库大小"""
+    sys.path.insert(0, str(BACKEND_DIR))
+    from database_analyzer import DatabaseAnalyzer
+
+    analyzer = DatabaseAnalyzer(api_key="benchmark")
+    start = time.perf_counter()
+    result = analyzer.import_csv_to_sqlite(csv_path, "bench", db_path)
+    elapsed = time.perf_counter() - start
+    if not result.get("success"):
+        raise RuntimeError(result.get("message"))
+    return {
+        "rows": result["rows_imported"],
+        "columns": len(result["columns"]),
+        "seconds": elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+        "db_size_mb": round(os.path.getsize(db_path) / 1024 / 1024, 2),
+    }
+
+
+def run_case(csv_path: str, work_dir: str, repeat: int) -> dict:
+    """每次导入使用新的子进程和新的数据库，取吞吐量中位数和峰值内存最大值"""
+    runs = []
+    for attempt in range(repeat):
+        db_path = os.path.join(work_dir, f"bench_{attempt}.db")
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            runs.append(executor.submit(run_import, csv_path, db_path).result())
+        os.remove(db_path)
+
+    rss = [run["peak_rss_mb"] for run in runs if run["peak_rss_mb"] is not None]
+    return {
+        "rows": runs[0]["rows"],
+        "columns": runs[0]["columns"],
+        "file_mb": round(os.path.getsize(csv_path) / 1024 / 1024, 2),
+        "seconds": round(statistics.median(run["seconds"] for run in runs), 3),
+        "rows_per_second": round(statistics.median(run["rows"] / run["seconds"] for run in runs), 1),
+        "peak_rss_mb": max(rss) if rss else None,
+        "db_size_mb": runs[0]["db_size_mb"],
+    }
+
+
+def environment_info() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    from config import Config
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "chunk_size": Config.IMPORT_CHUNK_SIZE,
+        "data_version": DATA_VERSION,
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """返回吞吐量比基线下降超过 threshold 的用例"""
+    regressions = []
+    for case_id, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(case_id)
+        if not previous:
+            continue
+        change = current["rows_per_second"] / previous["rows_per_second"] - 1
+        current["baseline_rows_per_second"] = previous["rows_per_second"]
+        current["change"] = round(change, 4)
+        if change < -threshold:
+            regressions.append(case_id)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CSV导入吞吐量基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="逗号分隔的行数列表")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help="narrow / wide")
+    parser.add_argument("--encodings", default=",".join(ENCODINGS), help="utf-8 / gbk")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--data-dir", help="生成数据的存放目录（默认使用临时目录，运行结束后删除）")
+    parser.add_argument("--output", help="结果JSON的写入路径（可作为之后运行的基线）")
+    parser.add_argument("--baseline", help="用于比较的基线JSON")
+    parser.add_argument("--threshold", type=float, default=0.15, help="允许的吞吐量下降比例")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",")]
+    shapes = args.shapes.split(",")
+    encodings = args.encodings.split(",")
+    for shape in shapes:
+        if shape not in SHAPES:
+            parser.error(f"未知的表形状: {shape}")
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    results = {"environment": environment_info(), "cases": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for rows in sizes:
+            for shape in shapes:
+                for encoding in encodings:
+                    case_id = f"{shape}_{rows}_{encoding}"
+                    csv_path = dataset_path(data_dir, rows, shape, encoding)
+                    results["cases"][case_id] = run_case(csv_path, tmp, args.repeat)
+                    case = results["cases"][case_id]
+                    print(f"⏱️ {case_id}: {case['rows_per_second']:.0f} 行/秒, "
+                          f"峰值内存 {case['peak_rss_mb']} MB, 数据库 {case['db_size_mb']} MB")
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+
+    print(f"\n{'用例':<28}{'行/秒':>12}{'基线':>12}{'变化':>9}{'峰值内存MB':>12}{'数据库MB':>10}")
+    for case_id, case in results["cases"].items():
+        previous = f"{case['baseline_rows_per_second']:.0f}" if "baseline_rows_per_second" in case else "-"
+        change = f"{case['change'] * 100:+.1f}%" if "change" in case else "-"
+        print(f"{case_id:<28}{case['rows_per_second']:>12.0f}{previous:>12}{change:>9}"
+              f"{case['peak_rss_mb'] or '-':>12}{case['db_size_mb']:>10}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 结果已写入 {args.output}")
+
+    if regressions:
+        print(f"\n❌ 吞吐量下降超过 {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+只读连接池前后的小查询单次耗时对比
+
+分析对话中模型生成的查询大多是点查、带过滤的计数和小范围聚合，单次执行只需零点几毫秒，
+此时每次调用都新建连接（打开文件、解析库结构、冷页缓存、重新编译语句）的开销占了大头。
+分别测量每次 sqlite3.connect 新建连接与从 connection_pools 借用连接时，
+一次调用（借出/打开 + 执行 + 取回结果 + 归还/关闭）的中位数和 p95 耗时
+
+用法: python benchmarks/bench_query_pool.py [--rows 200000] [--calls 500]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from connection_pool import connection_pools  # noqa: E402
+from data_importer import DataImporter  # noqa: E402
+from index_builder import AutoIndexBuilder  # noqa: E402
+
+QUERIES = {
+    "点查": "SELECT * FROM orders WHERE order_id = 12345",
+    "过滤计数": "SELECT COUNT(*) FROM orders WHERE region = '华东' AND quantity > 10",
+    "小范围聚合": "SELECT region, SUM(amount) FROM orders WHERE order_id BETWEEN 1000 AND 2000 GROUP BY region",
+    "表结构": "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') ORDER BY name",
+}
+
+
+def generate_csv(path: str, rows: int, seed: int = 42):
+    """生成订单表的确定性测试数据"""
+    rng = np.random.RandomState(seed)
+    pd.DataFrame({
+        "order_id": np.arange(1, rows + 1),
+        "region": rng.choice(["华东", "华北", "华南", "西南", "西北", "东北"], rows),
+        "category": rng.choice(["电子产品", "服装", "食品", "家居", "图书", "美妆", "运动", "母婴"], rows),
+        "amount": rng.uniform(1, 5000, rows).round(2),
+        "quantity": rng.randint(1, 20, rows),
+    }).to_csv(path, index=False)
+
+
+def run_fresh(db_path: str, sql: str):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(sql).fetchall()
+    finally:
+        conn.close()
+
+
+def run_pooled(db_path: str, sql: str):
+    with connection_pools.connection(db_path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+def time_calls(run, db_path: str, sql: str, calls: int):
+    """返回 (中位数, p95) 毫秒"""
+    run(db_path, sql)  # 预热
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        run(db_path, sql)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="只读连接池前后的小查询单次耗时对比")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "orders.csv")
+        db_path = os.path.join(tmp, "bench.db")
+
+        print(f"📦 生成 {args.rows} 行订单数据...")
+        generate_csv(csv_path, args.rows)
+        result = DataImporter(db_path).import_csv(csv_path, "orders")
+        AutoIndexBuilder(db_path).build("orders", row_count=result["rows_imported"])
+
+        print(f"\n{'查询':<12}{'新建连接 p50/p95(ms)':>24}{'连接池 p50/p95(ms)':>22}{'加速比':>8}")
+        total_fresh = total_pooled = 0.0
+        for name, sql in QUERIES.items():
+            fresh = time_calls(run_fresh, db_path, sql, args.calls)
+            pooled = time_calls(run_pooled, db_path, sql, args.calls)
+            total_fresh += fresh[0]
+            total_pooled += pooled[0]
+            print(f"{name:<12}{fresh[0]:>14.3f} / {fresh[1]:<7.3f}{pooled[0]:>12.3f} / {pooled[1]:<7.3f}"
+                  f"{fresh[0] / max(pooled[0], 1e-6):>7.1f}x")
+        print(f"{'合计(p50)':<12}{total_fresh:>14.3f}{'':>10}{total_pooled:>12.3f}{'':>10}"
+              f"{total_fresh / max(total_pooled, 1e-6):>7.1f}x")
+        print(f"\n连接池统计: {connection_pools.stats()}")
+        connection_pools.invalidate(db_path)
+
+
+if __name__ == "__main__":
+    main()
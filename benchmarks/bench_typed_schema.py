@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+类型化建表前后的聚合查询耗时对比
+
+对比两种导入方式在同一份CSV上的 SUM / GROUP BY 查询耗时：
+- 旧方式: pd.read_csv + df.to_sql（带千分位的金额列被存成 TEXT，查询时需要文本转数字）
+- 新方式: DataImporter（显式 INTEGER/REAL/DATE 建表 + 批量导入）
+
+用法: python benchmarks/bench_typed_schema.py [--rows 500000] [--repeat 5]
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+from data_importer import DataImporter  # noqa: E402
+
+# 旧方式下金额列是文本，LLM 需要写出文本转数字的SQL才能得到正确结果
+LEGACY_QUERIES = {
+    "sum_amount": "SELECT SUM(CAST(REPLACE(amount, ',', '') AS REAL)) FROM sales",
+    "group_by_region": "SELECT region, SUM(CAST(REPLACE(amount, ',', '') AS REAL)), SUM(quantity) FROM sales GROUP BY region",
+    "group_by_month": "SELECT substr(order_date, 1, 7) AS m, SUM(CAST(REPLACE(amount, ',', '') AS REAL)) FROM sales GROUP BY m",
+}
+
+TYPED_QUERIES = {
+    "sum_amount": "SELECT SUM(amount) FROM sales",
+    "group_by_region": "SELECT region, SUM(amount), SUM(quantity) FROM sales GROUP BY region",
+    "group_by_month": "SELECT substr(order_date, 1, 7) AS m, SUM(amount) FROM sales GROUP BY m",
+}
+
+
+def generate_csv(path: str, rows: int, seed: int = 42):
+    """生成带千分位金额列的确定性销售数据"""
+    rng = np.random.RandomState(seed)
+    amounts = rng.uniform(1, 50000, rows).round(2)
+    df = pd.DataFrame({
+        "order_id": np.arange(1, rows + 1),
+        "region": rng.choice(["华东", "华北", "华南", "西南", "西北", "东北"], rows),
+        "amount": [f"{a:,.2f}" for a in amounts],
+        "quantity": rng.randint(1, 100, rows),
+        "order_date": pd.to_datetime("2023-01-01") + pd.to_timedelta(rng.randint(0, 730, rows), unit="D"),
+    })
+    df["order_date"] = df["order_date"].dt.strftime("%Y-%m-%d")
+    df.to_csv(path, index=False)
+
+
+def time_query(db_path: str, sql: str, repeat: int) -> float:
+    """返回查询耗时中位数（毫秒）"""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute(sql).fetchall()  # 预热页缓存
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            conn.execute(sql).fetchall()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="类型化建表前后的聚合查询耗时对比")
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "sales.csv")
+        legacy_db = os.path.join(tmp, "legacy.db")
+        typed_db = os.path.join(tmp, "typed.db")
+
+        print(f"📦 生成 {args.rows} 行测试数据...")
+        generate_csv(csv_path, args.rows)
+
+        start = time.perf_counter()
+        conn = sqlite3.connect(legacy_db)
+        pd.read_csv(csv_path).to_sql("sales", conn, index=False)
+        conn.close()
+        legacy_import = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = DataImporter(typed_db).import_csv(csv_path, "sales")
+        typed_import = time.perf_counter() - start
+
+        print(f"\n列类型: {result['column_types']}")
+        print(f"导入耗时: 旧方式 {legacy_import:.2f}s, 新方式 {typed_import:.2f}s\n")
+        print(f"{'查询':<18}{'旧方式(ms)':>12}{'新方式(ms)':>12}{'加速比':>8}")
+        for name in TYPED_QUERIES:
+            legacy_ms = time_query(legacy_db, LEGACY_QUERIES[name], args.repeat)
+            typed_ms = time_query(typed_db, TYPED_QUERIES[name], args.repeat)
+            print(f"{name:<18}{legacy_ms:>12.1f}{typed_ms:>12.1f}{legacy_ms / typed_ms:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
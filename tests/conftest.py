@@ -0,0 +1,45 @@
+# conftest.py - 后端模块以扁平方式互相导入，测试时把 backend 目录加入搜索路径
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    """连接到临时数据库的分析器（不调用模型），结束时丢弃连接池和查询缓存中属于临时数据库的内容"""
+    from database_analyzer import DatabaseAnalyzer
+    from connection_pool import connection_pools
+    from query_cache import query_result_cache
+
+    instance = DatabaseAnalyzer("sk-test")
+    instance.current_db_path = str(tmp_path / "analysis.db")
+    yield instance
+    connection_pools.invalidate(instance.current_db_path)
+    query_result_cache.invalidate(instance.current_db_path)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    """Flask 测试客户端：用户数据目录指向临时目录，请求以固定用户身份发出，分析器预先创建（不校验API密钥）"""
+    monkeypatch.chdir(tmp_path)
+    import app as app_module
+    from database_analyzer import DatabaseAnalyzer
+    from user_middleware import user_manager
+
+    monkeypatch.setattr(user_manager, "base_data_dir", tmp_path / "data")
+    user_id, api_key = "tester", "sk-test"
+    instance = DatabaseAnalyzer(api_key)
+    instance.current_db_path = str(user_manager.get_user_paths(user_id)["db_path"])
+    monkeypatch.setitem(app_module.user_analyzers, f"{user_id}_{hash(api_key) % 10000}", instance)
+
+    test_client = app_module.app.test_client()
+    test_client.environ_base.update({"HTTP_X_USER_ID": user_id, "HTTP_X_API_KEY": api_key})
+    test_client.analyzer = instance
+    yield test_client
+    from connection_pool import connection_pools
+    from query_cache import query_result_cache
+    connection_pools.invalidate(instance.current_db_path)
+    query_result_cache.invalidate(instance.current_db_path)
@@ -0,0 +1,83 @@
+# test_arrow_import.py - Parquet / Arrow IPC 导入：按记录批切块，列类型取自文件schema
+import datetime
+import decimal
+import io
+import json
+import sqlite3
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc as pa_ipc
+import pyarrow.parquet as pq
+
+from data_importer import DataImporter
+
+
+def sample_table(rows=25):
+    return pa.table({
+        "id": pa.array(range(rows), pa.int64()),
+        "price": pa.array([decimal.Decimal(f"{i}.25") for i in range(rows)], pa.decimal128(10, 2)),
+        "day": pa.array([datetime.date(2024, 1, 1 + i % 28) for i in range(rows)], pa.date32()),
+        "city": pa.array(["bj", "sh"] * (rows // 2) + ["gz"] * (rows % 2)).dictionary_encode(),
+        "tags": pa.array([[i, i + 1] for i in range(rows)], pa.list_(pa.int64())),
+    })
+
+
+def declared_types(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return {row[1]: row[2] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def test_parquet_import(tmp_path):
+    buffer = io.BytesIO()
+    pq.write_table(sample_table(), buffer, row_group_size=25)
+    buffer.seek(0)
+    db_path = str(tmp_path / "test.db")
+
+    result = DataImporter(db_path, chunk_size=10).import_arrow(buffer, "t", file_format=".parquet")
+
+    assert result["rows_imported"] == 25
+    assert result["import_stats"]["chunks"] == 3
+    assert declared_types(db_path, "t") == {
+        "id": "INTEGER", "price": "REAL", "day": "DATE", "city": "TEXT", "tags": "TEXT"}
+    with sqlite3.connect(db_path) as conn:
+        price, city, tags = conn.execute("SELECT price, city, tags FROM t WHERE id = 3").fetchone()
+    assert (price, city, json.loads(tags)) == (3.25, "sh", [3, 4])
+
+
+@pytest.mark.parametrize("fmt, writer", [(".arrow", pa_ipc.new_file), (".arrows", pa_ipc.new_stream)])
+def test_ipc_import_from_unseekable_stream(tmp_path, fmt, writer):
+    table = sample_table()
+    buffer = io.BytesIO()
+    with writer(buffer, table.schema) as sink:
+        sink.write_table(table, max_chunksize=8)
+
+    class Unseekable(io.RawIOBase):
+        def __init__(self, data):
+            self._inner = io.BytesIO(data)
+
+        def readable(self):
+            return True
+
+        def readinto(self, b):
+            return self._inner.readinto(b)
+
+    db_path = str(tmp_path / "test.db")
+    result = DataImporter(db_path, chunk_size=10).import_arrow(Unseekable(buffer.getvalue()), "t", file_format=fmt)
+
+    assert result["rows_imported"] == 25
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*), SUM(id) FROM t").fetchone() == (25, sum(range(25)))
+
+
+def test_upload_parquet(client):
+    buffer = io.BytesIO()
+    pq.write_table(sample_table(), buffer)
+    response = client.post("/api/upload?filename=data.parquet", data=buffer.getvalue(),
+                           content_type="application/octet-stream")
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["data"]["rows_imported"] == 25
+
+    rejected = client.post("/api/upload?filename=data.xyz", data=b"x", content_type="application/octet-stream")
+    assert rejected.status_code == 400
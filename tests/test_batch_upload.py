@@ -0,0 +1,54 @@
+# test_batch_upload.py - 多文件批量上传：并行暂存后合并，任一失败则整批不入库
+import io
+import sqlite3
+
+CSV_A = b"id,name\n1,a\n2,b\n"
+CSV_B = b"id,amount\n1,9.5\n2,3.0\n3,1.5\n"
+
+
+def table_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_batch_import_merges_tables(analyzer, tmp_path):
+    files = []
+    for name, content in (("a", CSV_A), ("b", CSV_B)):
+        path = tmp_path / f"{name}.csv"
+        path.write_bytes(content)
+        files.append({"path": str(path), "filename": path.name, "table_name": f"t_{name}"})
+
+    result = analyzer.import_csv_batch(files, analyzer.current_db_path, staging_root=str(tmp_path))
+
+    assert result["success"], result
+    assert result["total_tables"] == 2
+    assert result["rows_imported"] == 5
+    assert {"t_a", "t_b"} <= table_names(analyzer.current_db_path)
+    assert [t["table_name"] for t in analyzer.conversation_tables] == ["t_a", "t_b"]
+
+
+def test_batch_failure_imports_nothing(analyzer, tmp_path):
+    good = tmp_path / "good.csv"
+    good.write_bytes(CSV_A)
+    files = [
+        {"path": str(good), "filename": "good.csv", "table_name": "t_good"},
+        {"path": str(tmp_path / "missing.csv"), "filename": "missing.csv", "table_name": "t_missing"},
+    ]
+
+    result = analyzer.import_csv_batch(files, analyzer.current_db_path, staging_root=str(tmp_path))
+
+    assert not result["success"]
+    assert [f["filename"] for f in result["failures"]] == ["missing.csv"]
+    assert analyzer.conversation_tables == []
+
+
+def test_batch_route(client):
+    response = client.post("/api/upload/batch", data={
+        "files": [(io.BytesIO(CSV_A), "a.csv"), (io.BytesIO(CSV_B), "b.csv")],
+    }, content_type="multipart/form-data")
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["data"]["total_tables"] == 2
+
+    rejected = client.post("/api/upload/batch", data={"files": [(io.BytesIO(b"x"), "a.txt")]},
+                           content_type="multipart/form-data")
+    assert rejected.status_code == 400
@@ -0,0 +1,30 @@
+# test_bench_ingest.py - 导入基准与基线的比较
+import importlib.util
+from pathlib import Path
+
+_spec = importlib.util.spec_from_file_location(
+    "bench_ingest", Path(__file__).resolve().parent.parent / "benchmarks" / "bench_ingest.py")
+bench_ingest = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench_ingest)
+
+
+def test_compare_flags_only_regressions_past_threshold():
+    baseline = {"cases": {"a": {"rows_per_second": 1000}, "b": {"rows_per_second": 1000},
+                          "c": {"rows_per_second": 1000}}}
+    results = {"cases": {"a": {"rows_per_second": 900}, "b": {"rows_per_second": 800},
+                         "c": {"rows_per_second": 1200}, "new": {"rows_per_second": 10}}}
+
+    assert bench_ingest.compare(results, baseline, 0.15) == ["b"]
+    assert results["cases"]["b"]["change"] == -0.2
+    assert results["cases"]["c"]["baseline_rows_per_second"] == 1000
+    assert "change" not in results["cases"]["new"]
+
+
+def test_generated_data_is_deterministic_and_importable(tmp_path):
+    first, second = tmp_path / "a.csv", tmp_path / "b.csv"
+    bench_ingest.generate_csv(str(first), 300, "wide", "gbk")
+    bench_ingest.generate_csv(str(second), 300, "wide", "gbk")
+    assert first.read_bytes() == second.read_bytes()
+
+    result = bench_ingest.run_import(str(first), str(tmp_path / "bench.db"))
+    assert result["rows"] == 300
@@ -0,0 +1,147 @@
+# test_chunked_upload.py - 分片上传会话：乱序与重传、校验和、过期，complete 之后才导入
+import hashlib
+import io
+import sqlite3
+import time
+
+import pytest
+
+from chunked_upload import UploadSessionError, UploadSessionManager
+from config import Config
+from import_jobs import ImportQueueFull
+
+CSV = b"id,amount\n" + b"".join(f"{i},{i * 10}\n".encode() for i in range(200))
+PART_SIZE = 512
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def parts(data, part_size=PART_SIZE):
+    return [data[i:i + part_size] for i in range(0, len(data), part_size)]
+
+
+def create_session(client, **values):
+    payload = {"filename": "orders.csv", "total_size": len(CSV), "part_size": PART_SIZE}
+    payload.update(values)
+    response = client.post("/api/upload/sessions", json=payload)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()["data"]
+
+
+def put_part(client, session_id, number, data, checksum=None):
+    return client.put(f"/api/upload/sessions/{session_id}/parts/{number}", data=data,
+                      headers={"X-Part-Checksum": checksum or sha256(data)})
+
+
+def wait_job(client, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/upload/jobs/{job_id}").get_json()["data"]
+        if job["status"] in ("completed", "failed", "cancelled"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError("导入任务未结束")
+
+
+def test_parts_out_of_order_import_after_complete(client):
+    session = create_session(client)
+    assert session["job"] is None
+    chunks = parts(CSV)
+    for number in reversed(range(len(chunks))):
+        assert put_part(client, session["session_id"], number, chunks[number]).status_code == 200
+        # 上传期间不提交导入任务
+        assert client.get(f"/api/upload/sessions/{session['session_id']}").get_json()["data"]["job"] is None
+
+    response = client.post(f"/api/upload/sessions/{session['session_id']}/complete", json={"checksum": sha256(CSV)})
+    assert response.status_code == 202
+    job = wait_job(client, response.get_json()["data"]["job"]["job_id"])
+    assert job["status"] == "completed", job
+    with sqlite3.connect(client.analyzer.current_db_path) as conn:
+        assert conn.execute(f"SELECT COUNT(*), SUM(amount) FROM {job['table_name']}").fetchone() == (200, 199000)
+
+
+def test_resend_part_with_different_checksum(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+    chunks = parts(CSV)
+    corrupted = chunks[0].replace(b"1", b"9")
+    assert put_part(client, session_id, 0, corrupted).status_code == 200
+
+    # 校验和与内容不符的重传被拒绝，不覆盖已收到的分片
+    response = put_part(client, session_id, 0, chunks[0], checksum=sha256(corrupted[::-1]))
+    assert response.status_code == 400
+    data = client.get(f"/api/upload/sessions/{session_id}").get_json()["data"]
+    assert data["checksums"]["0"] == sha256(corrupted)
+
+    # 内容与校验和一致的重传覆盖之前的分片
+    assert put_part(client, session_id, 0, chunks[0]).status_code == 200
+    for number in range(1, len(chunks)):
+        put_part(client, session_id, number, chunks[number])
+    data = client.get(f"/api/upload/sessions/{session_id}").get_json()["data"]
+    assert data["checksums"]["0"] == sha256(chunks[0])
+    assert data["missing_parts"] == []
+
+    response = client.post(f"/api/upload/sessions/{session_id}/complete", json={"checksum": sha256(CSV)})
+    assert response.status_code == 202
+
+
+def test_wrong_file_checksum_aborts(client):
+    session = create_session(client)
+    session_id = session["session_id"]
+    for number, chunk in enumerate(parts(CSV)):
+        put_part(client, session_id, number, chunk)
+
+    response = client.post(f"/api/upload/sessions/{session_id}/complete", json={"checksum": sha256(b"other")})
+    assert response.status_code == 400
+    data = response.get_json()["data"]
+    assert data["status"] == "aborted"
+    assert data["job"] is None
+    assert put_part(client, session_id, 0, parts(CSV)[0]).status_code == 400
+    with sqlite3.connect(client.analyzer.current_db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone() == (0,)
+
+
+def test_complete_requires_all_parts(client):
+    session = create_session(client)
+    put_part(client, session["session_id"], 0, parts(CSV)[0])
+    response = client.post(f"/api/upload/sessions/{session['session_id']}/complete")
+    assert response.status_code == 400
+    assert response.get_json()["data"]["status"] == "uploading"
+
+
+def test_queue_full_reopens_session(client, monkeypatch):
+    import app as app_module
+
+    session = create_session(client)
+    session_id = session["session_id"]
+    for number, chunk in enumerate(parts(CSV)):
+        put_part(client, session_id, number, chunk)
+
+    def full(job, work, cleanup=None):
+        raise ImportQueueFull("导入任务过多")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module.import_job_manager, "submit", full)
+        response = client.post(f"/api/upload/sessions/{session_id}/complete")
+    assert response.status_code == 429
+    assert response.get_json()["data"]["status"] == "uploading"
+
+    response = client.post(f"/api/upload/sessions/{session_id}/complete")
+    assert response.status_code == 202
+    assert wait_job(client, response.get_json()["data"]["job"]["job_id"])["status"] == "completed"
+
+
+def test_session_expires(tmp_path, monkeypatch):
+    manager = UploadSessionManager()
+    session = manager.create("u", "orders.csv", len(CSV), str(tmp_path), part_size=PART_SIZE)
+    chunk = parts(CSV)[0]
+    session.write_part(0, io.BytesIO(chunk), sha256(chunk))
+
+    monkeypatch.setattr(Config, "UPLOAD_SESSION_TTL", 0)
+    time.sleep(0.01)
+    assert manager.get(session.session_id) is None
+    assert session.status == "aborted"
+    with pytest.raises(UploadSessionError):
+        session.write_part(1, io.BytesIO(parts(CSV)[1]), sha256(parts(CSV)[1]))
@@ -0,0 +1,90 @@
+# test_column_stats.py - 列统计：不同值个数的上界，模型写入后失效
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from column_stats import ColumnStatsCollector, load_column_stats
+from data_importer import DataImporter
+
+
+@pytest.mark.parametrize("rows", [20, 257, 5010])
+def test_distinct_count_never_exceeds_non_null_rows(rows):
+    collector = ColumnStatsCollector({"id": "INTEGER", "code": "TEXT"}, sketch_size=16)
+    values = pd.Series(np.arange(rows), dtype="float64")
+    values[::7] = np.nan
+    for start in range(0, rows, 1000):
+        chunk = pd.DataFrame({"id": values[start:start + 1000],
+                              "code": values[start:start + 1000].map(lambda v: None if pd.isna(v) else f"c{v:.0f}")})
+        collector.update(chunk)
+
+    for stat in collector.finish():
+        assert stat["distinct_exact"] is False
+        assert 0 < stat["distinct_count"] <= stat["row_count"] - stat["null_count"]
+
+
+def test_exact_distinct_count_below_sketch_size():
+    collector = ColumnStatsCollector({"region": "TEXT"})
+    collector.update(pd.DataFrame({"region": ["华东", "华北", "华东", None]}))
+    stat = collector.finish()[0]
+    assert stat["distinct_exact"] is True
+    assert stat["distinct_count"] == 2
+
+
+@pytest.fixture
+def imported(analyzer, tmp_path):
+    for name in ("orders", "regions"):
+        csv_path = tmp_path / f"{name}.csv"
+        pd.DataFrame({"id": range(100), "amount": range(100)}).to_csv(csv_path, index=False)
+        DataImporter(analyzer.current_db_path).import_csv(str(csv_path), name)
+    return analyzer
+
+
+def _stats(db_path, table_name):
+    with sqlite3.connect(db_path) as conn:
+        return load_column_stats(conn.cursor(), table_name)
+
+
+def test_model_write_drops_stats_of_written_tables(imported):
+    db_path = imported.current_db_path
+    assert _stats(db_path, "orders") and _stats(db_path, "regions")
+
+    result = imported.query_database("UPDATE orders SET amount = amount * 2 WHERE id < 10")
+    assert result["success"] and "影响行数: 10" in result["message"]
+    assert _stats(db_path, "orders") == {}
+    assert _stats(db_path, "regions")
+
+
+def test_model_drop_table_drops_its_stats(imported):
+    assert imported.query_database("DROP TABLE regions")["success"]
+    assert _stats(imported.current_db_path, "regions") == {}
+    assert _stats(imported.current_db_path, "orders")
+
+
+@pytest.mark.parametrize("sql", [
+    "WITH big AS (SELECT * FROM orders WHERE amount > 50) SELECT COUNT(*) FROM big",
+    "CREATE TABLE orders_copy AS SELECT * FROM orders",
+    "CREATE INDEX idx_orders_amount ON orders(amount)",
+    "ANALYZE",
+    "PRAGMA table_info(orders)",
+])
+def test_reads_and_schema_statements_keep_stats(imported, sql):
+    assert imported.query_database(sql)["success"]
+    assert _stats(imported.current_db_path, "orders")
+    assert _stats(imported.current_db_path, "regions")
+
+
+def test_cte_is_returned_as_rows(imported):
+    result = imported.query_database("WITH big AS (SELECT * FROM orders WHERE amount >= 90) SELECT COUNT(*) FROM big")
+    assert result["data"] == [(10,)]
+
+
+def test_import_stores_stats_and_schema_exposes_them(imported):
+    stats = _stats(imported.current_db_path, "orders")
+    assert stats["amount"]["min"] == 0 and stats["amount"]["max"] == 99
+    assert stats["id"]["distinct_count"] == 100
+
+    schema = {table["table_name"]: table for table in imported.get_table_schema()["tables"]}
+    amount = next(column for column in schema["orders"]["columns"] if column["name"] == "amount")
+    assert amount["stats"]["mean"] == 49.5
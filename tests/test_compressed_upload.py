@@ -0,0 +1,63 @@
+# test_compressed_upload.py - 压缩CSV上传：边解压边导入，解压总量受上限约束
+import bz2
+import gzip
+import io
+import lzma
+import sqlite3
+import zipfile
+
+import pytest
+
+from config import Config
+from data_importer import DataImporter
+
+CSV = b"id,city\n" + b"".join(f"{i},c{i % 3}\n".encode() for i in range(200))
+
+
+def count_rows(db_path, table="t"):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+@pytest.mark.parametrize("compression, compress", [("gzip", gzip.compress), ("bz2", bz2.compress),
+                                                   ("xz", lzma.compress)])
+def test_stream_decompression(tmp_path, compression, compress):
+    payload = compress(CSV)
+    db_path = str(tmp_path / "test.db")
+
+    result = DataImporter(db_path, chunk_size=50).import_csv(io.BytesIO(payload), "t", compression=compression)
+
+    assert result["rows_imported"] == 200
+    assert result["import_stats"]["decompressed_bytes"] == len(CSV)
+    assert count_rows(db_path) == 200
+
+
+def test_zip_skips_metadata_members(tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("__MACOSX/._data.csv", b"junk")
+        archive.writestr(".hidden.csv", b"junk")
+        archive.writestr("data.csv", CSV)
+    buffer.seek(0)
+    db_path = str(tmp_path / "test.db")
+
+    assert DataImporter(db_path).import_csv(buffer, "t", compression="zip")["rows_imported"] == 200
+
+
+def test_decompressed_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "MAX_DECOMPRESSED_BYTES", 256)
+    db_path = str(tmp_path / "test.db")
+    with pytest.raises(Exception, match="上限"):
+        DataImporter(db_path, chunk_size=10).import_csv(io.BytesIO(gzip.compress(CSV)), "t", compression="gzip")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchone() is None
+
+
+def test_upload_gzip_table_name(client):
+    response = client.post("/api/upload?filename=orders.csv.gz", data=gzip.compress(CSV),
+                           content_type="application/gzip")
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert data["rows_imported"] == 200
+    assert data["table_name"].startswith("orders_")
+    assert "csv" not in data["table_name"]
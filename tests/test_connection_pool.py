@@ -0,0 +1,65 @@
+# test_connection_pool.py - 只读连接池：连接复用、只读、文件重建后丢弃旧连接、空闲回收
+import os
+import sqlite3
+
+import pytest
+
+from connection_pool import ReadConnectionPool
+
+
+def create_db(db_path, rows):
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(i,) for i in range(rows)])
+
+
+def test_connections_are_reused_and_read_only(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    create_db(db_path, 3)
+    pool = ReadConnectionPool(db_path)
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (3,)
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM t")
+    with pool.connection() as conn:
+        assert conn is first
+    assert pool.stats() == {"idle": 1, "opened": 1, "reused": 1}
+    pool.invalidate()
+
+
+def test_recreated_file_drops_old_connections(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    create_db(db_path, 3)
+    pool = ReadConnectionPool(db_path)
+    with pool.connection() as conn:
+        old = conn
+        conn.execute("SELECT 1").fetchone()
+    os.remove(db_path)
+    create_db(db_path, 5)
+    with pool.connection() as conn:
+        assert conn is not old
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (5,)
+    pool.invalidate()
+
+
+def test_close_idle(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    create_db(db_path, 1)
+    pool = ReadConnectionPool(db_path)
+    with pool.connection():
+        pass
+    assert pool.close_idle(0) == 1
+    assert pool.stats()["idle"] == 0
+
+
+def test_query_database_reads_through_pool(analyzer):
+    assert analyzer.query_database("CREATE TABLE t (x INTEGER)")["success"]
+    assert analyzer.query_database("INSERT INTO t VALUES (1), (2)")["success"]
+    from connection_pool import connection_pools
+
+    pool = connection_pools.get(analyzer.current_db_path)
+    reused = pool.stats()["reused"]
+    result = analyzer.query_database("WITH s AS (SELECT SUM(x) AS total FROM t) SELECT total FROM s")
+    assert result["data"] == [(3,)]
+    assert pool.stats()["reused"] > reused
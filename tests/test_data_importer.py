@@ -0,0 +1,53 @@
+# test_data_importer.py - 分块导入：行数、列名清理、替换已有表、失败回滚
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from data_importer import DataImporter
+
+
+@pytest.fixture
+def orders_csv(tmp_path):
+    path = tmp_path / "orders.csv"
+    pd.DataFrame({
+        "order id": range(50),
+        "amount($)": [i * 1.5 for i in range(50)],
+        "Order-ID": [f"o{i}" for i in range(50)],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+def test_import_in_chunks(tmp_path, orders_csv):
+    db_path = str(tmp_path / "test.db")
+    result = DataImporter(db_path, chunk_size=7).import_csv(orders_csv, "orders")
+
+    assert result["rows_imported"] == 50
+    assert result["import_stats"]["chunks"] == 8
+    # 清理后重名的列追加序号
+    assert result["columns"] == ["order_id", "amount", "Order_ID_2"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*), SUM(order_id) FROM orders").fetchone() == (50, sum(range(50)))
+
+
+def test_import_replaces_existing_table(tmp_path, orders_csv):
+    db_path = str(tmp_path / "test.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE orders (stale TEXT)")
+    DataImporter(db_path).import_csv(orders_csv, "orders")
+    with sqlite3.connect(db_path) as conn:
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(orders)")]
+    assert columns == ["order_id", "amount", "Order_ID_2"]
+
+
+def test_invalid_chunk_size():
+    with pytest.raises(ValueError):
+        DataImporter("unused.db", chunk_size=-5)
+
+
+def test_analyzer_import_registers_table(analyzer, orders_csv):
+    result = analyzer.import_csv_to_sqlite(orders_csv, "orders", analyzer.current_db_path, chunk_size=20)
+    assert result["success"]
+    assert result["rows_imported"] == 50
+    assert result["import_stats"]["chunks"] == 3
+    assert [table["table_name"] for table in analyzer.conversation_tables] == ["orders"]
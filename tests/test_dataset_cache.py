@@ -0,0 +1,94 @@
+# test_dataset_cache.py - 按内容指纹复用已导入的数据集；通过SQL写入后不再复用旧表
+import hashlib
+import sqlite3
+
+import pytest
+
+from database_analyzer import DatabaseAnalyzer
+
+CSV = b"id,amount\n1,10\n2,20\n3,30\n"
+FINGERPRINT = hashlib.sha256(CSV).hexdigest()
+
+
+def upload(client, **params):
+    query = "&".join(f"{key}={value}" for key, value in {"filename": "sales.csv", **params}.items())
+    response = client.post(f"/api/upload?{query}", data=CSV, content_type="text/csv")
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()["data"]
+
+
+def amounts(client, table_name):
+    with sqlite3.connect(client.analyzer.current_db_path) as conn:
+        return [row[0] for row in conn.execute(f"SELECT amount FROM `{table_name}` ORDER BY id")]
+
+
+def test_fingerprint_computed_while_importing(client):
+    first = upload(client)
+    assert first["cache_hit"] is False
+    assert first["cache"] == {"fingerprint": FINGERPRINT, "mode": "stored"}
+
+    # 不带指纹的同步上传不会预先缓存请求体，照常流式导入
+    assert upload(client)["cache_hit"] is False
+
+    reused = upload(client, fingerprint=FINGERPRINT)
+    assert reused["cache_hit"] is True
+    assert reused["cache"]["mode"] == "reused"
+    assert reused["table_name"] == first["table_name"]
+
+
+def test_update_through_query_database_stops_reuse(client):
+    table_name = upload(client)["table_name"]
+    assert client.analyzer.query_database(f"UPDATE `{table_name}` SET amount = 0")["success"]
+
+    restored = upload(client, fingerprint=FINGERPRINT)
+    assert restored["cache"]["mode"] == "cloned"
+    assert restored["table_name"] != table_name
+    assert amounts(client, restored["table_name"]) == [10, 20, 30]
+
+
+def test_recreated_table_is_not_reused(client):
+    table_name = upload(client)["table_name"]
+    client.analyzer.query_database(f"DROP TABLE `{table_name}`")
+    client.analyzer.query_database(f"CREATE TABLE `{table_name}` (id INTEGER, amount INTEGER)")
+
+    restored = upload(client, fingerprint=FINGERPRINT)
+    assert restored["cache"]["mode"] == "cloned"
+    assert amounts(client, table_name) == []
+    assert amounts(client, restored["table_name"]) == [10, 20, 30]
+
+
+def test_cte_keeps_fingerprint(client):
+    table_name = upload(client)["table_name"]
+    result = client.analyzer.query_database(
+        f"WITH totals AS (SELECT SUM(amount) AS total FROM `{table_name}`) SELECT total FROM totals")
+    assert result["data"] == [(60,)]
+    assert upload(client, fingerprint=FINGERPRINT)["cache"]["mode"] == "reused"
+
+
+def test_async_upload_reuses_spooled_fingerprint(client):
+    upload(client)
+    response = client.post("/api/upload?filename=sales.csv&async=1", data=CSV, content_type="text/csv")
+    assert response.status_code == 200
+    assert response.get_json()["data"]["cache"]["mode"] == "reused"
+
+
+@pytest.mark.parametrize("sql, read_only, written", [
+    ("SELECT * FROM t", True, set()),
+    ("WITH x AS (SELECT a FROM t) SELECT * FROM x", True, set()),
+    ("WITH RECURSIVE c(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM c WHERE n < 3) SELECT n FROM c", True, set()),
+    ("EXPLAIN QUERY PLAN SELECT * FROM t", True, set()),
+    ("UPDATE t SET a = 1", False, {"t"}),
+    ("WITH x AS (SELECT 1) INSERT INTO t SELECT * FROM x", False, {"t"}),
+    ("CREATE TABLE u AS SELECT * FROM t", False, {"u"}),
+    ("DROP TABLE t", False, {"t"}),
+    ("ALTER TABLE t RENAME TO v", False, {"t"}),
+    ("CREATE INDEX idx_t_a ON t(a)", False, set()),
+    ("PRAGMA table_info(t)", False, set()),
+    ("ANALYZE", False, set()),
+])
+def test_inspect_statement(sql, read_only, written):
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (a INTEGER)")
+    assert DatabaseAnalyzer._inspect_statement(conn, sql) == (read_only, written)
+    # 只编译不执行
+    assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall() == [("t",)]
@@ -0,0 +1,75 @@
+# test_date_normalizer.py - 日期列识别：数值列只有在开启 excel_dates 且列名确实表示日期时才转换
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from data_importer import DataImporter
+from date_normalizer import detect_temporal_type
+
+
+@pytest.mark.parametrize("name", ["response_time_ms", "lifetime_value", "days", "daytime", "update_count", "时间"])
+def test_numeric_columns_mentioning_time_or_day_stay_numeric(name):
+    series = pd.Series([20000, 45000, 73000], name=name)
+    assert detect_temporal_type(series) is None
+    assert detect_temporal_type(series, excel_dates=True) is None
+    assert DataImporter._infer_column_type(series, excel_dates=True) == "INTEGER"
+
+
+@pytest.mark.parametrize("name", ["order_date", "dt", "Ship_Date", "下单日期"])
+def test_excel_serial_dates_only_when_enabled(name):
+    series = pd.Series([45000, 45100, None], name=name)
+    assert DataImporter._infer_column_type(series) == "INTEGER"
+    assert DataImporter._infer_column_type(series, excel_dates=True) == "DATE"
+
+
+def test_excel_serial_requires_integer_values():
+    series = pd.Series([45000.5, 45100.25], name="order_date")
+    assert detect_temporal_type(series, excel_dates=True) is None
+
+
+def test_text_dates_detected_without_option():
+    series = pd.Series(["2024-01-02", "2024/03/04", "2024-05-06"], name="note")
+    assert detect_temporal_type(series) == "DATE"
+
+
+def test_import_keeps_numbers_unless_excel_dates(tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    pd.DataFrame({
+        "order_date": [45000, 45001],
+        "response_time_ms": [20000, 73000],
+    }).to_csv(csv_path, index=False)
+
+    plain_db = tmp_path / "plain.db"
+    assert DataImporter(str(plain_db)).import_csv(str(csv_path), "orders")["rows_imported"] == 2
+    with sqlite3.connect(plain_db) as conn:
+        assert conn.execute("SELECT order_date, response_time_ms FROM orders ORDER BY 1").fetchall() == \
+            [(45000, 20000), (45001, 73000)]
+
+    dates_db = tmp_path / "dates.db"
+    assert DataImporter(str(dates_db), excel_dates=True).import_csv(str(csv_path), "orders")["rows_imported"] == 2
+    with sqlite3.connect(dates_db) as conn:
+        assert conn.execute("SELECT order_date, response_time_ms FROM orders ORDER BY 1").fetchall() == \
+            [("2023-03-15", 20000), ("2023-03-16", 73000)]
+
+
+def test_mixed_formats_stored_as_iso_text(tmp_path):
+    lines = ["id,day,at", "1,2024/1/5,2024-01-05 8:03:09", "2,2024年2月6日,2024.02.06 10:00",
+             "3,unknown,2024-03-07 23:59:59"]
+    lines += [f"{i},2024-04-{i % 28 + 1:02d},2024-04-01 00:00:00" for i in range(4, 41)]
+    csv_path = tmp_path / "events.csv"
+    csv_path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    db_path = tmp_path / "events.db"
+
+    DataImporter(str(db_path), date_parts=True).import_csv(str(csv_path), "events")
+
+    with sqlite3.connect(db_path) as conn:
+        types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(events)")}
+        assert (types["day"], types["at"], types["day_year"]) == ("DATE", "DATETIME", "INTEGER")
+        # 无法解析的值保留原文本，派生列为空
+        assert conn.execute("SELECT day, at, day_year, day_month, day_day FROM events WHERE id <= 3 ORDER BY id"
+                            ).fetchall() == [
+            ("2024-01-05", "2024-01-05 08:03:09", 2024, 1, 5),
+            ("2024-02-06", "2024-02-06 10:00:00", 2024, 2, 6),
+            ("unknown", "2024-03-07 23:59:59", None, None, None),
+        ]
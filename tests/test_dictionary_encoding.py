@@ -0,0 +1,68 @@
+# test_dictionary_encoding.py - 低基数文本列字典编码：视图还原原值，追加导入沿用已有字典
+import io
+import sqlite3
+
+import pytest
+
+from config import Config
+from data_importer import DataImporter
+from dictionary_encoding import base_table_name, encoded_columns
+
+REGIONS = ["华东", "华北", "华南", "O'Hare"]
+CSV = ("id,region,note\n" + "".join(f"{i},{REGIONS[i % 4]},n{i}\n" for i in range(200))).encode("utf-8")
+
+
+def objects(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return dict(conn.execute("SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')"))
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    DataImporter(path, dictionary_encode=True).import_csv(io.BytesIO(CSV), "t")
+    return path
+
+
+def test_view_restores_original_values(db_path):
+    assert objects(db_path)["t"] == "view"
+    with sqlite3.connect(db_path) as conn:
+        assert encoded_columns(conn.cursor(), "t") == {"region": "_dict_t__region"}
+        assert conn.execute(f"SELECT typeof(region) FROM {base_table_name('t')} LIMIT 1").fetchone() == ("integer",)
+        assert conn.execute("SELECT region, COUNT(*) FROM t GROUP BY region ORDER BY region").fetchall() == sorted(
+            (region, 50) for region in REGIONS)
+        assert conn.execute("SELECT note FROM t WHERE id = 7").fetchone() == ("n7",)
+
+
+def test_large_dictionaries_use_subquery(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "DICT_ENCODE_CASE_MAX_VALUES", 2)
+    path = str(tmp_path / "test.db")
+    DataImporter(path, dictionary_encode=True).import_csv(io.BytesIO(CSV), "t")
+    with sqlite3.connect(path) as conn:
+        view_sql = conn.execute("SELECT sql FROM sqlite_master WHERE name = 't'").fetchone()[0]
+        assert "_dict_t__region" in view_sql and "CASE" not in view_sql
+        assert conn.execute("SELECT region FROM t WHERE id = 3").fetchone() == ("O'Hare",)
+
+
+def test_append_extends_dictionary(db_path):
+    DataImporter(db_path, mode="append").import_csv(io.BytesIO("id,region,note\n500,西北,x\n".encode()), "t")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT region FROM t WHERE id = 500").fetchone() == ("西北",)
+        assert conn.execute("SELECT COUNT(*) FROM _dict_t__region").fetchone() == (5,)
+
+
+def test_delete_and_query_writes_cover_encoded_tables(client):
+    response = client.post("/api/upload?filename=t.csv&dictionary_encode=true", data=CSV, content_type="text/csv")
+    assert response.status_code == 200, response.get_json()
+    table_name = response.get_json()["data"]["table_name"]
+    analyzer = client.analyzer
+
+    schema = analyzer.get_table_schema()["tables"][0]
+    assert schema["dictionary_encoding"]["base_table"] == base_table_name(table_name)
+
+    with sqlite3.connect(analyzer.current_db_path) as conn:
+        _, written = analyzer._inspect_statement(conn, f"DELETE FROM `{base_table_name(table_name)}` WHERE id < 5")
+    assert written == {table_name}
+
+    assert analyzer.delete_table(table_name)["success"]
+    assert not [name for name in objects(analyzer.current_db_path) if table_name in name]
@@ -0,0 +1,45 @@
+# test_encoding.py - 由字节样本判断编码，样本之后的非法字节回退解码
+import codecs
+import sqlite3
+
+from config import Config
+from data_importer import DataImporter, detect_encoding
+
+
+def test_detect_encoding():
+    text = "城市,销售额\n北京,100\n上海,200\n"
+    assert detect_encoding(text.encode("utf-8")) == "utf-8"
+    assert detect_encoding(text.encode("gbk")) == "gb18030"
+    assert detect_encoding(codecs.BOM_UTF8 + text.encode("utf-8")) == "utf-8-sig"
+    assert detect_encoding(b"\xff\xfe\x00" + b"a\x81") == "utf-16"
+
+
+def test_truncated_multibyte_at_sample_end_is_utf8():
+    sample = "城市".encode("utf-8")[:-1]
+    assert detect_encoding(sample) == "utf-8"
+
+
+def test_gbk_file_imported(tmp_path):
+    path = tmp_path / "gbk.csv"
+    path.write_bytes("城市,销售额\n北京,100\n上海,200\n".encode("gbk"))
+    db_path = str(tmp_path / "test.db")
+    result = DataImporter(db_path).import_csv(str(path), "sales")
+    assert result["encoding"] == "gb18030"
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT 城市 FROM sales ORDER BY 销售额").fetchall() == [("北京",), ("上海",)]
+
+
+def test_gbk_rows_after_sample_fall_back(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "ENCODING_SAMPLE_BYTES", 64)
+    path = tmp_path / "mixed.csv"
+    head = "name,value\n" + "".join(f"row{i},{i}\n" for i in range(20))
+    path.write_bytes(head.encode("utf-8") + "广州,99\n".encode("gbk") + b"bad\xff,1\n")
+    db_path = str(tmp_path / "test.db")
+
+    result = DataImporter(db_path).import_csv(str(path), "mixed")
+    assert result["encoding"] == "utf-8"
+    assert result["rows_imported"] == 22
+    assert result["import_stats"]["decode_fallbacks"] >= 1
+    assert result["import_stats"]["decode_replacements"] >= 1
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT value FROM mixed WHERE name = '广州'").fetchone() == (99,)
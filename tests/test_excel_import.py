@@ -0,0 +1,74 @@
+# test_excel_import.py - Excel 流式导入：每个工作表一张表，失败时回滚已建的表
+import datetime
+import io
+import sqlite3
+
+import pytest
+
+openpyxl = pytest.importorskip("openpyxl")
+
+from data_importer import DataImporter
+
+
+def workbook_bytes(sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for name, rows in sheets.items():
+        sheet = workbook.create_sheet(name)
+        for row in rows:
+            sheet.append(row)
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def user_tables(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE '\\_%' ESCAPE '\\'")}
+
+
+def test_one_table_per_sheet(tmp_path):
+    data = workbook_bytes({
+        "orders": [["id", "day"]] + [[i, datetime.date(2024, 1, 1 + i)] for i in range(12)],
+        "empty": [],
+        "users": [["name"], ["a"], ["b"]],
+    })
+    db_path = str(tmp_path / "test.db")
+
+    result = DataImporter(db_path, chunk_size=5).import_excel(io.BytesIO(data), "book", file_format=".xlsx")
+
+    assert [(s["table_name"], s["rows_imported"]) for s in result["sheets"]] == [
+        ("book_orders", 12), ("book_users", 2)]
+    assert result["rows_imported"] == 14
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT day FROM book_orders WHERE id = 3").fetchone()[0].startswith("2024-01-04")
+
+
+def test_single_sheet_keeps_table_name(tmp_path):
+    data = workbook_bytes({"Sheet1": [["x"], [1], [2]]})
+    result = DataImporter(str(tmp_path / "test.db")).import_excel(io.BytesIO(data), "book", file_format=".xlsx")
+    assert [s["table_name"] for s in result["sheets"]] == ["book"]
+
+
+def test_failed_sheet_drops_earlier_tables(tmp_path):
+    data = workbook_bytes({"good": [["x"], [1]], "bad": [["y"], [2]]})
+    db_path = str(tmp_path / "test.db")
+    importer = DataImporter(db_path)
+
+    def fail_on_second(rows, bytes_read):
+        if "book_good" in user_tables(db_path):
+            raise RuntimeError("boom")
+
+    importer.progress_callback = fail_on_second
+    with pytest.raises(RuntimeError):
+        importer.import_excel(io.BytesIO(data), "book", file_format=".xlsx")
+    assert user_tables(db_path) == set()
+
+
+def test_upload_workbook_registers_each_sheet(client):
+    data = workbook_bytes({"a": [["x"], [1]], "b": [["y"], [2], [3]]})
+    response = client.post("/api/upload?filename=book.xlsx", data=data, content_type="application/octet-stream")
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["data"]["rows_imported"] == 3
+    assert len(client.analyzer.conversation_tables) == 2
@@ -0,0 +1,72 @@
+# test_file_preview.py - 上传预览只解析文件开头，识别结果可交给导入复用
+import io
+import sqlite3
+
+from config import Config
+from data_importer import DataImporter, preview_csv
+
+CSV = "城市;销售额;order_date\n" + "".join(f"city{i % 5};{i * 1.5};{45000 + i}\n" for i in range(500))
+
+
+def column_types(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return {row[1]: row[2] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_preview_reads_only_prefix(monkeypatch):
+    monkeypatch.setattr(Config, "PREVIEW_MAX_BYTES", Config.ENCODING_SAMPLE_BYTES)
+    data = ("城市;销售额;order_date\n" + "".join(f"city{i % 5};{i * 1.5};{45000 + i}\n" for i in range(30000))).encode()
+    assert len(data) > Config.ENCODING_SAMPLE_BYTES
+    preview = preview_csv(io.BytesIO(data))
+    assert not preview["complete"]
+    assert preview["csv_format"]["delimiter"] == ";"
+    assert preview["column_types"]["销售额"] == "REAL"
+    assert preview["bytes_parsed"] <= Config.ENCODING_SAMPLE_BYTES
+
+
+def test_import_reuses_preview_format(tmp_path):
+    data = CSV.encode("gbk")
+    csv_format = preview_csv(io.BytesIO(data))["csv_format"]
+    assert csv_format["encoding"].lower() in ("gbk", "gb2312", "gb18030")
+    # 沿用预览给出的列类型，不再推断
+    csv_format = dict(csv_format, column_types=["TEXT", "TEXT", "INTEGER"])
+    db_path = str(tmp_path / "test.db")
+    DataImporter(db_path).import_csv(io.BytesIO(data), "t", csv_format=csv_format)
+    assert column_types(db_path, "t")["销售额"] == "TEXT"
+
+
+def test_import_ignores_preview_of_other_file(tmp_path):
+    csv_format = preview_csv(io.BytesIO(b"a,b\n1,2\n"))["csv_format"]
+    db_path = str(tmp_path / "test.db")
+    result = DataImporter(db_path).import_csv(io.BytesIO(CSV.encode("utf-8")), "t", csv_format=csv_format)
+    assert result["rows_imported"] == 500
+    assert column_types(db_path, "t")["销售额"] == "REAL"
+
+
+def test_excel_dates_reinfers_types(tmp_path):
+    data = CSV.encode("utf-8")
+    csv_format = preview_csv(io.BytesIO(data))["csv_format"]
+    db_path = str(tmp_path / "test.db")
+    DataImporter(db_path, excel_dates=True).import_csv(io.BytesIO(data), "t", csv_format=csv_format)
+    assert column_types(db_path, "t")["order_date"] == "DATE"
+
+
+def test_preview_then_upload(client):
+    data = CSV.encode("utf-8")
+    response = client.post("/api/preview-file?filename=sales.csv", data=data, content_type="text/csv")
+    assert response.status_code == 200, response.get_json()
+    preview = response.get_json()["data"]
+    assert preview["delimiter"] == ";"
+    assert preview["estimated_total_rows"] == 500
+    assert preview["preview_data"]["columns"] == ["城市", "销售额", "order_date"]
+    assert "quality_report" in preview
+
+    response = client.post(f"/api/upload?filename=sales.csv&preview_id={preview['preview_id']}",
+                           data=data, content_type="text/csv")
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["data"]["rows_imported"] == 500
+
+
+def test_preview_rejects_excel(client):
+    response = client.post("/api/preview-file?filename=book.xlsx", data=b"PK", content_type="application/octet-stream")
+    assert response.status_code == 400
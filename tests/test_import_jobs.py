@@ -0,0 +1,72 @@
+# test_import_jobs.py - 异步导入任务：队列上限、取消回滚、进度轮询
+import io
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from data_importer import DataImporter, ImportCancelled
+from import_jobs import ImportJob, ImportJobManager, ImportQueueFull
+
+CSV = b"a,b\n" + b"".join(f"{i},{i * 2}\n".encode() for i in range(100))
+
+
+def wait_finished(job, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not job.is_finished and time.monotonic() < deadline:
+        job.wait_for_change(job._version, 0.1)
+    assert job.is_finished
+    return job
+
+
+def test_queue_limit():
+    manager = ImportJobManager(max_workers=1, max_pending=0)
+    release = threading.Event()
+    first = manager.submit(ImportJob("u", "a.csv", "a"), lambda job: release.wait(5) and {"success": True})
+    with pytest.raises(ImportQueueFull):
+        manager.submit(ImportJob("u", "b.csv", "b"), lambda job: {"success": True})
+    release.set()
+    assert wait_finished(first).status == "completed"
+
+
+def test_cancel_rolls_back(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    manager = ImportJobManager(max_workers=1, max_pending=1)
+
+    def work(job):
+        def progress(rows, bytes_read):
+            manager.cancel(job.job_id)
+            job.update_progress(rows, bytes_read)
+        return DataImporter(db_path, chunk_size=10, progress_callback=progress).import_csv(io.BytesIO(CSV), "t")
+
+    job = wait_finished(manager.submit(ImportJob("u", "t.csv", "t"), work))
+    assert job.status == "cancelled"
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = 't'").fetchone() is None
+
+
+def test_progress_callback_can_cancel(tmp_path):
+    def progress(rows, bytes_read):
+        raise ImportCancelled("stop")
+
+    with pytest.raises(ImportCancelled):
+        DataImporter(str(tmp_path / "test.db"), chunk_size=10, progress_callback=progress).import_csv(
+            io.BytesIO(CSV), "t")
+
+
+def test_async_upload_job(client):
+    response = client.post("/api/upload?filename=t.csv&async=1&chunk_size=10", data=CSV, content_type="text/csv")
+    assert response.status_code == 202
+    job_id = response.get_json()["data"]["job_id"]
+
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(f"/api/upload/jobs/{job_id}").get_json()["data"]
+        if job["status"] not in ("queued", "running") or time.monotonic() > deadline:
+            break
+        time.sleep(0.05)
+    assert job["status"] == "completed"
+    assert job["rows_processed"] == 100
+    assert job["progress_percent"] == 100.0
+    assert client.get("/api/upload/jobs/job_missing").status_code == 404
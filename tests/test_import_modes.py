@@ -0,0 +1,66 @@
+# test_import_modes.py - 追加与按键列更新导入：类型校验、单事务回滚、行数增量统计
+import hashlib
+import io
+import sqlite3
+
+import pytest
+
+from data_importer import DataImporter
+
+BASE = b"id,name,amount\n1,a,10\n2,b,20\n"
+
+
+def rows(db_path, sql="SELECT id, name, amount FROM t ORDER BY id"):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(sql).fetchall()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "test.db")
+    DataImporter(path).import_csv(io.BytesIO(BASE), "t")
+    return path
+
+
+def test_append_matches_columns_case_insensitively(db_path):
+    result = DataImporter(db_path, mode="append").import_csv(io.BytesIO(b"ID,Amount\n3,30\n"), "t")
+    assert result["rows_inserted"] == 1
+    assert rows(db_path) == [(1, "a", 10), (2, "b", 20), (3, None, 30)]
+
+
+def test_append_rejects_lossy_types_and_leaves_table_untouched(db_path):
+    with pytest.raises(ValueError):
+        DataImporter(db_path, mode="append").import_csv(io.BytesIO(b"id,name,amount\nx,c,30\n"), "t")
+    with pytest.raises(ValueError):
+        DataImporter(db_path, mode="append").import_csv(io.BytesIO(b"id,unknown\n3,1\n"), "t")
+    assert rows(db_path) == [(1, "a", 10), (2, "b", 20)]
+
+
+def test_upsert_updates_changed_rows_only(db_path):
+    result = DataImporter(db_path, mode="upsert", key_columns=["id"]).import_csv(
+        io.BytesIO(b"id,name,amount\n1,a,10\n2,b,25\n3,c,30\n"), "t")
+    assert (result["rows_inserted"], result["rows_updated"]) == (1, 1)
+    assert rows(db_path) == [(1, "a", 10), (2, "b", 25), (3, "c", 30)]
+
+
+def test_upsert_requires_key_columns(db_path):
+    with pytest.raises(ValueError):
+        DataImporter(db_path, mode="upsert")
+
+
+def test_append_route_updates_row_count_and_drops_fingerprint(client):
+    first = client.post("/api/upload?filename=t.csv", data=BASE, content_type="text/csv").get_json()["data"]
+    table_name = first["table_name"]
+
+    response = client.post(f"/api/upload?filename=more.csv&mode=append&table_name={table_name}",
+                           data=b"id,name,amount\n3,c,30\n", content_type="text/csv")
+    assert response.status_code == 200, response.get_json()
+    assert client.analyzer.conversation_tables[0]["row_count"] == 3
+
+    # 追加后表内容与原文件不同，重复上传原文件时从缓存复制而不是复用
+    again = client.post(f"/api/upload?filename=t.csv&fingerprint={hashlib.sha256(BASE).hexdigest()}",
+                        data=BASE, content_type="text/csv").get_json()["data"]
+    assert again["cache"]["mode"] == "cloned"
+
+    missing = client.post("/api/upload?filename=t.csv&mode=upsert&table_name=t", data=BASE, content_type="text/csv")
+    assert missing.status_code == 400
@@ -0,0 +1,80 @@
+# test_index_builder.py - 导入后按列画像自动建立索引
+import sqlite3
+
+import pandas as pd
+
+from data_importer import DataImporter
+from column_stats import delete_column_stats
+from index_builder import AutoIndexBuilder, list_table_indexes
+
+
+def import_orders(tmp_path, rows=5010):
+    csv_path = tmp_path / "orders.csv"
+    pd.DataFrame({
+        "order_id": range(rows),
+        "region": ["华东", "华北", "华南"] * (rows // 3) + ["华东"] * (rows % 3),
+        "amount": [i * 1.5 for i in range(rows)],
+        "note": ["x" * 100] * rows,
+    }).to_csv(csv_path, index=False)
+    db_path = str(tmp_path / "orders.db")
+    DataImporter(db_path).import_csv(str(csv_path), "orders")
+    return db_path
+
+
+def test_indexes_key_and_category_columns(tmp_path):
+    db_path = import_orders(tmp_path)
+
+    built = AutoIndexBuilder(db_path).build("orders")
+
+    assert [(index["column"], index["reason"]) for index in built["created"]] == [
+        ("order_id", "key"), ("region", "category")]
+    with sqlite3.connect(db_path) as conn:
+        assert {tuple(index["columns"]) for index in list_table_indexes(conn.cursor(), "orders")} == {
+            ("order_id",), ("region",)}
+        assert conn.execute("SELECT COUNT(*) FROM sqlite_stat1 WHERE tbl = 'orders'").fetchone()[0] > 0
+
+
+def test_small_tables_are_skipped(tmp_path):
+    assert AutoIndexBuilder(import_orders(tmp_path, rows=100)).build("orders")["created"] == []
+
+
+def test_index_count_limit(tmp_path):
+    db_path = import_orders(tmp_path)
+    assert [index["column"] for index in AutoIndexBuilder(db_path, max_indexes=1).build("orders")["created"]] == [
+        "order_id"]
+
+
+def test_import_reports_indexes(analyzer, tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    pd.DataFrame({"customer_id": range(2000), "v": range(2000)}).to_csv(csv_path, index=False)
+
+    result = analyzer.import_csv_to_sqlite(str(csv_path), "orders", analyzer.current_db_path)
+
+    assert result["success"]
+    assert "index_seconds" in result["import_stats"]
+    schema = analyzer.get_table_schema()
+    assert [index["columns"] for index in schema["tables"][0]["indexes"]] == [["customer_id"]]
+
+
+def test_profile_uses_column_stats_catalog(tmp_path):
+    db_path = import_orders(tmp_path)
+
+    with sqlite3.connect(db_path) as conn:
+        profiles = {p["column"]: p for p in AutoIndexBuilder(db_path, sample_rows=10).profile_table(conn.cursor(), "orders")}
+
+    # 只采样了 10 行，非空数和不同值个数来自整表的列统计
+    assert profiles["order_id"]["sampled_rows"] == 10
+    assert profiles["order_id"]["non_null"] == 5010
+    assert 0 < profiles["order_id"]["distinct"] <= 5010
+    assert profiles["order_id"]["distinct_ratio"] <= 1.0
+    assert profiles["region"]["distinct"] == 3
+
+
+def test_profile_falls_back_to_sample_without_stats(tmp_path):
+    db_path = import_orders(tmp_path)
+    with sqlite3.connect(db_path) as conn:
+        delete_column_stats(conn.cursor(), "orders")
+        profiles = {p["column"]: p for p in AutoIndexBuilder(db_path, sample_rows=10).profile_table(conn.cursor(), "orders")}
+
+    assert profiles["order_id"]["non_null"] == 10
+    assert profiles["order_id"]["distinct"] == 10
@@ -0,0 +1,54 @@
+# test_query_budget.py - 查询执行时间预算：超时中断、取消、截断后计数超时只报告下限
+import sqlite3
+import threading
+
+import pytest
+
+from config import Config
+
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+
+@pytest.fixture
+def numbers(analyzer):
+    with sqlite3.connect(analyzer.current_db_path) as conn:
+        conn.execute("CREATE TABLE numbers (n INTEGER)")
+        conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(1000)])
+    return analyzer
+
+
+def test_read_query_times_out(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_TIMEOUT_SECONDS", 0.2)
+    result = numbers.query_database(ENDLESS)
+    assert result["success"] is False
+    assert result["timed_out"] is True
+    assert "suggestion" in result
+    # 中断后连接池中的连接仍可复用
+    assert numbers.query_database("SELECT COUNT(*) FROM numbers")["data"] == [(1000,)]
+
+
+def test_cancel_event_interrupts_query(numbers):
+    cancel_event = threading.Event()
+    cancel_event.set()
+    result = numbers.query_database(ENDLESS, cancel_event)
+    assert result["cancelled"] is True
+    assert "timed_out" not in result
+
+
+def test_write_query_times_out_and_rolls_back(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_TIMEOUT_SECONDS", 0.2)
+    result = numbers.query_database(
+        "INSERT INTO numbers WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c")
+    assert result["timed_out"] is True
+    assert numbers.query_database("SELECT COUNT(*) FROM numbers")["data"] == [(1000,)]
+
+
+def test_timeout_while_counting_keeps_rows(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_ROWS", 10)
+    monkeypatch.setattr(Config, "QUERY_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(Config, "QUERY_COUNT_SCAN_ROWS", 10 ** 12)
+    result = numbers.query_database("WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT x FROM c")
+    assert result["success"] is True
+    assert result["returned_rows"] == 10
+    assert result["total_rows_exact"] is False
+    assert result["total_rows_estimate"] >= 10
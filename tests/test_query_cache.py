@@ -0,0 +1,72 @@
+# test_query_cache.py - 查询结果缓存：重复查询命中，追加导入和模型写入后失效
+import pandas as pd
+import pytest
+
+from data_importer import DataImporter
+from query_cache import normalize_sql
+
+TOTAL_SQL = "SELECT COUNT(*), SUM(amount) FROM orders"
+
+
+@pytest.fixture
+def orders(analyzer, tmp_path):
+    csv_path = tmp_path / "orders.csv"
+    pd.DataFrame({"id": range(100), "amount": [1] * 100}).to_csv(csv_path, index=False)
+    DataImporter(analyzer.current_db_path).import_csv(str(csv_path), "orders")
+    return analyzer
+
+
+def test_repeated_query_hits_cache(orders):
+    first = orders.query_database(TOTAL_SQL)
+    second = orders.query_database("select count(*),  sum(amount) from orders;")
+    assert first["cache"]["hit"] is False
+    assert second["cache"]["hit"] is True
+    assert second["data"] == first["data"] == [(100, 100)]
+
+
+def test_append_import_invalidates(orders, tmp_path):
+    assert orders.query_database(TOTAL_SQL)["data"] == [(100, 100)]
+
+    csv_path = tmp_path / "more.csv"
+    pd.DataFrame({"id": range(100, 110), "amount": [5] * 10}).to_csv(csv_path, index=False)
+    DataImporter(orders.current_db_path, mode="append").import_csv(str(csv_path), "orders")
+
+    result = orders.query_database(TOTAL_SQL)
+    assert result["cache"]["hit"] is False
+    assert result["data"] == [(110, 150)]
+
+
+def test_model_write_invalidates(orders):
+    assert orders.query_database(TOTAL_SQL)["data"] == [(100, 100)]
+    assert orders.query_database("DELETE FROM orders WHERE id >= 90")["success"]
+
+    result = orders.query_database(TOTAL_SQL)
+    assert result["cache"]["hit"] is False
+    assert result["data"] == [(90, 90)]
+
+
+def test_nondeterministic_query_not_cached(orders):
+    result = orders.query_database("SELECT id FROM orders ORDER BY random() LIMIT 1")
+    assert result["cache"]["cacheable"] is False
+
+
+def test_normalize_sql_keeps_literals():
+    assert normalize_sql("SELECT * FROM T WHERE name = 'Ab'  -- note\n;") == "select * from t where name = 'Ab'"
+
+
+def test_replace_import_invalidates(orders, tmp_path):
+    assert orders.query_database(TOTAL_SQL)["data"] == [(100, 100)]
+
+    csv_path = tmp_path / "new.csv"
+    pd.DataFrame({"id": range(3), "amount": [2] * 3}).to_csv(csv_path, index=False)
+    DataImporter(orders.current_db_path).import_csv(str(csv_path), "orders")
+
+    result = orders.query_database(TOTAL_SQL)
+    assert result["cache"]["hit"] is False
+    assert result["data"] == [(3, 6)]
+
+
+def test_with_query_is_cached(orders):
+    sql = "WITH big AS (SELECT * FROM orders WHERE id > 50) SELECT COUNT(*) FROM big"
+    assert orders.query_database(sql)["cache"]["hit"] is False
+    assert orders.query_database(sql)["cache"]["hit"] is True
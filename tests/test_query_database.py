@@ -0,0 +1,65 @@
+# test_query_database.py - query_database 的结果截断和行数统计
+import sqlite3
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def numbers(analyzer):
+    with sqlite3.connect(analyzer.current_db_path) as conn:
+        conn.execute("CREATE TABLE numbers (n INTEGER)")
+        conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(5000)])
+    return analyzer
+
+
+def test_small_result_not_truncated(numbers):
+    result = numbers.query_database("SELECT n FROM numbers WHERE n < 10")
+    assert result["truncated"] is False
+    assert result["returned_rows"] == 10
+    assert result["total_rows_estimate"] == 10
+    assert result["total_rows_exact"] is True
+
+
+def test_truncated_result_counts_remaining_rows(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_ROWS", 100)
+    result = numbers.query_database("SELECT n FROM numbers")
+    assert result["truncated"] is True
+    assert result["returned_rows"] == 100
+    assert result["total_rows_estimate"] == 5000
+    assert result["total_rows_exact"] is True
+    assert "共 5000 行" in result["notice"]
+
+
+def test_count_stops_at_scan_limit(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_ROWS", 100)
+    monkeypatch.setattr(Config, "QUERY_COUNT_SCAN_ROWS", 1000)
+    result = numbers.query_database("SELECT n FROM numbers")
+    assert result["returned_rows"] == 100
+    assert result["total_rows_estimate"] == 1000
+    assert result["total_rows_exact"] is False
+    assert "至少 1000 行" in result["notice"]
+
+
+def test_count_scan_limit_reached_exactly(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_ROWS", 100)
+    monkeypatch.setattr(Config, "QUERY_COUNT_SCAN_ROWS", 5000)
+    result = numbers.query_database("SELECT n FROM numbers")
+    assert result["total_rows_estimate"] == 5000
+    assert result["total_rows_exact"] is True
+
+
+def test_with_query_is_bounded(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_ROWS", 100)
+    result = numbers.query_database("WITH evens AS (SELECT n FROM numbers WHERE n % 2 = 0) SELECT n FROM evens")
+    assert result["truncated"] is True
+    assert result["returned_rows"] == 100
+    assert result["total_rows_estimate"] == 2500
+
+
+def test_byte_budget_truncates(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_MAX_RESULT_BYTES", 1000)
+    result = numbers.query_database("SELECT n, printf('%100d', n) AS padded FROM numbers")
+    assert result["truncated"] is True
+    assert 0 < result["returned_rows"] < 20
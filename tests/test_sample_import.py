@@ -0,0 +1,86 @@
+# test_sample_import.py - 样本优先导入：蓄水池抽样、样本表可立即查询、全量导入后原子替换
+import io
+import sqlite3
+import time
+
+from sample_import import SAMPLE_CATALOG, reservoir_sample_lines, staging_table_name
+
+CSV = b"id,amount\n" + b"".join(f"{i},{i % 7}\n".encode() for i in range(2000))
+
+
+def test_reservoir_sample_is_uniform_subset():
+    header, lines, data_bytes = reservoir_sample_lines(io.BytesIO(CSV), 100, seed=1)
+    assert header == b"id,amount\n"
+    assert len(lines) == 100
+    assert len(set(lines)) == 100
+    assert set(lines) <= set(CSV.splitlines(keepends=True)[1:])
+    assert data_bytes == len(CSV) - len(header)
+    # 不是简单取前 100 行
+    assert max(int(line.split(b",")[0]) for line in lines) > 1000
+
+
+def test_sample_then_full_load_replaces_table(analyzer, tmp_path):
+    file_path = tmp_path / "orders.csv"
+    file_path.write_bytes(CSV)
+    db_path = analyzer.current_db_path
+
+    sample = analyzer.import_sample_table(str(file_path), "orders.csv", "orders", db_path, sample_rows=100)
+    assert sample["success"], sample
+    assert sample["sample_rows"] == 100
+    assert abs(sample["estimated_total_rows"] - 2000) < 200
+    assert "orders" in analyzer._load_sample_tables()
+
+    with open(file_path, "rb") as f:
+        result = analyzer.load_full_after_sample(f, "orders.csv", "orders", db_path)
+    assert result["success"], result
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone() == (2000,)
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name = ?",
+                            (staging_table_name("orders"),)).fetchone() is None
+        assert conn.execute(f"SELECT COUNT(*) FROM {SAMPLE_CATALOG}").fetchone() == (0,)
+    assert analyzer._load_sample_tables() == {}
+
+
+def test_failed_full_load_keeps_sample(analyzer, tmp_path):
+    file_path = tmp_path / "orders.csv"
+    file_path.write_bytes(CSV)
+    db_path = analyzer.current_db_path
+    analyzer.import_sample_table(str(file_path), "orders.csv", "orders", db_path, sample_rows=100)
+
+    result = analyzer.load_full_after_sample(io.BytesIO(b""), "orders.csv", "orders", db_path)
+    assert not result["success"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM orders").fetchone() == (100,)
+    assert analyzer._load_sample_tables()["orders"]["status"] == "failed"
+
+
+def test_query_on_sample_reports_notice(analyzer, tmp_path):
+    file_path = tmp_path / "orders.csv"
+    file_path.write_bytes(CSV)
+    analyzer.import_sample_table(str(file_path), "orders.csv", "orders", analyzer.current_db_path, sample_rows=100)
+    result = analyzer.query_database("SELECT COUNT(*) FROM orders")
+    assert result["success"]
+    assert "orders" in result["sample_notice"]
+
+
+def test_sample_first_upload(client):
+    response = client.post("/api/upload?filename=orders.csv&sample_first=1", data=CSV, content_type="text/csv")
+    assert response.status_code == 202, response.get_json()
+    data = response.get_json()["data"]
+    assert data["sample"]["success"]
+
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        job = client.get(data["status_url"]).get_json()["data"]
+        if job["status"] in ("completed", "failed", "cancelled"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "completed", job
+    with sqlite3.connect(client.analyzer.current_db_path) as conn:
+        assert conn.execute(f"SELECT COUNT(*) FROM {data['table_name']}").fetchone() == (2000,)
+
+
+def test_sample_first_rejects_dictionary_encoding(client):
+    response = client.post("/api/upload?filename=orders.csv&sample_first=1&dictionary_encode=1",
+                           data=CSV, content_type="text/csv")
+    assert response.status_code == 400
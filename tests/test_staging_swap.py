@@ -0,0 +1,59 @@
+# test_staging_swap.py - replace 导入写入暂存表，写完后原子替换；导入期间查询读到完整的旧表
+import io
+import sqlite3
+
+import pytest
+
+from data_importer import DataImporter, ImportCancelled, STAGING_PREFIX
+
+
+def csv_bytes(rows, offset=0):
+    return b"id,city\n" + b"".join(f"{i + offset},city{i % 3}\n".encode() for i in range(rows))
+
+
+def table_names(db_path):
+    with sqlite3.connect(db_path) as conn:
+        return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")}
+
+
+def test_queries_see_old_table_during_replace(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    DataImporter(db_path).import_csv(io.BytesIO(csv_bytes(30)), "t")
+    seen = []
+
+    def progress(rows, bytes_read):
+        # 另一个连接在导入进行中读取：旧表完整可见，不被写入阻塞
+        with sqlite3.connect(db_path, timeout=0) as reader:
+            seen.append(reader.execute("SELECT COUNT(*) FROM t").fetchone()[0])
+
+    DataImporter(db_path, chunk_size=10, progress_callback=progress).import_csv(io.BytesIO(csv_bytes(50, 100)), "t")
+    assert seen and set(seen) == {30}
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*), MIN(id) FROM t").fetchone() == (50, 100)
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+    assert not any(name.startswith(STAGING_PREFIX) for name in table_names(db_path))
+
+
+def test_failed_replace_keeps_old_table(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    DataImporter(db_path).import_csv(io.BytesIO(csv_bytes(30)), "t")
+
+    def progress(rows, bytes_read):
+        if rows >= 20:
+            raise ImportCancelled("stop")
+
+    with pytest.raises(ImportCancelled):
+        DataImporter(db_path, chunk_size=10, progress_callback=progress).import_csv(io.BytesIO(csv_bytes(50)), "t")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (30,)
+    assert not any(name.startswith(STAGING_PREFIX) for name in table_names(db_path))
+
+
+def test_replace_dictionary_encoded_table(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    for rows in (2000, 3000):
+        result = DataImporter(db_path, dictionary_encode=True).import_csv(io.BytesIO(csv_bytes(rows)), "t")
+        assert result["encoded_columns"] == ["city"]
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT city) FROM t").fetchone() == (3000, 3)
+    assert not any(STAGING_PREFIX in name for name in table_names(db_path))
@@ -0,0 +1,123 @@
+# test_tool_execution.py - 同一轮工具调用：只读调用并发，写入及其后的调用按顺序执行；心跳与取消
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from config import Config
+
+ENDLESS = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+
+def tool_call(call_id, sql=None, name="query_database"):
+    return {"type": "tool_use", "id": call_id, "name": name, "input": {"sql": sql} if sql else {}}
+
+
+def run_tools(analyzer, blocks, cancel_event=None):
+    """消费 _execute_tools_streaming，返回 (事件列表, 结果)"""
+    generator = analyzer._execute_tools_streaming(blocks, cancel_event)
+    events = []
+    while True:
+        try:
+            events.append(next(generator))
+        except StopIteration as stop:
+            return events, stop.value
+
+
+@pytest.fixture
+def numbers(analyzer):
+    with sqlite3.connect(analyzer.current_db_path) as conn:
+        conn.execute("CREATE TABLE numbers (n INTEGER)")
+        conn.executemany("INSERT INTO numbers VALUES (?)", [(i,) for i in range(100)])
+    return analyzer
+
+
+def test_dependent_calls_run_in_order(numbers):
+    blocks = [
+        tool_call("a", "SELECT COUNT(*) FROM numbers"),
+        tool_call("b", "CREATE TABLE evens AS SELECT n FROM numbers WHERE n % 2 = 0"),
+        tool_call("c", "SELECT COUNT(*) FROM evens"),
+        tool_call("d", "INSERT INTO evens VALUES (1000)"),
+        tool_call("e", "SELECT MAX(n) FROM evens"),
+    ]
+    _, outcomes = run_tools(numbers, blocks)
+    results = {call_id: outcome["result"] for call_id, outcome in outcomes.items()}
+    assert results["a"]["data"] == [(100,)]
+    assert results["b"]["success"] and results["d"]["success"]
+    assert results["c"]["data"] == [(50,)]
+    assert results["e"]["data"] == [(1000,)]
+
+
+def test_classifies_read_only_calls(numbers):
+    assert numbers._is_read_only_tool_call(tool_call("a", "WITH t AS (SELECT n FROM numbers) SELECT * FROM t"))
+    assert numbers._is_read_only_tool_call(tool_call("b", name="get_table_info"))
+    assert not numbers._is_read_only_tool_call(tool_call("c", "DELETE FROM numbers"))
+    # 引用尚不存在的表的语句无法编译，按写入处理
+    assert not numbers._is_read_only_tool_call(tool_call("d", "SELECT * FROM later_table"))
+
+
+def test_reads_overlap_and_writes_are_serialized(numbers, monkeypatch):
+    spans = {}
+    original = numbers.execute_tool
+
+    def timed(tool_name, tool_input, cancel_event=None):
+        start = time.monotonic()
+        time.sleep(0.2)
+        result = original(tool_name, tool_input, cancel_event)
+        spans[tool_input["sql"]] = (start, time.monotonic())
+        return result
+
+    monkeypatch.setattr(numbers, "execute_tool", timed)
+    reads = ["SELECT 1 FROM numbers", "SELECT 2 FROM numbers", "SELECT 3 FROM numbers"]
+    write = "UPDATE numbers SET n = n + 1"
+    after = "SELECT MIN(n) FROM numbers"
+    events, outcomes = run_tools(numbers, [tool_call(str(i), sql) for i, sql in enumerate(reads + [write, after])])
+
+    # 开头的只读调用并发执行
+    assert max(spans[sql][0] for sql in reads) < min(spans[sql][1] for sql in reads)
+    # 写入在只读调用全部完成后开始，之后的调用在写入完成后开始并能看到写入结果
+    assert spans[write][0] >= max(spans[sql][1] for sql in reads)
+    assert spans[after][0] >= spans[write][1]
+    assert outcomes["4"]["result"]["data"] == [(1,)]
+    assert [event["result"]["sql"] for event in events if event["type"] == "tool_result"][-2:] == [write, after]
+
+
+def test_heartbeat_while_waiting(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_HEARTBEAT_SECONDS", 0.05)
+    original = numbers.execute_tool
+
+    def slow(tool_name, tool_input, cancel_event=None):
+        time.sleep(0.3)
+        return original(tool_name, tool_input, cancel_event)
+
+    monkeypatch.setattr(numbers, "execute_tool", slow)
+    events, outcomes = run_tools(numbers, [tool_call("a", "SELECT COUNT(*) FROM numbers")])
+    types = [event["type"] for event in events]
+    assert "heartbeat" in types
+    assert types.index("heartbeat") < types.index("tool_result")
+    assert outcomes["a"]["result"]["data"] == [(100,)]
+
+
+def test_cancel_event_reaches_running_query(numbers, monkeypatch):
+    monkeypatch.setattr(Config, "QUERY_HEARTBEAT_SECONDS", 0.05)
+    finished = []
+    original = numbers.execute_tool
+
+    def recording(tool_name, tool_input, cancel_event=None):
+        result = original(tool_name, tool_input, cancel_event)
+        finished.append(result)
+        return result
+
+    monkeypatch.setattr(numbers, "execute_tool", recording)
+    cancel_event = threading.Event()
+    generator = numbers._execute_tools_streaming([tool_call("a", ENDLESS)], cancel_event)
+    assert next(generator)["type"] == "heartbeat"
+
+    # 分析流关闭时置位 cancel_event，关闭生成器不等待查询结束
+    cancel_event.set()
+    generator.close()
+    deadline = time.monotonic() + 5
+    while not finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert finished and finished[0]["cancelled"] is True
@@ -0,0 +1,46 @@
+# test_typed_schema.py - 按首块数据推断列类型并显式建表，导入后恢复PRAGMA设置
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from data_importer import DataImporter
+
+
+@pytest.mark.parametrize("values, expected", [
+    ([1.0, 2.0, None], "INTEGER"),
+    ([1.5, 2.0], "REAL"),
+    (["1,234.5", "2,000"], "REAL"),
+    (["1,234", "2,000"], "INTEGER"),
+    (["00123", "00456"], "TEXT"),
+    (["2024-01-05", "2024-02-01"], "DATE"),
+    (["2024-01-05 08:00:00", "2024-01-05T09:30"], "DATETIME"),
+    (["北京", "上海"], "TEXT"),
+    ([None, None], "TEXT"),
+])
+def test_infer_column_type(values, expected):
+    assert DataImporter._infer_column_type(pd.Series(values, name="value")) == expected
+
+
+def test_declared_types_and_coerced_values(tmp_path):
+    path = tmp_path / "sales.csv"
+    path.write_text('id,amount,day\n1,"1,234.5",2024-01-05\n2,10,2024-01-06\n', encoding="utf-8")
+    db_path = str(tmp_path / "test.db")
+    result = DataImporter(db_path).import_csv(str(path), "sales")
+
+    assert result["column_types"] == {"id": "INTEGER", "amount": "REAL", "day": "DATE"}
+    with sqlite3.connect(db_path) as conn:
+        declared = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(sales)")}
+        assert declared == result["column_types"]
+        assert conn.execute("SELECT SUM(amount), typeof(amount) FROM sales WHERE id = 1").fetchone() == (1234.5, "real")
+
+
+def test_pragmas_restored_after_import(tmp_path):
+    db_path = str(tmp_path / "test.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("PRAGMA journal_mode=WAL")
+    path = tmp_path / "t.csv"
+    path.write_text("a\n1\n2\n", encoding="utf-8")
+    DataImporter(db_path).import_csv(str(path), "t")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
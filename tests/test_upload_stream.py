@@ -0,0 +1,44 @@
+# test_upload_stream.py - 上传流直接导入，不经过临时文件
+import io
+import os
+import sqlite3
+
+from data_importer import UploadStream
+
+CSV = "city,amount\n北京,100\n上海,200\n广州,300\n".encode("utf-8")
+
+
+def test_upload_stream_replays_prefix_and_tees(tmp_path):
+    sink = io.BytesIO()
+    stream = UploadStream(io.BytesIO(CSV[8:]), prefix=CSV[:8], sink=sink)
+    assert stream.read() == CSV
+    assert stream.bytes_read == len(CSV)
+    assert sink.getvalue() == CSV
+
+
+def test_import_from_stream_keeps_raw_copy(analyzer, tmp_path):
+    raw_copy_path = str(tmp_path / "raw.csv")
+    result = analyzer.import_file_stream(io.BytesIO(CSV), "sales.csv", "sales", analyzer.current_db_path,
+                                        raw_copy_path=raw_copy_path)
+    assert result["success"]
+    assert result["rows_imported"] == 3
+    with open(raw_copy_path, "rb") as f:
+        assert f.read() == CSV
+
+
+def test_raw_body_upload(client):
+    response = client.post("/api/upload?filename=sales.csv", data=CSV, content_type="text/csv")
+    data = response.get_json()
+    assert response.status_code == 200, data
+    assert data["data"]["rows_imported"] == 3
+    assert data["data"]["raw_file_path"] is None
+    with sqlite3.connect(client.analyzer.current_db_path) as conn:
+        assert conn.execute(f"SELECT SUM(amount) FROM {data['data']['table_name']}").fetchone() == (600,)
+
+
+def test_multipart_upload_persist_raw(client):
+    response = client.post("/api/upload", data={"file": (io.BytesIO(CSV), "sales.csv"), "persist_raw": "true"},
+                           content_type="multipart/form-data")
+    data = response.get_json()
+    assert response.status_code == 200, data
+    assert os.path.exists(data["data"]["raw_file_path"])